@@ -0,0 +1,90 @@
+# Memory held by a flight series collection: the original dict based objects vs the current slotted, interned ones
+# Usage: python benchmarks/bench_memory.py [ssim file]
+
+import gc
+import sys
+import tracemalloc
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.append(str(ROOT / 'src'))
+
+from models.airport import airport_registry
+from models.flight_series_handler import FlightSeriesHandler
+from models.ssim_file import SSIM_File
+from models.ssim_file_reader import SSIMFileReader
+
+
+class LegacyAirport:
+    # The Airport class as it was: a __dict__ per instance, one instance per series and station
+    def __init__(self, iata_code, record):
+        self.iata_code = iata_code
+        self.icao_code = record['ICAO code']
+        self.airport_name = record['Airport name']
+        self.latitude = record['Latitude']
+        self.longitude = record['Longitude']
+        self.iso_country = record['ISO country']
+        self.iso_region = record['ISO region']
+        self.city = record['municipality']
+        self.country_name = record['Country name']
+        self.timezone = record['Timezone']
+
+
+class LegacyFlightSeries:
+    def __init__(self, data, records):
+        self.airline_designator = data['Airline designator']
+        self.flight_number = data['Flight number']
+        self.service_type = data['Service Type']
+        self.effective_date = data['Eff']
+        self.discontinued_date = data['Dis']
+        self.days_of_operation = data['Day(s) of operation']
+        self.departure_station = LegacyAirport(data['Dept Stn'], records[data['Dept Stn']])
+        self.departure_time = data['Dept time (pax)']
+        self.arrival_station = LegacyAirport(data['Arvl Stn'], records[data['Arvl Stn']])
+        self.arrival_time = data['Arvl time (pax)']
+        self.equipment = data['Equipment']
+        self.aircraft_configuration = data['Aircraft configuration']
+
+
+def measure(build):
+    gc.collect()
+    tracemalloc.start()
+    collection = build()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return size, len(collection)
+
+
+def main():
+    path = sys.argv[1] if len(sys.argv) > 1 else str(ROOT / 'data' / 'ssim' / 'EY_SSIM_2.ssim')
+    df = SSIMFileReader(path).get_dataframe(path, *SSIM_File._get_col_data())
+
+    rows = df.to_dict('records')
+    stations = set(df['Dept Stn']) | set(df['Arvl Stn'])
+    records = {code: airport_registry.get_record(code) for code in stations}
+    for code in stations:
+        airport_registry.get_airport(code)
+
+    def fresh(row):
+        # New string objects for every row, as the parser hands them out, so their cost is measured too
+        return {key: value.encode().decode() if isinstance(value, str) else value for key, value in row.items()}
+
+    def build_legacy():
+        return [LegacyFlightSeries(fresh(row), records) for row in rows]
+
+    def build_current():
+        handler = FlightSeriesHandler()
+        for row in rows:
+            handler.add_flight_series(fresh(row))
+        return handler.flight_series_collection
+
+    legacy_bytes, count = measure(build_legacy)
+    current_bytes, _ = measure(build_current)
+
+    print(f"{Path(path).name}: {count} flight series")
+    print(f"{'legacy (dict, per series airports)':<40}{legacy_bytes / 1e6:>8.2f} MB{legacy_bytes / count:>8.0f} B/series")
+    print(f"{'current (slots, interned)':<40}{current_bytes / 1e6:>8.2f} MB{current_bytes / count:>8.0f} B/series")
+
+
+if __name__ == '__main__':
+    main()
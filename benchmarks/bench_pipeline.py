@@ -0,0 +1,223 @@
+# Times every stage of the pipeline, from header parse to document rendering, on the SSIM files in data/ssim
+# and on synthetic copies of one of them with 10x and 100x the legs. Peak memory of each stage is measured
+# with tracemalloc in a separate run, so that tracing does not skew the timings.
+#
+# Results are saved as JSON and compared with a baseline: stages slower (or hungrier) than the baseline by more
+# than the tolerance are flagged as regressions and the script exits with status 1.
+#
+# Usage: python benchmarks/bench_pipeline.py [--repeat 3] [--scales 10 100] [--output results.json]
+#                                            [--baseline benchmarks/baseline.json] [--save-baseline | --no-baseline]
+# Timings only compare on the same machine, so no baseline is committed: record one on the reference machine
+# with --save-baseline, later runs are then compared against it. Without a baseline the script refuses to run
+# (exit status 2) rather than report no regression, unless --no-baseline asks for the measurements only.
+
+import argparse
+import gc
+import json
+import platform
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.append(str(ROOT / 'src'))
+
+from lib.permit_generator import render_document
+from models.airport import airport_registry
+from models.flight_series_handler import FlightSeriesHandler
+from models.seasons_handler import DateSeasonHandler
+from models.ssim_file import SSIM_File
+from models.ssim_file_reader import SSIMFileReader, RECORD_LENGTH
+from utils.file_helper import get_cache_dir
+
+STAGES = ['header', 'parse', 'series', 'countries', 'seasons', 'docs']
+
+DEFAULT_BASELINE = ROOT / 'benchmarks' / 'baseline.json'
+DEFAULT_OUTPUT = ROOT / 'benchmarks' / 'results' / 'latest.json'
+
+# Small differences are noise, only flag stages over the baseline by more than this
+# (and by more than a millisecond or 64 KB)
+DEFAULT_TOLERANCE = 0.25
+MIN_TIME_DELTA = 0.001
+MIN_MEMORY_DELTA = 64 * 1024
+
+
+def scale_ssim(source_path, factor, target_path):
+    """Writes a copy of an SSIM file with its legs (type 3 records) repeated `factor` times, serial numbers renumbered."""
+
+    records = [record for chunk in SSIMFileReader._iter_raw_records(str(source_path)) for record in chunk]
+    legs = [record for record in records if record[:1] == b'3']
+    first_leg = next(position for position, record in enumerate(records) if record[:1] == b'3')
+    others = [record for record in records if record[:1] != b'3']
+    scaled = others[:first_leg] + legs * factor + others[first_leg:]
+
+    with open(target_path, 'wb') as target:
+        for serial, record in enumerate(scaled, start=1):
+            record = record.ljust(RECORD_LENGTH)[:RECORD_LENGTH]
+            if record[:1] != b'0':
+                record = record[:194] + b'%06d' % (serial % 1000000)
+            target.write(record + b'\n')
+
+
+def get_datasets(scales, scale_source):
+    datasets = {}
+    for path in sorted((ROOT / 'data' / 'ssim').glob('*.ssim')):
+        try:
+            SSIMFileReader(str(path)).get_attributes()
+        except Exception as error:  # The NUL padded files have no header to read
+            print(f"{path.name:<50} skipped ({type(error).__name__})")
+            continue
+        datasets[path.name] = path
+
+    if scales:
+        source_path = ROOT / 'data' / 'ssim' / scale_source
+        synthetic_dir = get_cache_dir('benchmarks') or Path(ROOT / 'benchmarks' / 'results')
+        synthetic_dir.mkdir(parents=True, exist_ok=True)
+        for factor in scales:
+            target_path = synthetic_dir / f'{source_path.stem}_x{factor}.ssim'
+            if not target_path.exists() or target_path.stat().st_mtime < source_path.stat().st_mtime:
+                scale_ssim(source_path, factor, target_path)
+            datasets[target_path.name] = target_path
+
+    return datasets
+
+
+def run_stages(path, doc_countries):
+    """Returns the (stage, callable) pairs of one run of the pipeline on a file, each stage using the previous results."""
+
+    state = {'reader': SSIMFileReader(str(path))}
+
+    def header():
+        state['attributes'] = state['reader'].get_attributes()
+
+    def parse():
+        state['df'] = state['reader'].get_dataframe(str(path), *SSIM_File._get_col_data())
+
+    def series():
+        state['handler'] = FlightSeriesHandler()
+        state['handler'].create_flight_series_from_df(state['df'])
+
+    def countries():
+        handler = state['handler']
+        state['countries'] = sorted(handler.get_unique_countries())
+        for country in state['countries']:
+            handler.filter_by_country(country)
+
+    def seasons():
+        attributes = state['attributes']
+        DateSeasonHandler(attributes['start_date'], attributes['end_date']).get_iata_seasons()
+        state['handler'].partition_by_season()
+
+    def docs():
+        attributes = state['attributes']
+        for country in state['countries'][:doc_countries]:
+            render_document(country, attributes['start_date'], attributes['end_date'],
+                            state['handler'].filter_by_country(country), 'Benchmark Air', 'Benchmark')
+
+    return list(zip(STAGES, [header, parse, series, countries, seasons, docs]))
+
+
+def measure(path, repeat, doc_countries):
+    timings = {stage: [] for stage in STAGES}
+    for _ in range(repeat):
+        for stage, function in run_stages(path, doc_countries):
+            start = time.perf_counter()
+            function()
+            timings[stage].append(time.perf_counter() - start)
+
+    peaks = {}
+    gc.collect()
+    tracemalloc.start()
+    for stage, function in run_stages(path, doc_countries):
+        tracemalloc.reset_peak()
+        baseline, _ = tracemalloc.get_traced_memory()
+        function()
+        peaks[stage] = tracemalloc.get_traced_memory()[1] - baseline
+    tracemalloc.stop()
+
+    return {stage: {'seconds': min(timings[stage]), 'peak_bytes': peaks[stage]} for stage in STAGES}
+
+
+def find_regressions(results, baseline, tolerance):
+    regressions = []
+    for dataset, stages in results['datasets'].items():
+        for stage, measured in stages.items():
+            reference = baseline.get('datasets', {}).get(dataset, {}).get(stage)
+            if reference is None:
+                continue
+            if (measured['seconds'] > reference['seconds'] * (1 + tolerance)
+                    and measured['seconds'] - reference['seconds'] > MIN_TIME_DELTA):
+                regressions.append((dataset, stage, 'seconds', reference['seconds'], measured['seconds']))
+            if (measured['peak_bytes'] > reference['peak_bytes'] * (1 + tolerance)
+                    and measured['peak_bytes'] - reference['peak_bytes'] > MIN_MEMORY_DELTA):
+                regressions.append((dataset, stage, 'peak_bytes', reference['peak_bytes'], measured['peak_bytes']))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Time and peak memory of each pipeline stage')
+    parser.add_argument('--repeat', type=int, default=3, help='timed runs per stage, the best one is kept')
+    parser.add_argument('--scales', type=int, nargs='*', default=[10, 100], help='synthetic scale factors, none to skip')
+    parser.add_argument('--scale-source', default='EY_SSIM.ssim', help='file of data/ssim the synthetic files are built from')
+    parser.add_argument('--doc-countries', type=int, default=3, help='documents rendered per file')
+    parser.add_argument('--output', type=Path, default=DEFAULT_OUTPUT)
+    parser.add_argument('--baseline', type=Path, default=DEFAULT_BASELINE)
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE)
+    parser.add_argument('--save-baseline', action='store_true', help='also store these results as the baseline')
+    parser.add_argument('--no-baseline', action='store_true', help='only measure, without comparing to a baseline')
+    args = parser.parse_args()
+
+    compare = not (args.save_baseline or args.no_baseline)
+    if compare and not args.baseline.exists():
+        print(f'No baseline at {args.baseline}, nothing to detect regressions against. Record one with '
+              f'--save-baseline on the reference machine, or pass --no-baseline to only measure.', file=sys.stderr)
+        return 2
+
+    # Reference data is loaded once up front, it is not part of any stage
+    len(airport_registry)
+
+    results = {
+        'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'repeat': args.repeat,
+        'datasets': {},
+    }
+
+    print(f"{'file':<50}" + ''.join(f'{stage:>18}' for stage in STAGES))
+    for name, path in get_datasets(args.scales, args.scale_source).items():
+        stages = measure(path, args.repeat, args.doc_countries)
+        results['datasets'][name] = stages
+        print(f'{name:<50}' + ''.join(
+            f"{stages[stage]['seconds']:>9.3f}s{stages[stage]['peak_bytes'] / 2 ** 20:>7.1f}MB" for stage in STAGES))
+
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    args.output.write_text(json.dumps(results, indent=2))
+    print(f'\nResults saved to {args.output}')
+
+    status = 0
+    if compare:
+        regressions = find_regressions(results, json.loads(args.baseline.read_text()), args.tolerance)
+        for dataset, stage, metric, reference, measured in regressions:
+            print(f'REGRESSION {dataset} {stage} {metric}: {reference:.4g} -> {measured:.4g}')
+        if regressions:
+            status = 1
+        else:
+            print(f'No regression against {args.baseline} (tolerance {args.tolerance:.0%})')
+
+    if args.save_baseline:
+        args.baseline.write_text(json.dumps(results, indent=2))
+        print(f'Baseline saved to {args.baseline}')
+
+    return status
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,71 @@
+# Per-document permit render time against the number of rows in the flight table
+# Usage: python benchmarks/bench_render.py [row counts...]
+#
+# Times render_permit(), the path every permit takes (the compiled template, its rows filled by _fill_rows), and
+# for small tables checks its flight table against the original cell by cell python-docx fill.
+
+import io
+import sys
+import time
+import zipfile
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.append(str(ROOT / 'src'))
+
+from datetime import date
+
+from docx import Document
+from docx.oxml.ns import qn
+from lxml import etree
+
+from lib.permit_template import render_permit, get_template, FLIGHT_TABLE_COLUMNS
+from models.ssim_file import SSIM_File
+
+# The original cell by cell fill is quadratic, only run it up to this many rows
+LEGACY_MAX_ROWS = 40
+
+
+def legacy_table(columns, rows):
+    table = Document().add_table(len(rows) + 1, len(columns))
+    for j, column in enumerate(columns):
+        table.cell(0, j).text = column
+    for i, values in enumerate(rows):
+        for j, value in enumerate(values):
+            table.cell(i + 1, j).text = value
+    return table._tbl
+
+
+def rendered_table(document):
+    with zipfile.ZipFile(io.BytesIO(document)) as package:
+        return next(etree.fromstring(package.read('word/document.xml')).iter(qn('w:tbl')))
+
+
+def main():
+    row_counts = [int(count) for count in sys.argv[1:]] or [10, 40, 100, 500, 1000, 5000]
+
+    ssim_file = SSIM_File(str(ROOT / 'data' / 'ssim' / 'EY_SSIM_2.ssim'))
+    all_rows = [fs.to_dict() for fs in ssim_file.flight_series_list]
+    # Compiled once, as in a real run, and left out of the timings
+    get_template()
+
+    print(f"{'rows':>6}{'render (s)':>12}{'legacy (s)':>12}")
+    for count in row_counts:
+        rows = (all_rows * (count // len(all_rows) + 1))[:count]
+        start = time.perf_counter()
+        document = render_permit(None, ssim_file.start_date, ssim_file.end_date, rows, 'FlySample', 'Luca Siragusa')
+        elapsed = time.perf_counter() - start
+
+        legacy = ''
+        if count <= LEGACY_MAX_ROWS:
+            start = time.perf_counter()
+            expected = legacy_table(FLIGHT_TABLE_COLUMNS, [[str(row[column]) for column in FLIGHT_TABLE_COLUMNS] for row in rows])
+            legacy = f'{time.perf_counter() - start:.3f}'
+            assert etree.tostring(rendered_table(document), method='c14n') == etree.tostring(expected, method='c14n'), \
+                'table XML differs from the cell by cell output'
+
+        print(f"{count:>6}{elapsed:>12.3f}{legacy:>12}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,45 @@
+# Compares the pd.read_fwf based SSIM parser with the bytes engine on the files in data/ssim
+# Usage, from any directory (the reference data is found through utils.file_helper): python benchmarks/bench_ssim_parser.py [repeat]
+
+import sys
+import time
+from pathlib import Path
+
+import pandas.testing as pdt
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.append(str(ROOT / 'src'))
+
+from models.ssim_file import SSIM_File
+from models.ssim_file_reader import SSIMFileReader
+
+
+def best_of(repeat, function, *args, **kwargs):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function(*args, **kwargs)
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def main():
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    col_data = SSIM_File._get_col_data()
+
+    print(f"{'file':<50}{'legs':>8}{'fwf (s)':>10}{'bytes (s)':>11}{'speedup':>9}")
+    for path in sorted((ROOT / 'data' / 'ssim').glob('*.ssim')):
+        reader = SSIMFileReader(str(path))
+        try:
+            fwf_time, fwf_df = best_of(repeat, reader.get_dataframe, str(path), *col_data, engine='fwf')
+        except Exception as error:  # The null padded files cannot be read by read_fwf at all
+            print(f"{path.name:<50} skipped ({type(error).__name__})")
+            continue
+        bytes_time, bytes_df = best_of(repeat, reader.get_dataframe, str(path), *col_data)
+        pdt.assert_frame_equal(fwf_df, bytes_df)
+
+        print(f"{path.name:<50}{len(bytes_df):>8}{fwf_time:>10.3f}{bytes_time:>11.3f}{fwf_time / bytes_time:>8.1f}x")
+
+
+if __name__ == '__main__':
+    main()
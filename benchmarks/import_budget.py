@@ -0,0 +1,86 @@
+# Startup budget of the CLI: runs `landingpermit inspect` on an SSIM file under `python -X importtime` and fails
+# (exit status 1) when the command takes longer than the budget, or when it imported one of the heavy
+# dependencies that only the commands parsing whole files need.
+#
+# The command runs in a fresh interpreter, as it does for a user, and the best of --repeat runs is kept.
+# The slowest imports are listed, which is where to look when the budget is exceeded.
+#
+# Usage: python benchmarks/import_budget.py [--file data/ssim/EY_SSIM.ssim] [--budget-ms 150] [--repeat 5]
+# tests/test_import_budget.py runs it with the default budget as part of the test suite.
+
+import argparse
+import os
+import re
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# Wall time of the whole `inspect` run, interpreter startup included
+DEFAULT_BUDGET_MS = 150
+
+# None of these may be imported to read a header
+HEAVY_MODULES = ['numpy', 'pandas', 'pendulum', 'docx', 'lxml', 'pyarrow']
+
+_IMPORT_LINE = re.compile(r'import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)')
+
+
+def run_inspect(ssim_path):
+    """Runs the inspect command once. Returns (wall seconds, {module: cumulative microseconds} of top level imports, all modules)."""
+
+    env = dict(os.environ, PYTHONPATH=str(ROOT / 'src'))
+    start = time.perf_counter()
+    completed = subprocess.run([sys.executable, '-X', 'importtime', '-m', 'lib.cli', 'inspect', str(ssim_path)],
+                               capture_output=True, text=True, env=env)
+    elapsed = time.perf_counter() - start
+    if completed.returncode:
+        raise RuntimeError(f'inspect failed:\n{completed.stdout}{completed.stderr}')
+
+    top_level = {}
+    modules = set()
+    for line in completed.stderr.splitlines():
+        match = _IMPORT_LINE.match(line)
+        if not match:
+            continue
+        _, cumulative, indent, module = match.groups()
+        modules.add(module)
+        # Nested imports are indented by two spaces per level below the one that triggered them
+        if len(indent) == 1:
+            top_level[module] = int(cumulative)
+    return elapsed, top_level, modules
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Import time budget of `landingpermit inspect`')
+    parser.add_argument('--file', type=Path, default=ROOT / 'data' / 'ssim' / 'EY_SSIM.ssim')
+    parser.add_argument('--budget-ms', type=float, default=DEFAULT_BUDGET_MS)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--top', type=int, default=10, help='slowest top level imports to list')
+    args = parser.parse_args()
+
+    runs = [run_inspect(args.file) for _ in range(args.repeat)]
+    elapsed, top_level, modules = min(runs, key=lambda run: run[0])
+
+    print(f"{'top level import':<40}{'cumulative (ms)':>16}")
+    for module, microseconds in sorted(top_level.items(), key=lambda item: -item[1])[:args.top]:
+        print(f'{module:<40}{microseconds / 1000:>16.1f}')
+    print(f"\n{'imports, total':<40}{sum(top_level.values()) / 1000:>16.1f} ms")
+    print(f"{'inspect, wall time (best of ' + str(args.repeat) + ')':<40}{elapsed * 1000:>16.1f} ms (budget {args.budget_ms:.0f} ms)")
+
+    status = 0
+    heavy = sorted(module for module in modules if module in HEAVY_MODULES)
+    if heavy:
+        print(f"FAIL: inspect imported {', '.join(heavy)}")
+        status = 1
+    if elapsed * 1000 > args.budget_ms:
+        print(f'FAIL: over budget by {elapsed * 1000 - args.budget_ms:.1f} ms')
+        status = 1
+    if not status:
+        print('OK')
+    return status
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -6,14 +6,28 @@ setup(
     packages=find_packages(where='src'),  # Tells setuptools to find packages under src
     package_dir={'': 'src'},  # Tells setuptools that packages are under src
     install_requires=[
+        'lxml',
         'numpy',
         'pandas==2.0.3',
         'pendulum==2.1.2',
         'python-dateutil==2.8.2',
         'pytz==2023.3',
+        'python-docx',
         'pytzdata==2020.1',
         'six==1.16.0',
         'tzdata==2023.3',
     ],
+    extras_require={
+        # Parse cache of SSIM files (models.ssim_cache), everything works without it
+        'cache': ['pyarrow'],
+    },
     include_package_data=True,  
+    # The reference data lives outside the packages, installs put it in <prefix>/share (see utils.file_helper)
+    data_files=[
+        ('share/landingpermit_app/data/industry', ['data/industry/airport_data.pkl', 'data/industry/country_rules.json']),
+    ],
+    entry_points={
+        # Installs the `landingpermit` command (inspect, countries, generate, diff, batch, serve)
+        'console_scripts': ['landingpermit = lib.cli:main'],
+    },
 )
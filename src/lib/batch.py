@@ -0,0 +1,88 @@
+# Processes a whole folder (or glob) of SSIM files in one run: each file is parsed in a worker of a process pool,
+# and gets its own permits tree under <output_dir>/<file name>/permits_output.
+#
+# The airport registry is loaded in the parent before the pool starts. With the fork start method, the workers
+# inherit it (a memory-mapped, read-only index) instead of each loading the reference data again.
+
+import glob
+import os
+import multiprocessing
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from lib.permit_generator import generate_documents
+from models.airport import airport_registry
+from models.ssim_file import SSIM_File
+from utils.instrumentation import instrumented, count
+
+# Outcome of one SSIM file: its permits ({key: PermitResult}, see generate_documents) once it was parsed, or the error that made it unreadable
+BatchResult = namedtuple('BatchResult', ['ssim_path', 'output_dir', 'permits', 'error'])
+
+
+def find_ssim_files(source):
+    """Returns the SSIM files of a directory (*.ssim), or matching a glob pattern, sorted by path."""
+
+    if os.path.isdir(source):
+        return sorted(str(path) for path in Path(source).glob('*.ssim'))
+    return sorted(path for path in glob.glob(source) if os.path.isfile(path))
+
+
+@instrumented('batch.process')
+def process_batch(source, airline_name, contact_person, output_dir=None, max_workers=None):
+    """
+    Generates the landing permits of every SSIM file of a directory or glob pattern.
+
+    Files are processed concurrently, one per worker, each worker generating the permits of its file serially.
+    A file that cannot be read (e.g. NUL filled, or without a carrier record) is reported in its result and
+    skipped, the rest of the batch goes on.
+
+    Args:
+        source (str): A directory (its *.ssim files are taken) or a glob pattern such as 'data/ssim/EY_*.ssim'.
+        airline_name (str): The name of the airline requesting the permits.
+        contact_person (str): The name of the contact person for the airline.
+        output_dir (str, optional): Root of the output, defaults to the working directory. The permits of
+            a file go to <output_dir>/<file name without extension>/permits_output.
+        max_workers (int, optional): Size of the process pool, defaults to the number of CPUs.
+            1 (or a single file) processes the files serially in this process.
+
+    Returns:
+        dict: {ssim_path: BatchResult}, in path order.
+    """
+
+    output_dir = os.path.abspath(output_dir or os.getcwd())
+    jobs = [
+        (ssim_path, os.path.join(output_dir, Path(ssim_path).stem), airline_name, contact_person)
+        for ssim_path in find_ssim_files(source)
+    ]
+    count('batch.files', len(jobs))
+
+    # Loaded once here, before the workers exist, so that they share it
+    airport_registry.get_country_map()
+
+    if max_workers == 1 or len(jobs) <= 1:
+        return {job[0]: _process_file(job) for job in jobs}
+
+    try:
+        # Fork where available, so the registry is inherited rather than reloaded by every worker
+        context = multiprocessing.get_context('fork') if 'fork' in multiprocessing.get_all_start_methods() else None
+        executor = ProcessPoolExecutor(max_workers=max_workers, mp_context=context)
+    except (OSError, NotImplementedError):
+        # No process support on this platform, fall back to a serial run
+        return {job[0]: _process_file(job) for job in jobs}
+
+    with executor:
+        return dict(zip((job[0] for job in jobs), executor.map(_process_file, jobs)))
+
+
+def _process_file(job):
+    ssim_path, output_dir, airline_name, contact_person = job
+    try:
+        ssim_file = SSIM_File(ssim_path)
+    except Exception as error:
+        return BatchResult(ssim_path, None, {}, f'{type(error).__name__}: {error}')
+
+    handler = ssim_file.flight_series_handler
+    permits = generate_documents(handler.get_unique_countries(), ssim_file, airline_name, contact_person, handler,
+                                 max_workers=1, output_dir=output_dir)
+    return BatchResult(ssim_path, output_dir, permits, None)
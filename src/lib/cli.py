@@ -0,0 +1,241 @@
+# Command line entry point, installed as `landingpermit` (see setup.py):
+#
+#     landingpermit inspect FILE [--validate] [--json]     time mode and period of a file, from its header only
+#     landingpermit countries FILE [--json]                countries served, with their number of series and flights
+#     landingpermit generate FILE --airline NAME --contact NAME [--countries AE JP] [--seasons [S25 ...]]
+#                                  [--zip ARCHIVE | --manifest]
+#     landingpermit diff BASE ALT [--generate --airline NAME --contact NAME]
+#     landingpermit batch FOLDER_OR_GLOB --airline NAME --contact NAME
+#     landingpermit serve [--socket PATH | --host HOST --port PORT]
+#
+# This module only imports the standard library. Every command imports what it needs when it runs, so `--help`
+# and `inspect` start without numpy, pandas, pendulum or docx (benchmarks/import_budget.py keeps it that way).
+# LANDINGPERMIT_TIMING_REPORT=<path> saves the stage timings of a run as JSON.
+
+import argparse
+import json
+import os
+import sys
+
+
+def main(argv=None):
+    parser = _build_parser()
+    args = parser.parse_args(argv)
+    if not getattr(args, 'command', None):
+        parser.print_help()
+        return 2
+
+    status = args.command(args)
+
+    report_path = os.environ.get('LANDINGPERMIT_TIMING_REPORT')
+    if report_path:
+        from utils import instrumentation
+        print(f'Timing report: {instrumentation.write_report(report_path)}')
+
+    return status or 0
+
+
+def _build_parser():
+    parser = argparse.ArgumentParser(prog='landingpermit', description='Landing permit requests from SSIM schedules')
+    commands = parser.add_subparsers(title='commands')
+
+    inspect = commands.add_parser('inspect', help='show the header of an SSIM file')
+    inspect.add_argument('ssim', help='SSIM file')
+    inspect.add_argument('--validate', action='store_true', help='also read every record and check the serial numbers and trailer')
+    inspect.add_argument('--json', action='store_true', help='print JSON')
+    inspect.set_defaults(command=inspect_command)
+
+    countries = commands.add_parser('countries', help='list the countries served by an SSIM file')
+    countries.add_argument('ssim', help='SSIM file')
+    countries.add_argument('--json', action='store_true', help='print JSON')
+    countries.set_defaults(command=countries_command)
+
+    generate = commands.add_parser('generate', help='generate the landing permits of an SSIM file')
+    generate.add_argument('ssim', help='SSIM file')
+    _add_permit_arguments(generate)
+    generate.add_argument('--countries', nargs='+', metavar='COUNTRY', help='only these countries (ISO codes)')
+    generate.add_argument('--seasons', nargs='*', metavar='SEASON',
+                          help='one permit per IATA season and country, for these seasons (e.g. S25), all of the file without values')
+    output = generate.add_mutually_exclusive_group()
+    output.add_argument('--zip', metavar='ARCHIVE', help='write every permit and a manifest.json into this zip archive')
+    output.add_argument('--manifest', action='store_true', help='also write permits_output/manifest.json')
+    generate.set_defaults(command=generate_command)
+
+    diff = commands.add_parser('diff', help='compare two SSIM files, optionally regenerating the permits that changed')
+    diff.add_argument('base', help='base SSIM file')
+    diff.add_argument('alt', help='alternate SSIM file')
+    diff.add_argument('--generate', action='store_true', help='generate the permits of the affected countries, from the alternate file')
+    _add_permit_arguments(diff, required=False)
+    diff.set_defaults(command=diff_command)
+
+    batch = commands.add_parser('batch', help='generate the permits of every SSIM file of a folder or glob pattern')
+    batch.add_argument('source', help="folder (its *.ssim files) or glob pattern, e.g. 'data/ssim/EY_*.ssim'")
+    _add_permit_arguments(batch)
+    batch.set_defaults(command=batch_command)
+
+    serve = commands.add_parser('serve', help='run the permit service (see lib/service.py)')
+    serve.add_argument('--host', default='127.0.0.1')
+    serve.add_argument('--port', type=int, default=8765)
+    serve.add_argument('--socket', help='serve on this Unix socket instead of a TCP port')
+    serve.add_argument('--workers', type=int, help='permits rendered at the same time, defaults to the number of CPUs')
+    serve.add_argument('--queue-size', type=int, default=16, help='jobs waiting before new ones are refused')
+    serve.set_defaults(command=serve_command)
+
+    return parser
+
+
+def _add_permit_arguments(parser, required=True):
+    parser.add_argument('--airline', required=required, help='name of the airline requesting the permits')
+    parser.add_argument('--contact', required=required, help='contact person signing the requests')
+    parser.add_argument('--output-dir', help='where the permits_output tree goes, defaults to the working directory')
+    parser.add_argument('--workers', type=int, help='size of the process pool, defaults to the number of CPUs')
+
+
+def inspect_command(args):
+    from models.ssim_header import read_carrier_record, parse_carrier_record
+
+    try:
+        attributes = parse_carrier_record(read_carrier_record(args.ssim))
+    except (OSError, ValueError) as error:
+        print(f'{args.ssim}: {error}', file=sys.stderr)
+        return 1
+    summary = {'file': args.ssim, **{name: value and str(value) for name, value in attributes.items()}}
+
+    status = 0
+    if args.validate:
+        from models.ssim_file_reader import SSIMFileReader
+        summary['validation'] = validation = SSIMFileReader(args.ssim).read().validation
+        if validation['serial_errors'] or validation['unknown_records'] or validation['trailer_check_ok'] is False \
+                or validation['trailer_end_ok'] is False:
+            status = 1
+
+    if args.json:
+        print(json.dumps(summary, indent=2))
+        return status
+
+    print(f"{'File:':<16}{summary['file']}")
+    print(f"{'Time mode:':<16}{summary['timezone_mode']}")
+    print(f"{'Period:':<16}{summary['start_date']} to {summary['end_date']}")
+    print(f"{'Exported:':<16}{summary['exported_date'] or '-'}")
+    if args.validate:
+        counts = validation['record_counts']
+        print(f"{'Records:':<16}" + ', '.join(f'{counts[record_type]} type {record_type}' for record_type in sorted(counts)))
+        print(f"{'Serial errors:':<16}{validation['serial_errors']}")
+        print(f"{'Trailer:':<16}" + ('missing' if not validation['trailer_found'] else
+                                    f"check {'ok' if validation['trailer_check_ok'] else 'wrong'}, "
+                                    f"end code {'ok' if validation['trailer_end_ok'] else 'wrong'}"))
+    return status
+
+
+def countries_command(args):
+    from models.ssim_file import SSIM_File
+
+    ssim_file = SSIM_File(args.ssim)
+    handler = ssim_file.flight_series_handler
+    # Open ended series fly until the end of the file
+    flights = handler.count_flights_by_country(ssim_file.end_date)
+    countries = {
+        country: {'series': len(handler.filter_by_country(country)), 'flights': flights.get(country, 0)}
+        for country in sorted(handler.get_unique_countries())
+    }
+
+    if args.json:
+        print(json.dumps(countries, indent=2))
+        return 0
+
+    print(f"{'Country':<10}{'Series':>8}{'Flights':>10}")
+    for country, counts in countries.items():
+        print(f"{country:<10}{counts['series']:>8}{counts['flights']:>10}")
+    return 0
+
+
+def generate_command(args):
+    from models.ssim_file import SSIM_File
+    from lib.permit_generator import generate_documents
+    from lib.permit_writer import DirectoryWriter, ZipWriter
+
+    ssim_file = SSIM_File(args.ssim)
+    # The SSIM file already built its flight series, reuse them rather than parsing twice
+    handler = ssim_file.flight_series_handler
+    countries = args.countries or handler.get_unique_countries()
+    seasons = args.seasons
+    if seasons is not None and not seasons:
+        seasons = handler.get_seasons()
+
+    with (ZipWriter(args.zip) if args.zip else DirectoryWriter(args.output_dir, manifest=args.manifest)) as writer:
+        results = generate_documents(countries, ssim_file, args.airline, args.contact, handler,
+                                     max_workers=args.workers, seasons=seasons, writer=writer)
+    return _print_results(results)
+
+
+def diff_command(args):
+    from lib.comparer import compare_ssim_files
+
+    diff = compare_ssim_files(args.base, args.alt)
+    print(f'{len(diff.added)} added, {len(diff.removed)} removed, {len(diff.modified)} modified series')
+    print(f'Affected countries: {sorted(diff.affected_countries)}')
+    if not args.generate:
+        return 0
+
+    if not (args.airline and args.contact):
+        print('--generate needs --airline and --contact', file=sys.stderr)
+        return 2
+
+    from models.ssim_file import SSIM_File
+    from lib.comparer import generate_changed_documents
+
+    results = generate_changed_documents(diff, SSIM_File(args.alt), args.airline, args.contact,
+                                         max_workers=args.workers, output_dir=args.output_dir)
+    return _print_results(results)
+
+
+def batch_command(args):
+    from lib.batch import process_batch
+
+    status = 0
+    for ssim_path, batch_result in process_batch(args.source, args.airline, args.contact,
+                                                 output_dir=args.output_dir, max_workers=args.workers).items():
+        if batch_result.error:
+            print(f'Skipped {ssim_path} ({batch_result.error})')
+            status = 1
+            continue
+        failed = [_permit_name(key) for key, result in batch_result.permits.items() if result.error]
+        print(f'{ssim_path}: {len(batch_result.permits) - len(failed)} permits in {batch_result.output_dir}'
+              + (f', failed for: {", ".join(failed)}' if failed else ''))
+        if failed:
+            status = 1
+    return status
+
+
+def serve_command(args):
+    import asyncio
+    from lib.service import PermitService, serve
+
+    service = PermitService(max_workers=args.workers, queue_size=args.queue_size)
+    try:
+        asyncio.run(serve(service, args.host, args.port, args.socket))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+def _print_results(results):
+    # The outcome of each permit, exit status 1 if any failed
+    status = 0
+    for key, result in results.items():
+        name = _permit_name(key)
+        if result.error:
+            print(f'Failed permit for: {name} ({result.error})')
+            status = 1
+        else:
+            print(f'Created permit for: {name} -> {result.path}')
+    return status
+
+
+def _permit_name(key):
+    # Results are keyed by country, or by (country, season or airport...) when split
+    return ' '.join(key) if isinstance(key, tuple) else key
+
+
+if __name__ == '__main__':
+    sys.exit(main())
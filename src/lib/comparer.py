@@ -1,4 +1,146 @@
-# TODO: what shall this be about?
-# ~The intention is that this will be used for the second part of the project, where we will 
-# Generate docs only for schedules that have changed. This file will be responsible for taking 
-# A base ssim and an alt ssim and outputing only the files that changed. 
\ No newline at end of file
+# Compares a base SSIM with an alternate one, so that permits are only regenerated for schedules that changed.
+# Series are matched with hash joins (pandas merges on integer row ids), never pair by pair, so two
+# files of tens of thousands of legs diff in a fraction of a second.
+
+import numpy as np
+import pandas as pd
+from collections import namedtuple
+
+from models.airport import airport_registry
+from models.ssim_file import SSIM_File
+from models.ssim_file_reader import SSIMFileReader
+
+# What identifies a flight series across two versions of a schedule
+KEY_COLUMNS = [
+    'Airline designator',
+    'Flight number',
+    'Dept Stn',
+    'Arvl Stn',
+    'Dept time (pax)',
+    'Arvl time (pax)',
+    'Equipment']
+
+# What can change on a series that is still the same series
+VALUE_COLUMNS = [
+    'Service Type',
+    'Eff',
+    'Dis',
+    'Day(s) of operation',
+    'Aircraft configuration']
+
+ScheduleDiff = namedtuple('ScheduleDiff', ['added', 'removed', 'modified', 'affected_countries'])
+
+
+def compare_schedules(base_df, alt_df):
+    """
+    Diffs two flight leg dataframes (as returned by SSIMFileReader.get_dataframe).
+
+    Legs present in both files with identical values are dropped first. What is left is matched on
+    KEY_COLUMNS: a key found in both files is a modified series, a key only in the base was removed
+    and a key only in the alternate was added. When a key has several series (e.g. different date
+    periods of the same flight), they are paired in file order.
+
+    Args:
+        base_df (pd.DataFrame): Legs of the base schedule.
+        alt_df (pd.DataFrame): Legs of the alternate schedule.
+
+    Returns:
+        ScheduleDiff: `added` and `removed` dataframes (KEY_COLUMNS then VALUE_COLUMNS), `modified` with the
+        key columns plus every value column twice (suffixed ' (base)' and ' (alt)'), and
+        `affected_countries`, the set of countries served by any of those series.
+    """
+
+    columns = KEY_COLUMNS + VALUE_COLUMNS
+    base = base_df[columns].reset_index(drop=True)
+    alt = alt_df[columns].reset_index(drop=True)
+
+    # Each leg is reduced to two integer ids (whole row, key columns) so the joins run on integers
+    base_hashes, alt_hashes = _leg_ids(base, alt)
+
+    # Exact matches, duplicates are counted so that two identical legs only cancel two legs
+    exact = base_hashes.merge(alt_hashes, on=['row', 'row_occurrence'], how='outer', suffixes=('_base', '_alt'), indicator=True)
+    base_changed = base_hashes.loc[exact.loc[exact['_merge'] == 'left_only', 'position_base'].astype(int)]
+    alt_changed = alt_hashes.loc[exact.loc[exact['_merge'] == 'right_only', 'position_alt'].astype(int)]
+
+    # Same series, different values. sort_index keeps file order for the pairing
+    base_changed = base_changed.sort_index().assign(key_occurrence=lambda df: df.groupby('key').cumcount())
+    alt_changed = alt_changed.sort_index().assign(key_occurrence=lambda df: df.groupby('key').cumcount())
+    matched = base_changed.merge(alt_changed, on=['key', 'key_occurrence'], how='outer', suffixes=('_base', '_alt'), indicator=True)
+
+    removed = _sorted(base.loc[matched.loc[matched['_merge'] == 'left_only', 'position_base'].astype(int)])
+    added = _sorted(alt.loc[matched.loc[matched['_merge'] == 'right_only', 'position_alt'].astype(int)])
+
+    pairs = matched.loc[matched['_merge'] == 'both']
+    base_values = base.loc[pairs['position_base'].astype(int)].reset_index(drop=True)
+    alt_values = alt.loc[pairs['position_alt'].astype(int), VALUE_COLUMNS].reset_index(drop=True)
+    modified = _sorted(pd.concat([
+        base_values[KEY_COLUMNS],
+        base_values[VALUE_COLUMNS].add_suffix(' (base)'),
+        alt_values.add_suffix(' (alt)')], axis=1))
+
+    stations = pd.concat([frame[['Dept Stn', 'Arvl Stn']] for frame in (added, removed, modified)]).stack()
+    affected_countries = set(stations.map(airport_registry.get_country_map()).dropna())
+
+    return ScheduleDiff(added, removed, modified, affected_countries)
+
+
+def compare_ssim_files(base_path, alt_path):
+    """Diffs two SSIM files. Only the leg tables are parsed, no flight series are built."""
+
+    col_data = SSIM_File._get_col_data()
+    base_df = SSIMFileReader(base_path).get_dataframe(base_path, *col_data)
+    alt_df = SSIMFileReader(alt_path).get_dataframe(alt_path, *col_data)
+
+    return compare_schedules(base_df, alt_df)
+
+
+def generate_changed_documents(diff, alt_ssim_file, airline_name, contact_person, max_workers=None, output_dir=None):
+    """
+    Generates permits from the alternate schedule, only for the countries affected by the diff.
+
+    Countries that are no longer served at all in the alternate schedule get no document.
+
+    Returns:
+        dict: {key: PermitResult}, as generate_documents.
+    """
+    from lib.permit_generator import generate_documents
+
+    handler = alt_ssim_file.flight_series_handler
+    countries = diff.affected_countries & handler.get_unique_countries()
+
+    return generate_documents(countries, alt_ssim_file, airline_name, contact_person, handler, max_workers, output_dir)
+
+
+def _leg_ids(base, alt):
+    """
+    Gives every leg of both frames a key id and a row id: equal ids if and only if equal values.
+
+    Each column is factorized once over both frames, then the columns are folded into a single id one
+    at a time (id * cardinality + code, re-factorized so it never overflows).
+    """
+
+    legs = pd.concat([base, alt], ignore_index=True)
+    codes = {column: pd.factorize(legs[column].to_numpy())[0] for column in legs.columns}
+
+    def group_ids(code_arrays):
+        ids = np.zeros(len(legs), dtype=np.int64)
+        for code_array in code_arrays:
+            # NaN is factorized to -1, hence the +1 (and the initial -1, for two empty schedules)
+            ids = pd.factorize(ids * (code_array.max(initial=-1) + 2) + (code_array + 1))[0]
+        return ids
+
+    key = group_ids(codes[column] for column in KEY_COLUMNS)
+    row = group_ids([key] + [codes[column] for column in VALUE_COLUMNS])
+
+    ids = pd.DataFrame({'row': row, 'key': key, 'position': np.arange(len(legs))})
+    ids.loc[len(base):, 'position'] -= len(base)
+    ids['row_occurrence'] = ids.groupby([ids.index >= len(base), 'row']).cumcount()
+
+    base_ids = ids.iloc[:len(base)]
+    alt_ids = ids.iloc[len(base):].set_index('position', drop=False).rename_axis(None)
+    return base_ids, alt_ids
+
+
+def _sorted(df):
+    # Deterministic output, whatever order the merges produced
+    return df.sort_values(KEY_COLUMNS, kind='stable').reset_index(drop=True)
@@ -1,19 +1,19 @@
-import sys
-import os
-import pandas as pd
-from pathlib import Path
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
 
-# TODO: install lib as package instead
-# This will get the path to the parent directory of the current directory (i.e., landingpermit_app)
-sys.path.append(str(Path(__file__).resolve().parent.parent))
+from models.iata_season import IATA_Season
+from models.seasons_handler import DateSeasonHandler
+from models.country_handler import country_registry
+from lib.permit_template import render_permit
+from lib.permit_writer import DirectoryWriter
+from utils.instrumentation import span, count, instrumented
 
-from models import flight_series_handler, airport, flight_series, ssim_file
 
-
-from docx import Document
-from docx.shared import Inches
+# Outcome of one permit in a batch run: where it was saved, or the error that stopped it
+PermitResult = namedtuple('PermitResult', ['country', 'path', 'error', 'season', 'airport'], defaults=[None, None])
 
 
+@instrumented('permit.generate_document')
 def generate_document(country, ssim_file, airline_name, contact_person, handler): # TODO: add type hints?
     # TODO: add docstring
     
@@ -36,58 +36,171 @@ def generate_document(country, ssim_file, airline_name, contact_person, handler)
         None: The function creates and saves a .docx file but does not return any value.
     """
     
-    start_date = ssim_file.start_date
-    end_date = ssim_file.end_date
-
-    # Initialize python docx document
-    doc = Document()
-
-    # Add the static content
-    doc.add_heading('Request for Landing Permit', 0)
-
-    # Add a first paragraph with sample content
-    doc.add_paragraph(
-        ("Dear Sir/Madam,\n\n"
-         "I am writing to request a landing permit for {country} "
-         "for the period {start_date} to {end_date}.\n\n"
-         "{airline_name} is a scheduled airline operating flights to {country}.\n\n"
-         "We are planning to operate the following flights to {country}:").format(
-             country=country, 
-             start_date=start_date.strftime('%d %B %Y'), 
-             end_date=end_date.strftime('%d %B %Y'), 
-             airline_name=airline_name)
-    )
-
     # Filter flight series by country using the handler
     flight_series = handler.filter_by_country(country)
+    rows = [fs.to_dict() for fs in flight_series]
 
-    # Convert filtered flight series to DataFrame (assuming you have a method in FlightSeries object to return its data as a dict)
-    data_dicts = [fs.to_dict() for fs in flight_series]
-    df = pd.DataFrame(data_dicts)
+    with span('permit.render'):
+        document = render_permit(country, ssim_file.start_date, ssim_file.end_date, rows, airline_name, contact_person)
+    with DirectoryWriter() as writer:
+        writer.write(document, country)
 
-    # Add a table with the flight series
-    t = doc.add_table(df.shape[0] + 1, df.shape[1])
-    
-    # Add column headers
-    for j, column in enumerate(df.columns):
-        t.cell(0, j).text = column
-        
-    # Populate rest of the table with the flight series data
-    for i in range(df.shape[0]):
-        for j in range(df.shape[1]):
-            t.cell(i + 1, j).text = str(df.values[i, j])
-
-    # Add a line break after the table
-    doc.add_paragraph("\n")
-
-    # Add signature paragraph
-    doc.add_paragraph(f'Sincerely, {contact_person}')
-
-    # Ensure directory structure exists before saving
-    base_directory = os.path.join(os.getcwd(), "permits_output")
-    country_directory = os.path.join(base_directory, country)
-    
-    if not os.path.exists(country_directory):
-        os.makedirs(country_directory)
-        
-    doc.save(os.path.join(country_directory, f'landing_permit_{country}.docx'))
+
+@instrumented('permit.generate_documents')
+def generate_documents(countries, ssim_file, airline_name, contact_person, handler, max_workers=None, output_dir=None, seasons=None,
+                       writer=None):
+    """
+    Generates the landing permit documents of several countries, spread over a pool of processes.
+
+    Each worker only receives what its document needs (the file's date range and the country's flight 
+    series as plain dicts), never the SSIM_File or the handler, and sends back the rendered document. 
+    This process stores the documents through one writer as they come, so a run makes one archive or one 
+    directory per country rather than every worker creating its own files. A failure on one permit is 
+    recorded in its result and does not stop the others.
+
+    How a country's flights are split into permits is its grouping rule in the country registry 
+    (models/country_handler.py): one permit for the country (the default), one per airport or one per season.
+
+    Args:
+        countries (iterable of str): The countries to generate permits for.
+        ssim_file (SSIM_File): An object representing the SSIM file containing flight data.
+        airline_name (str): The name of the airline requesting the permit.
+        contact_person (str): The name of the contact person for the airline.
+        handler (FlightSeriesHandler): A handler object to process flight series data.
+        max_workers (int, optional): Size of the process pool, defaults to the number of CPUs. 
+            1 (or a single permit) generates the documents serially in this process.
+        output_dir (str, optional): Where the permits_output tree goes, defaults to the working directory.
+            Ignored when a writer is given.
+        seasons (iterable of str or IATA_Season, optional): Generate one permit per season and country 
+            instead of one per country, only for these seasons. Each covers the season (within the file's 
+            date range) and lists the series clipped to it. Seasons without flights to a country are skipped.
+        writer (PermitWriter, optional): Where the documents go, e.g. a ZipWriter. The caller closes it.
+            Defaults to a DirectoryWriter of output_dir, closed here.
+
+    Returns:
+        dict: {key: PermitResult}, keyed as permit_inputs().
+    """
+
+    inputs = permit_inputs(countries, ssim_file, handler, seasons)
+    jobs = [
+        (country, start_date, end_date, rows, airline_name, contact_person)
+        for country, season, airport, start_date, end_date, rows in inputs.values()
+    ]
+    count('permit.jobs', len(jobs))
+
+    if writer is None:
+        with DirectoryWriter(output_dir) as writer:
+            return _store_permits(inputs, _render_permits(jobs, max_workers), writer)
+    return _store_permits(inputs, _render_permits(jobs, max_workers), writer)
+
+
+def permit_inputs(countries, ssim_file, handler, seasons=None):
+    """
+    Returns what each permit of generate_documents() lists, as plain data that can be sent to another process.
+
+    A country grouped by season (see the country registry) gets a permit per season of the file, one grouped 
+    by airport a permit per airport it has flights at. Given seasons split every country by season, and 
+    only those seasons. Split permits without any flight are left out.
+
+    Returns:
+        dict: {key: (country, season, airport, start_date, end_date, rows)}, with season and airport None 
+            when not split by them. The key is the country for a permit of the whole country, else the 
+            tuple of what it is split by, e.g. ('JP', 'S25') or ('JP', 'NRT'). In country order, or in 
+            season then country order when seasons are given. `rows` are the series as FlightSeries.to_dict().
+    """
+
+    # Season names only carry two digits of the year, they are dated from the file's period (or the given
+    # IATA_Season), not read as 20xx
+    dated_seasons = {season.name: season for season in DateSeasonHandler(ssim_file.start_date, ssim_file.end_date).get_iata_seasons()}
+    if seasons is not None:
+        dated_seasons.update((season.name, season) for season in seasons if isinstance(season, IATA_Season))
+        seasons = [getattr(season, 'name', season) for season in seasons]
+
+    inputs = {}
+    for country in sorted(countries):
+        grouping = country_registry.get_country(country).grouping
+        country_seasons = seasons if seasons is not None else handler.get_seasons() if grouping == 'season' else [None]
+        airports = sorted(handler.get_unique_airports(country)) if grouping == 'airport' else [None]
+
+        for season in country_seasons:
+            if season is None:
+                start_date, end_date = ssim_file.start_date, ssim_file.end_date
+                flight_series = handler.filter_by_country(country)
+            else:
+                iata_season = dated_seasons.get(season) or IATA_Season(season)
+                start_date = max(ssim_file.start_date, iata_season.start_date)
+                end_date = min(ssim_file.end_date, iata_season.end_date)
+                flight_series = handler.filter_by_season_and_country(season, country)
+
+            for airport in airports:
+                rows = [
+                    fs.to_dict() for fs in flight_series
+                    if airport is None or airport in (fs.departure_station.iata_code, fs.arrival_station.iata_code)
+                ]
+                split_by = tuple(part for part in (season, airport) if part)
+                if split_by and not rows:
+                    continue
+                inputs[(country,) + split_by if split_by else country] = (country, season, airport, start_date, end_date, rows)
+
+    if seasons is not None:
+        # Stable sort, countries stay in order within a season
+        position = {season: index for index, season in enumerate(seasons)}
+        inputs = dict(sorted(inputs.items(), key=lambda item: position[item[1][1]]))
+    return inputs
+
+
+def _render_permits(jobs, max_workers):
+    # Yields (document, error) of each job, in order
+    if max_workers == 1 or len(jobs) <= 1:
+        return map(_render_permit_job, jobs)
+
+    try:
+        executor = ProcessPoolExecutor(max_workers=max_workers)
+    except (OSError, NotImplementedError):
+        # No process support on this platform, fall back to a serial run
+        return map(_render_permit_job, jobs)
+
+    def results():
+        with executor:
+            yield from executor.map(_render_permit_job, jobs)
+    return results()
+
+
+def _render_permit_job(job):
+    try:
+        with span('permit.render'):
+            return render_permit(*job), None
+    except Exception as error:
+        return None, f'{type(error).__name__}: {error}'
+
+
+def _store_permits(inputs, rendered, writer):
+    results = {}
+    for (key, (country, season, airport, *_)), (document, error) in zip(inputs.items(), rendered):
+        if error is None:
+            try:
+                results[key] = PermitResult(country, writer.write(document, country, season, airport), None, season, airport)
+                continue
+            except OSError as write_error:
+                error = f'{type(write_error).__name__}: {write_error}'
+        results[key] = PermitResult(country, None, error, season, airport)
+    return results
+
+
+@instrumented('permit.render_document')
+def render_document(country, start_date, end_date, flight_series, airline_name, contact_person):
+    """
+    Renders the landing permit of a country in memory, for callers that serve it rather than save it.
+
+    Args:
+        country (str): The country for which the landing permit is requested.
+        start_date, end_date (date or datetime): The period covered by the permit.
+        flight_series (list of FlightSeries): The series to list in the permit.
+        airline_name (str): The name of the airline requesting the permit.
+        contact_person (str): The name of the contact person for the airline.
+
+    Returns:
+        bytes: The .docx file.
+    """
+
+    return render_permit(country, start_date, end_date, [fs.to_dict() for fs in flight_series], airline_name, contact_person)
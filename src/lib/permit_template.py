@@ -0,0 +1,223 @@
+# Precompiled permit templates: a permit format is loaded and prepared once, then every permit only fills it in.
+#
+# A template is a .docx whose text holds placeholders ({country}, {start_date}, {end_date}, {airline_name},
+# {contact_person}) and a paragraph reading {flight_table} where the flight table goes. Compiling it:
+#   - replaces the {flight_table} paragraph with a table (header row, plus one prototype data row),
+#   - remembers which text elements hold placeholders,
+#   - keeps every part of the package but word/document.xml as an already compressed zip.
+# Rendering a permit then copies the document element, fills the placeholders and the table rows, and appends the
+# serialized document.xml to a copy of that zip. Styles, theme, settings... are never parsed or compressed again,
+# so the cost of a permit grows with its number of flights, not with the size of the format.
+#
+# Formats can be overridden per country: register_template('JP', 'path/to/japan.docx'), the "template" of the
+# country's rules (see models/country_handler.py), or a <COUNTRY>.docx file in the template directory
+# (LANDINGPERMIT_TEMPLATE_DIR, by default data/templates). Relative rule paths are read from that directory too. Compiled templates are cached
+# by source, countries sharing a format share one template.
+
+import io
+import os
+import re
+import copy
+import zipfile
+
+from docx import Document
+from docx.oxml.ns import qn
+from lxml import etree
+
+from models.country_handler import country_registry
+from utils.file_helper import get_data_dir
+from utils.instrumentation import span, count
+
+PLACEHOLDERS = ('country', 'start_date', 'end_date', 'airline_name', 'contact_person')
+TABLE_PLACEHOLDER = '{flight_table}'
+_PLACEHOLDER_PATTERN = re.compile('{(' + '|'.join(PLACEHOLDERS) + ')}')
+
+# Columns of the flight table, as FlightSeries.to_dict()
+FLIGHT_TABLE_COLUMNS = [
+    'Airline designator', 'Flight number', 'Service Type', 'Eff', 'Dis', 'Day(s) of operation',
+    'Dept Stn', 'Dept time (pax)', 'Arvl Stn', 'Arvl time (pax)', 'Equipment', 'Aircraft configuration']
+
+DATE_FORMAT = '%d %B %Y'
+
+_DOCUMENT_PART = 'word/document.xml'
+
+_templates = {}
+_overrides = {}
+
+
+class PermitTemplate:
+    '''
+    A compiled permit format. Build it once (get_template() caches them) and call render() for every permit.
+
+    Args:
+        source (str, optional): Path of a .docx format, None for the default layout.
+        columns (list of str, optional): Columns of the flight table, defaults to FLIGHT_TABLE_COLUMNS.
+    '''
+
+    def __init__(self, source=None, columns=None):
+        self.source = source
+        self.columns = list(columns or FLIGHT_TABLE_COLUMNS)
+        with span('template.compile'):
+            self._compile(Document(source) if source else _default_document())
+
+    def render(self, values, rows):
+        """
+        Fills the template and returns the .docx file as bytes.
+
+        Args:
+            values (dict): Text of each placeholder, e.g. {'country': 'JP', 'start_date': '01 January 2025', ...}.
+            rows (list of list of str): The flight table, one list of cell texts per flight series, in column order.
+        """
+
+        document = copy.deepcopy(self._document)
+
+        texts = list(document.iter(qn('w:t')))
+        for position, template_text in self._placeholder_texts:
+            # One pass, so that a value containing braces is never read as a placeholder itself
+            texts[position].text = _PLACEHOLDER_PATTERN.sub(lambda match: str(values.get(match.group(1), '')), template_text)
+
+        if self._table_position is not None:
+            table = list(document.iter(qn('w:tbl')))[self._table_position]
+            _fill_rows(table, rows)
+
+        xml = etree.tostring(document, encoding='UTF-8', standalone=True)
+        buffer = io.BytesIO(self._package)
+        with zipfile.ZipFile(buffer, 'a', zipfile.ZIP_DEFLATED) as package:
+            package.writestr(_DOCUMENT_PART, xml)
+        count('template.renders')
+        return buffer.getvalue()
+
+    def _compile(self, doc):
+        # The flight table replaces its placeholder paragraph, header row and one prototype row built by python-docx
+        self._table_position = None
+        for paragraph in doc.paragraphs:
+            if paragraph.text.strip() == TABLE_PLACEHOLDER:
+                table = doc.add_table(1, len(self.columns))
+                for cell, column in zip(table.rows[0].cells, self.columns):
+                    cell.text = column
+                for cell in table.add_row().cells:
+                    cell.text = 'x'
+                paragraph._p.addnext(table._tbl)
+                paragraph._p.getparent().remove(paragraph._p)
+                self._table_position = list(doc.element.iter(qn('w:tbl'))).index(table._tbl)
+                break
+
+        # Word often splits a placeholder over several runs, those paragraphs are merged into their first run
+        for paragraph in _iter_paragraphs(doc):
+            text = paragraph.text
+            split = any(
+                text.count(placeholder) > sum(run.text.count(placeholder) for run in paragraph.runs)
+                for placeholder in ('{' + name + '}' for name in PLACEHOLDERS))
+            if split:
+                for run in paragraph.runs[1:]:
+                    run._r.getparent().remove(run._r)
+                paragraph.runs[0].text = text
+
+        self._placeholder_texts = [
+            (position, text_element.text)
+            for position, text_element in enumerate(doc.element.iter(qn('w:t')))
+            if text_element.text and _PLACEHOLDER_PATTERN.search(text_element.text)
+        ]
+        self._document = doc.element
+
+        # Every part but the document, compressed once
+        saved = io.BytesIO()
+        doc.save(saved)
+        package = io.BytesIO()
+        with zipfile.ZipFile(saved) as source_package, zipfile.ZipFile(package, 'w', zipfile.ZIP_DEFLATED) as target_package:
+            for item in source_package.infolist():
+                if item.filename != _DOCUMENT_PART:
+                    target_package.writestr(item, source_package.read(item.filename))
+        self._package = package.getvalue()
+
+
+def get_template(country=None):
+    """Returns the compiled template of a country: its registered or template directory override, else the default."""
+
+    source = _template_source(country)
+    template = _templates.get(source)
+    if template is None:
+        template = _templates[source] = PermitTemplate(source)
+    return template
+
+
+def register_template(country, source):
+    """Uses the .docx format at `source` for the permits of `country` (None to go back to the default)."""
+
+    if source is None:
+        _overrides.pop(country, None)
+    else:
+        _overrides[country] = os.fspath(source)
+
+
+def clear_templates():
+    """Drops the compiled templates, e.g. after a format file was edited."""
+    _templates.clear()
+
+
+def render_permit(country, start_date, end_date, rows, airline_name, contact_person):
+    """Renders one permit with the template of its country. `rows` are dicts as FlightSeries.to_dict(). Returns bytes."""
+
+    template = get_template(country)
+    values = {
+        'country': country,
+        'start_date': start_date.strftime(DATE_FORMAT),
+        'end_date': end_date.strftime(DATE_FORMAT),
+        'airline_name': airline_name,
+        'contact_person': contact_person,
+    }
+    return template.render(values, [[str(row[column]) for column in template.columns] for row in rows])
+
+
+def _template_source(country):
+    if country in _overrides:
+        return _overrides[country]
+    if country:
+        template_dir = os.environ.get('LANDINGPERMIT_TEMPLATE_DIR', get_data_dir() / 'templates')
+        # The format named by the country's rules, else a <COUNTRY>.docx file
+        template = country_registry.get_country(country).template
+        path = os.path.join(template_dir, template or f'{country}.docx')
+        if template or os.path.exists(path):
+            return path
+    return None
+
+
+def _default_document():
+    # The historical permit layout, with placeholders
+    doc = Document()
+    doc.add_heading('Request for Landing Permit', 0)
+    doc.add_paragraph(
+        "Dear Sir/Madam,\n\n"
+        "I am writing to request a landing permit for {country} "
+        "for the period {start_date} to {end_date}.\n\n"
+        "{airline_name} is a scheduled airline operating flights to {country}.\n\n"
+        "We are planning to operate the following flights to {country}:")
+    doc.add_paragraph(TABLE_PLACEHOLDER)
+    doc.add_paragraph("\n")
+    doc.add_paragraph('Sincerely, {contact_person}')
+    return doc
+
+
+def _iter_paragraphs(doc):
+    yield from doc.paragraphs
+    for table in doc.tables:
+        for row in table.rows:
+            for cell in row.cells:
+                yield from cell.paragraphs
+
+
+def _fill_rows(table, rows):
+    # Copies of the prototype row with the texts swapped, the same XML as filling the cells with python-docx
+    prototype = table.findall(qn('w:tr'))[-1]
+    table.remove(prototype)
+
+    for values in rows:
+        tr = copy.deepcopy(prototype)
+        if any(not value or value != value.strip() or '\n' in value or '\t' in value for value in values):
+            # Empty or whitespace sensitive text, python-docx lays out the run itself
+            for r, value in zip(tr.iter(qn('w:r')), values):
+                r.text = value
+        else:
+            for text_element, value in zip(tr.iter(qn('w:t')), values):
+                text_element.text = value
+        table.append(tr)
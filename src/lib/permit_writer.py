@@ -0,0 +1,135 @@
+# Where generated permits go. Permits are rendered in memory (see permit_template), a writer then stores them:
+#
+#   DirectoryWriter(output_dir)         the permits_output/<country>/landing_permit_....docx tree, as always
+#   DirectoryWriter(output_dir, True)   the same, plus a permits_output/manifest.json indexing every file
+#   ZipWriter(path)                     one archive holding every permit and its manifest.json
+#
+# A run of hundreds of permits then makes one file (or one directory per country) instead of a file creation,
+# a directory check and a close per permit. The manifest lists, for each permit, its file, what it covers
+# (country, season, airport), where it goes (authority, email, from the country registry), its size and sha256.
+
+import os
+import json
+import hashlib
+import zipfile
+
+from models.country_handler import country_registry
+from utils.instrumentation import span, count
+
+MANIFEST_NAME = 'manifest.json'
+
+
+def permit_file_name(country, season=None, airport=None):
+    """Returns the path of a permit inside the output, e.g. 'JP/landing_permit_JP_NRT_S25.docx'."""
+    file_name = '_'.join(['landing_permit', country] + [part for part in (airport, season) if part])
+    return f'{country}/{file_name}.docx'
+
+
+class PermitWriter:
+    '''
+    Base of the permit writers. Use it as a context manager, or call close() once every permit is written.
+
+    Subclasses implement _store(member, document), which saves one document under its relative path and
+    returns its location.
+    '''
+
+    def __init__(self):
+        self.entries = []
+
+    def write(self, document, country, season=None, airport=None):
+        """Stores a permit (the .docx as bytes) and returns where it went."""
+
+        member = permit_file_name(country, season, airport)
+        with span('permit.save'):
+            location = self._store(member, document)
+        count('permit.saved_bytes', len(document))
+
+        rules = country_registry.get_country(country)
+        self.entries.append({
+            'file': member,
+            'country': country,
+            'season': season,
+            'airport': airport,
+            'authority': rules.authority,
+            'email': rules.email,
+            'format': rules.format,
+            'size': len(document),
+            'sha256': hashlib.sha256(document).hexdigest(),
+        })
+        return location
+
+    def manifest(self):
+        """Returns the manifest of the permits written so far, as JSON."""
+        return json.dumps({'permits': self.entries}, indent=2)
+
+    def close(self):
+        pass
+
+    def _store(self, member, document):
+        raise NotImplementedError
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class DirectoryWriter(PermitWriter):
+    '''
+    Writes the permits to <output_dir>/permits_output/<country>/, each country's directory created once.
+
+    Args:
+        output_dir (str, optional): Where the permits_output tree goes, defaults to the working directory.
+        manifest (bool): Also write permits_output/manifest.json on close.
+    '''
+
+    def __init__(self, output_dir=None, manifest=False):
+        super().__init__()
+        self.base_directory = os.path.join(os.path.abspath(output_dir or os.getcwd()), 'permits_output')
+        self.write_manifest = manifest
+        self._directories = set()
+
+    def _store(self, member, document):
+        path = os.path.join(self.base_directory, *member.split('/'))
+        directory = os.path.dirname(path)
+        if directory not in self._directories:
+            os.makedirs(directory, exist_ok=True)
+            self._directories.add(directory)
+        with open(path, 'wb') as permit_file:
+            permit_file.write(document)
+        return path
+
+    def close(self):
+        if self.write_manifest and self.entries:
+            with open(os.path.join(self.base_directory, MANIFEST_NAME), 'w') as manifest_file:
+                manifest_file.write(self.manifest())
+
+
+class ZipWriter(PermitWriter):
+    '''
+    Streams the permits into one zip archive, with their manifest.json written last, on close.
+
+    The documents are stored as they are: a .docx is already a compressed zip, deflating it again only costs time.
+    The location of a permit is <path>/<country>/<file name>, its path inside the archive.
+
+    Args:
+        path (str): The archive to create (replaced if it exists).
+    '''
+
+    def __init__(self, path):
+        super().__init__()
+        self.path = os.path.abspath(path)
+        directory = os.path.dirname(self.path)
+        os.makedirs(directory, exist_ok=True)
+        self._archive = zipfile.ZipFile(self.path, 'w', zipfile.ZIP_STORED)
+
+    def _store(self, member, document):
+        self._archive.writestr(member, document)
+        return os.path.join(self.path, member)
+
+    def close(self):
+        if self._archive.fp is None:
+            return
+        self._archive.writestr(MANIFEST_NAME, self.manifest())
+        self._archive.close()
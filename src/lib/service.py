@@ -0,0 +1,435 @@
+# Headless permit service: a long running local process that ops tooling drives over HTTP, on a TCP port or a
+# Unix socket. It keeps what a cold `python main.py` reloads every time warm: the airport registry, the parsed
+# SSIM files (by content hash) and a pool of workers that already imported docx and compiled the permit template.
+#
+#     POST /ssim                          the SSIM file as body
+#                                         -> {"ssim_id", "start_date", "end_date", "countries", "seasons"}
+#     POST /jobs                          {"ssim_id", "airline_name", "contact_person", "countries"?, "seasons"?}
+#                                         -> 202 {"job_id", ...}, or 503 with Retry-After when the queue is full
+#     GET  /jobs/<job_id>                 the job and the state of each of its permits
+#     GET  /jobs/<job_id>/events          newline delimited JSON, one line per permit as it finishes, until the job is over
+#     GET  /jobs/<job_id>/permits/<name>  the .docx of a finished permit (<name> is the country, or e.g. country_season)
+#     GET  /health
+#
+# Jobs wait in a bounded queue and run one permit per task in a process pool, at most `max_workers` at a time.
+# Nothing leaves the machine, it can be run and exercised fully offline:
+#
+#     landingpermit serve --socket /tmp/landingpermit.sock
+#     curl --unix-socket /tmp/landingpermit.sock --data-binary @data/ssim/EY_SSIM.ssim http://localhost/ssim
+
+import os
+import json
+import uuid
+import asyncio
+import hashlib
+import tempfile
+import multiprocessing
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from lib.permit_generator import permit_inputs
+from lib.permit_template import render_permit, get_template
+from models.airport import airport_registry
+from models.country_handler import country_registry
+from models.ssim_file import SSIM_File
+from utils.file_helper import get_cache_dir
+from utils.instrumentation import span, count
+
+DEFAULT_PORT = 8765
+MAX_UPLOAD_BYTES = 256 * 2 ** 20
+MAX_HEADER_LINES = 100
+
+_REASONS = {200: 'OK', 202: 'Accepted', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+            413: 'Payload Too Large', 422: 'Unprocessable Entity', 500: 'Internal Server Error', 503: 'Service Unavailable'}
+
+
+class ServiceError(Exception):
+    '''An error reported to the client, with its HTTP status.'''
+
+    def __init__(self, status, message, headers=None):
+        super().__init__(message)
+        self.status = status
+        self.headers = headers or {}
+
+
+class Job:
+    '''
+    The permits of one SSIM file for one airline. Every permit goes 'queued', 'running', then 'done' or 'failed';
+    the job itself is 'queued', 'running', then 'done' once all its permits are.
+    '''
+
+    def __init__(self, ssim_id, airline_name, contact_person, inputs):
+        self.job_id = uuid.uuid4().hex
+        self.ssim_id = ssim_id
+        self.airline_name = airline_name
+        self.contact_person = contact_person
+        # {permit name: (country, season, airport, start_date, end_date, rows)}, the rows are dropped once rendered
+        self.inputs = {_permit_name(key): permit for key, permit in inputs.items()}
+        self.states = {name: 'queued' for name in self.inputs}
+        self.errors = {}
+        self.documents = {}
+        self.state = 'queued'
+        # Every change, in order, so that a client streaming the events can start at any time
+        self.events = []
+        self._changed = asyncio.Condition()
+
+    async def _set(self, name, state, error=None):
+        self.states[name] = state
+        if error:
+            self.errors[name] = error
+        await self._publish(self._permit_status(name))
+
+    async def _finish(self, error=None):
+        # An error stops the job: the permits it did not get to fail with it
+        if error:
+            for name, state in self.states.items():
+                if state in ('queued', 'running'):
+                    self.states[name] = 'failed'
+                    self.errors[name] = error
+        self.state = 'done'
+        event = {'job_id': self.job_id, 'state': 'done', 'done': len(self.documents), 'failed': len(self.errors)}
+        if error:
+            event['error'] = error
+        await self._publish(event)
+
+    async def _publish(self, event):
+        async with self._changed:
+            self.events.append(event)
+            self._changed.notify_all()
+
+    async def stream(self):
+        """Yields every event of the job, past ones first, until the job is done."""
+
+        position = 0
+        while True:
+            async with self._changed:
+                await self._changed.wait_for(lambda: position < len(self.events))
+                events = self.events[position:]
+            position += len(events)
+            for event in events:
+                yield event
+            if self.state == 'done' and position == len(self.events):
+                return
+
+    def status(self):
+        return {
+            'job_id': self.job_id,
+            'ssim_id': self.ssim_id,
+            'state': self.state,
+            'permits': {name: self._permit_status(name) for name in self.states},
+        }
+
+    def _permit_status(self, name):
+        country, season, airport = self.inputs[name][:3]
+        status = {'job_id': self.job_id, 'permit': name, 'country': country, 'season': season, 'airport': airport,
+                  'state': self.states[name]}
+        if name in self.errors:
+            status['error'] = self.errors[name]
+        if name in self.documents:
+            status['url'] = f'/jobs/{self.job_id}/permits/{name}'
+        return status
+
+
+class PermitService:
+    '''
+    The state and the job queue of the service, usable without any server: `await service.add_ssim(content)`,
+    `await service.submit(...)`, then `async for event in job.stream()` and `job.documents`.
+
+    Args:
+        max_workers (int, optional): Permits rendered at the same time, and size of the process pool.
+            Defaults to the number of CPUs.
+        queue_size (int): Jobs waiting to run. Beyond that submit() refuses new jobs (503 over HTTP)
+            rather than letting the backlog grow without bound.
+        max_ssim_files (int): Parsed SSIM files kept in memory, least recently used ones are dropped first.
+        max_jobs (int): Jobs (and their documents) kept in memory, the oldest finished ones are dropped first.
+    '''
+
+    def __init__(self, max_workers=None, queue_size=16, max_ssim_files=8, max_jobs=256):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.queue_size = queue_size
+        self.max_ssim_files = max_ssim_files
+        self.max_jobs = max_jobs
+        self.ssim_files = OrderedDict()
+        self.jobs = OrderedDict()
+        self._queue = None
+        self._slots = None
+        self._executor = None
+        self._runners = []
+
+    async def start(self):
+        self._queue = asyncio.Queue(self.queue_size)
+        self._slots = asyncio.Semaphore(self.max_workers)
+
+        loop = asyncio.get_running_loop()
+        # Compiled before the workers exist, so that they inherit it, with the country rules it reads
+        country_registry.codes()
+        get_template()
+
+        try:
+            # Fork where available, the pool then starts all its workers on the first task, here, before
+            # any other thread of this process is running
+            context = multiprocessing.get_context('fork') if 'fork' in multiprocessing.get_all_start_methods() else None
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers, mp_context=context)
+            await loop.run_in_executor(self._executor, _warm_worker)
+        except (OSError, NotImplementedError):
+            # No process support on this platform, render in threads instead
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers)
+
+        # Reference data is loaded now rather than on the first upload
+        await loop.run_in_executor(None, airport_registry.get_country_map)
+
+        # Enough runners to keep every worker busy, even with jobs of a single permit
+        self._runners = [asyncio.create_task(self._run_jobs()) for _ in range(self.max_workers)]
+
+    async def close(self):
+        for runner in self._runners:
+            runner.cancel()
+        await asyncio.gather(*self._runners, return_exceptions=True)
+        self._runners = []
+        if self._executor:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    async def add_ssim(self, content):
+        """Parses an SSIM file (bytes), unless the same content is loaded already. Returns its summary."""
+
+        ssim_id = hashlib.sha256(content).hexdigest()
+        ssim_file = self.ssim_files.get(ssim_id)
+        if ssim_file is None:
+            # The parser reads files, the upload only lives on disk while it is parsed
+            handle, path = tempfile.mkstemp(suffix='.ssim', dir=get_cache_dir('uploads') or get_cache_dir())
+            try:
+                with os.fdopen(handle, 'wb') as upload:
+                    upload.write(content)
+                ssim_file = await asyncio.get_running_loop().run_in_executor(None, _load_ssim, path)
+            except ValueError as error:
+                raise ServiceError(422, f'Not a readable SSIM file: {error}')
+            finally:
+                os.unlink(path)
+            self.ssim_files[ssim_id] = ssim_file
+            while len(self.ssim_files) > self.max_ssim_files:
+                self.ssim_files.popitem(last=False)
+        self.ssim_files.move_to_end(ssim_id)
+
+        handler = ssim_file.flight_series_handler
+        return {
+            'ssim_id': ssim_id,
+            'start_date': ssim_file.start_date.isoformat(),
+            'end_date': ssim_file.end_date.isoformat(),
+            'countries': sorted(handler.get_unique_countries()),
+            'seasons': handler.get_seasons(),
+        }
+
+    async def submit(self, ssim_id, airline_name, contact_person, countries=None, seasons=None):
+        """
+        Queues the permits of a loaded SSIM file, split as each country's rules say (or per country and season,
+        for the given seasons). Returns the Job, or raises ServiceError 503 when the queue is full.
+        """
+
+        ssim_file = self.ssim_files.get(ssim_id)
+        if ssim_file is None:
+            raise ServiceError(404, f'Unknown ssim_id {ssim_id!r}, upload the file first')
+        self.ssim_files.move_to_end(ssim_id)
+        if self._queue.full():
+            count('service.rejected')
+            raise ServiceError(503, 'Too many jobs waiting, retry later', {'Retry-After': '5'})
+
+        handler = ssim_file.flight_series_handler
+        countries = handler.get_unique_countries() if countries is None else countries
+        # Filtering the series of a large file takes a while, off the event loop
+        inputs = await asyncio.get_running_loop().run_in_executor(None, permit_inputs, countries, ssim_file, handler, seasons)
+        job = Job(ssim_id, airline_name, contact_person, inputs)
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            # Filled up by other submissions in the meantime
+            count('service.rejected')
+            raise ServiceError(503, 'Too many jobs waiting, retry later', {'Retry-After': '5'})
+        count('service.jobs')
+
+        self.jobs[job.job_id] = job
+        finished = [job_id for job_id, kept in self.jobs.items() if kept.state == 'done']
+        for job_id in finished[:max(len(self.jobs) - self.max_jobs, 0)]:
+            del self.jobs[job_id]
+        return job
+
+    def get_job(self, job_id):
+        job = self.jobs.get(job_id)
+        if job is None:
+            raise ServiceError(404, f'Unknown job {job_id!r}')
+        return job
+
+    async def _run_jobs(self):
+        while True:
+            job = await self._queue.get()
+            try:
+                with span('service.job'):
+                    job.state = 'running'
+                    await asyncio.gather(*(self._render(job, name) for name in job.inputs))
+                    await job._finish()
+            except Exception as error:
+                # The job ends with the error, its clients get their last event and the runner takes the next job
+                count('service.job_errors')
+                await job._finish(f'{type(error).__name__}: {error}')
+            finally:
+                self._queue.task_done()
+
+    async def _render(self, job, name):
+        async with self._slots:
+            await job._set(name, 'running')
+            country, season, airport, start_date, end_date, rows = job.inputs[name]
+            try:
+                document = await asyncio.get_running_loop().run_in_executor(
+                    self._executor, render_permit, country, start_date, end_date, rows, job.airline_name, job.contact_person)
+            except Exception as error:
+                await job._set(name, 'failed', f'{type(error).__name__}: {error}')
+                return
+            finally:
+                job.inputs[name] = (country, season, airport, start_date, end_date, None)
+            job.documents[name] = document
+            await job._set(name, 'done')
+
+
+async def serve(service, host='127.0.0.1', port=DEFAULT_PORT, socket_path=None):
+    """Runs the service until cancelled, on a Unix socket if `socket_path` is given, else on host:port."""
+
+    await service.start()
+
+    async def handle(reader, writer):
+        await _handle_connection(service, reader, writer)
+
+    if socket_path:
+        server = await asyncio.start_unix_server(handle, path=socket_path)
+    else:
+        server = await asyncio.start_server(handle, host, port)
+    print(f'Serving on {socket_path or f"http://{host}:{port}"}')
+
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        await service.close()
+
+
+async def _handle_connection(service, reader, writer):
+    try:
+        try:
+            method, path, body = await _read_request(reader)
+            await _dispatch(service, method, path, body, writer)
+        except ServiceError as error:
+            _write_head(writer, error.status, 'application/json', error.headers)
+            writer.write(json.dumps({'error': str(error)}).encode())
+        except (ConnectionError, asyncio.IncompleteReadError):
+            raise
+        except Exception as error:
+            # Reported to this client only, the service goes on
+            _write_head(writer, 500, 'application/json')
+            writer.write(json.dumps({'error': f'{type(error).__name__}: {error}'}).encode())
+        await writer.drain()
+    except (ConnectionError, asyncio.IncompleteReadError):
+        # The client went away, nothing to answer
+        pass
+    finally:
+        writer.close()
+
+
+async def _dispatch(service, method, path, body, writer):
+    parts = [part for part in path.split('?')[0].split('/') if part]
+
+    if parts == ['health'] and method == 'GET':
+        return _write_json(writer, 200, {'status': 'ok', 'ssim_files': len(service.ssim_files), 'jobs': len(service.jobs),
+                                         'queued': service._queue.qsize()})
+
+    if parts == ['ssim'] and method == 'POST':
+        with span('service.upload'):
+            return _write_json(writer, 200, await service.add_ssim(body))
+
+    if parts == ['jobs'] and method == 'POST':
+        try:
+            request = json.loads(body or b'{}')
+            job = await service.submit(request['ssim_id'], request['airline_name'], request['contact_person'],
+                                 request.get('countries'), request.get('seasons'))
+        except (ValueError, KeyError, TypeError) as error:
+            raise ServiceError(400, f'Expected a JSON job with ssim_id, airline_name and contact_person: {error!r}')
+        return _write_json(writer, 202, {'job_id': job.job_id, 'permits': list(job.states), 'url': f'/jobs/{job.job_id}'})
+
+    if len(parts) >= 2 and parts[0] == 'jobs' and method == 'GET':
+        job = service.get_job(parts[1])
+        if len(parts) == 2:
+            return _write_json(writer, 200, job.status())
+        if parts[2:] == ['events']:
+            # Streamed as they happen, the end of the response (connection closed) is the end of the job
+            _write_head(writer, 200, 'application/x-ndjson')
+            async for event in job.stream():
+                writer.write(json.dumps(event).encode() + b'\n')
+                await writer.drain()
+            return
+        if len(parts) == 4 and parts[2] == 'permits':
+            document = job.documents.get(parts[3])
+            if document is None:
+                raise ServiceError(404, f'No finished permit {parts[3]!r} in job {job.job_id}')
+            _write_head(writer, 200, 'application/vnd.openxmlformats-officedocument.wordprocessingml.document', {
+                'Content-Length': str(len(document)),
+                'Content-Disposition': f'attachment; filename="landing_permit_{parts[3]}.docx"',
+            })
+            writer.write(document)
+            return
+
+    if parts in (['health'], ['ssim'], ['jobs']):
+        raise ServiceError(405, f'{method} is not allowed on {path}')
+    raise ServiceError(404, f'Nothing at {path}')
+
+
+async def _read_request(reader):
+    request_line = (await reader.readline()).decode('latin-1').split()
+    if len(request_line) != 3:
+        raise ServiceError(400, 'Malformed request line')
+    method, path, _ = request_line
+
+    headers = {}
+    for _ in range(MAX_HEADER_LINES):
+        line = (await reader.readline()).decode('latin-1')
+        if line in ('\r\n', '\n', ''):
+            break
+        name, _, value = line.partition(':')
+        headers[name.strip().lower()] = value.strip()
+    else:
+        raise ServiceError(400, 'Too many header lines')
+
+    try:
+        length = int(headers.get('content-length', 0))
+    except ValueError:
+        raise ServiceError(400, 'Invalid Content-Length')
+    if length > MAX_UPLOAD_BYTES:
+        raise ServiceError(413, f'Request body over {MAX_UPLOAD_BYTES} bytes')
+    body = await reader.readexactly(length) if length else b''
+    return method.upper(), path, body
+
+
+def _write_head(writer, status, content_type, headers=None):
+    lines = [f'HTTP/1.1 {status} {_REASONS.get(status, "")}', f'Content-Type: {content_type}', 'Connection: close']
+    lines += [f'{name}: {value}' for name, value in (headers or {}).items()]
+    writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1'))
+
+
+def _write_json(writer, status, payload):
+    body = json.dumps(payload).encode()
+    _write_head(writer, status, 'application/json', {'Content-Length': str(len(body))})
+    writer.write(body)
+
+
+def _load_ssim(path):
+    ssim_file = SSIM_File(path)
+    # The season partition is built now, in the loading thread, not on the first request that needs it
+    ssim_file.flight_series_handler.partition_by_season()
+    return ssim_file
+
+
+def _warm_worker():
+    # Inherited from the parent with fork, compiled here otherwise
+    get_template()
+
+
+def _permit_name(key):
+    return '_'.join(key) if isinstance(key, tuple) else key
+
@@ -0,0 +1,156 @@
+# Converts the passenger departure and arrival times of every leg between UTC and local time, all legs at once.
+#
+# The offset of each station comes from the leg's own 'UTC/Local Time variation' fields (e.g. +0400) when the file
+# has them. Otherwise it is looked up from the airport's tz database zone, at the series' first flight (first
+# operating day on or after Eff) so that daylight saving time is applied by date. That lookup runs once per time zone over all the legs in it, never row by row.
+
+import numpy as np
+import pandas as pd
+
+from models.airport import airport_registry
+from utils.date_helper import parse_ssim_dates, days_of_operation_mask, weekday
+
+TIMEZONE_MODES = ('local', 'UTC')
+
+# Time column, variation column and station column of each end of a leg
+LEG_ENDS = {
+    'Dept': ('Dept time (pax)', 'UTC/Local Time variation (dept)', 'Dept Stn'),
+    'Arvl': ('Arvl time (pax)', 'UTC/Local Time variation', 'Arvl Stn'),
+}
+
+_MINUTES_PER_DAY = 24 * 60
+
+
+def normalize_times(df, timezone_mode, target='local'):
+    """
+    Returns the departure and arrival times of every leg in `target` time.
+
+    Args:
+        df (pd.DataFrame): Flight legs, as SSIM_File.df. The variation columns are optional.
+        timezone_mode (str): The time mode of the file, 'local' or 'UTC' (SSIM_File.timezone_mode), in any case.
+        target (str): 'local' or 'UTC', in any case. The result columns use the canonical spelling.
+
+    Returns:
+        pd.DataFrame: Same index as `df`, with for both 'Dept' and 'Arvl':
+        '<end> time (<target>)' (HHMM, None where the time or the offset is unknown), '<end> day shift (<target>)'
+        (-1, 0 or +1 when the conversion crosses midnight) and '<end> UTC offset' (minutes, local minus UTC).
+    """
+
+    timezone_mode = _timezone_mode('timezone_mode', timezone_mode)
+    target = _timezone_mode('target', target)
+
+    dates = first_operating_dates(df)
+    minutes = {end: _to_minutes(df[time_column]) for end, (time_column, _, _) in LEG_ENDS.items()}
+
+    departure_offsets = _offsets(df, 'Dept', dates, minutes['Dept'], timezone_mode)
+    arrival_offsets = _offsets(df, 'Arvl', dates, minutes['Arvl'], timezone_mode)
+
+    # A leg arriving earlier in the (UTC) day than it left lands the next day, which changes its arrival
+    # offset when a DST change falls in between, so those are looked up again on the arrival date
+    local_mode = timezone_mode == 'local'
+    departure_utc = minutes['Dept'] - (departure_offsets if local_mode else 0)
+    arrival_utc = minutes['Arvl'] - (arrival_offsets if local_mode else 0)
+    next_day = arrival_utc < departure_utc
+    if next_day.any():
+        arrival_offsets[next_day] = _offsets(
+            df[next_day], 'Arvl', dates[next_day] + np.timedelta64(1, 'D'), minutes['Arvl'][next_day], timezone_mode)
+
+    result = pd.DataFrame(index=df.index)
+    for end, offsets in (('Dept', departure_offsets), ('Arvl', arrival_offsets)):
+        if timezone_mode == target:
+            converted = minutes[end]
+        else:
+            converted = minutes[end] + offsets if target == 'local' else minutes[end] - offsets
+
+        result[f'{end} time ({target})'] = _to_hhmm(converted % _MINUTES_PER_DAY)
+        result[f'{end} day shift ({target})'] = pd.array(np.floor_divide(converted, _MINUTES_PER_DAY), dtype='Int64')
+        result[f'{end} UTC offset'] = pd.array(offsets, dtype='Int64')
+
+    return result
+
+
+def first_operating_dates(df):
+    """Date of the first flight of each leg's series: the first day on or after Eff it operates on (Eff if none)."""
+
+    effective = parse_ssim_dates(df['Eff'].to_numpy())
+    operating = days_of_operation_mask(df['Day(s) of operation'].to_numpy())
+    delays = (np.arange(7)[None, :] - weekday(effective)[:, None]) % 7
+    delays = np.where(operating, delays, 7).min(axis=1)
+    return effective + np.where(delays < 7, delays, 0).astype('timedelta64[D]')
+
+
+def zone_offsets(stations, dates, minutes, timezone_mode):
+    """
+    UTC offsets (local minus UTC, in minutes) of stations at given dates and times, from their tz database zone.
+
+    `dates` is a datetime64[D] array and `minutes` the times of day in minutes, both in `timezone_mode`.
+    Local times that do not exist (skipped by a DST change) are moved forward, ambiguous ones read as standard time.
+    Unknown stations, zones or dates give NaN.
+    """
+
+    offsets = np.full(len(stations), np.nan)
+    zones = pd.Series(stations, dtype=object).map(airport_registry.get_timezone_map()).to_numpy()
+    instants = dates.astype('datetime64[m]') + np.nan_to_num(minutes).astype('timedelta64[m]')
+    known = pd.notna(zones) & ~np.isnat(instants)
+
+    for zone in pd.unique(zones[known]):
+        in_zone = known & (zones == zone)
+        naive = pd.DatetimeIndex(instants[in_zone])
+        try:
+            if timezone_mode == 'UTC':
+                local = naive.tz_localize('UTC').tz_convert(zone).tz_localize(None)
+                offsets[in_zone] = (local - naive) / pd.Timedelta(minutes=1)
+            else:
+                aware = naive.tz_localize(zone, ambiguous=np.zeros(len(naive), dtype=bool), nonexistent='shift_forward')
+                offsets[in_zone] = (naive - aware.tz_convert('UTC').tz_localize(None)) / pd.Timedelta(minutes=1)
+        except (KeyError, ValueError):
+            # Not a zone pandas knows, leave those legs unconverted
+            continue
+
+    return offsets
+
+
+def _offsets(df, end, dates, minutes, timezone_mode):
+    # The SSIM variations of one end of the legs, and the tz database offsets where they are missing
+    _, variation_column, station_column = LEG_ENDS[end]
+    offsets = _variation_minutes(df[variation_column]) if variation_column in df else np.full(len(df), np.nan)
+    missing = np.isnan(offsets)
+    if missing.any():
+        offsets[missing] = zone_offsets(df[station_column].to_numpy()[missing], dates[missing], minutes[missing], timezone_mode)
+    return offsets
+
+
+def _timezone_mode(name, mode):
+    # 'utc', 'Local'... to one of TIMEZONE_MODES
+    modes = {mode.lower(): mode for mode in TIMEZONE_MODES}
+    if not isinstance(mode, str) or mode.lower() not in modes:
+        raise ValueError(f"Unknown {name} {mode!r}, expected 'local' or 'UTC'")
+    return modes[mode.lower()]
+
+
+def _to_minutes(times):
+    # HHMM strings to minutes since midnight, NaN when missing or malformed
+    text = times.astype('string')
+    hours = pd.to_numeric(text.str.slice(0, 2), errors='coerce')
+    minutes = pd.to_numeric(text.str.slice(2, 4), errors='coerce')
+    valid = (text.str.len() == 4) & text.str.isdigit()
+    return np.where(valid.fillna(False).to_numpy(dtype=bool), (hours * 60 + minutes).to_numpy(dtype=float, na_value=np.nan), np.nan)
+
+
+def _variation_minutes(variations):
+    # '+0400' / '-0330' to signed minutes, NaN when missing or malformed
+    text = variations.astype('string')
+    valid = text.str.fullmatch(r'[+-]\d{4}').fillna(False).to_numpy(dtype=bool)
+    # Missing variations are <NA> in the string dtype, NaN once converted
+    hours = pd.to_numeric(text.str.slice(1, 3), errors='coerce').to_numpy(dtype=float, na_value=np.nan)
+    minutes = pd.to_numeric(text.str.slice(3, 5), errors='coerce').to_numpy(dtype=float, na_value=np.nan)
+    sign = np.where((text.str.slice(0, 1) == '-').to_numpy(dtype=bool, na_value=False), -1, 1)
+    return np.where(valid, sign * (hours * 60 + minutes), np.nan)
+
+
+def _to_hhmm(minutes):
+    result = np.full(len(minutes), None, dtype=object)
+    known = ~np.isnan(minutes)
+    values = minutes[known].astype(int)
+    result[known] = pd.Series(values // 60 * 100 + values % 60).astype(str).str.zfill(4).to_numpy()
+    return result
@@ -1,37 +1,33 @@
 
 # Right now this main to be used as testbed
-from models.ssim_file import SSIM_File
-from models.airport import Airport
-from models.flight_series_handler import FlightSeriesHandler
-from lib.permit_generator import generate_document
+#     python main.py file.ssim              permits of every country of the file
+#     python main.py base.ssim alt.ssim     only permits of countries whose schedule changed
+#     python main.py folder_or_glob         batch mode, one permits tree per file
+# It only maps those calls to the CLI (lib/cli.py, installed as `landingpermit`), see `landingpermit --help`.
 
-import sys
 import os
-import pandas as pd
-import pendulum
+import sys
 
-# TODO: install as package instead
-from pathlib import Path
-sys.path.append(str(Path(__file__).parent.resolve()))
+from lib import cli
 
+AIRLINE_NAME = 'FlySample'
+CONTACT_PERSON = 'Luca Siragusa'
 
-def main(): 
-    import numpy as np 
 
+def main():
     ssim = sys.argv[1]
-    ssim_object = SSIM_File(ssim)
+    signature = ['--airline', AIRLINE_NAME, '--contact', CONTACT_PERSON]
 
-    handler = FlightSeriesHandler()
-    handler.create_flight_series_from_df(ssim_object.df)
+    # A directory or a glob pattern: batch mode, one permits tree per file
+    if os.path.isdir(ssim) or any(character in ssim for character in '*?['):
+        return cli.main(['batch', ssim] + signature)
 
-    # If you want to print all unique countries present in the flight series
-    unique_countries = handler.get_unique_countries()
+    # With a second file: comparative mode, only permits of countries whose schedule changed
+    if len(sys.argv) > 2:
+        return cli.main(['diff', ssim, sys.argv[2], '--generate'] + signature)
 
-    # Filter by a specific country and print results.
-    for country_code in unique_countries:
-        print (f'Creating permit for: {country_code}')
-        
-        generate_document(country_code, ssim_object, 'FlySample', 'Luca Siragusa', handler)
+    # Generate one permit per country, in parallel
+    return cli.main(['generate', ssim] + signature)
 
 if __name__ == '__main__':
-    main()
+    sys.exit(main())
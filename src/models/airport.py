@@ -1,20 +1,185 @@
-import pandas as pd
+import os
+import pickle
+import numpy as np
+
+from utils.file_helper import get_data_dir, get_cache_dir
+from utils.instrumentation import span, count
+
+
+class Airport:
+
+    __slots__ = (
+        'iata_code', 'icao_code', 'airport_name', 'latitude', 'longitude',
+        'iso_country', 'iso_region', 'city', 'country_name', 'timezone',
+    )
+
+    def __init__(self, iata_code, record=None):
+        # Prefer airport_registry.get_airport(), which hands out one shared instance per station
+        if record is None:
+            record = airport_registry.get_record(iata_code)
 
-class Airport: 
-        
-    def __init__(self, iata_code):
         self.iata_code = iata_code
-        self.icao_code = airport_data[iata_code]['ICAO code']
-        self.airport_name = airport_data[iata_code]['Airport name']
-        self.latitude = airport_data[iata_code]['Latitude']
-        self.longitude = airport_data[iata_code]['Longitude']
-        self.iso_country = airport_data[iata_code]['ISO country']
-        self.iso_region = airport_data[iata_code]['ISO region']
-        self.city = airport_data[iata_code]['municipality']
-        self.country_name = airport_data[iata_code]['Country name']
-        self.timezone = airport_data[iata_code]['Timezone']
+        self.icao_code = record['ICAO code']
+        self.airport_name = record['Airport name']
+        self.latitude = record['Latitude']
+        self.longitude = record['Longitude']
+        self.iso_country = record['ISO country']
+        self.iso_region = record['ISO region']
+        self.city = record['municipality']
+        self.country_name = record['Country name']
+        self.timezone = record['Timezone']
 
     def __repr__(self):
-        return str(airport_data[self.iata_code])
-    
-airport_data = pd.read_pickle('../data/industry/airport_data.pkl')
+        return str(airport_registry.get_record(self.iata_code))
+
+
+class AirportRegistry:
+    '''
+    Reference data for every airport, keyed by IATA code.
+
+    Nothing is read until the first lookup. The pickle is then converted once into a compact structured
+    numpy array (fixed width utf-8 fields, one row per airport) and saved in the cache directory under a
+    name that contains the pickle's mtime, so later runs simply memory-map it and a new pickle gets a new index.
+    Airport objects are interned: get_airport() builds each station once and hands out the same instance.
+    '''
+
+    def __init__(self, data_path=None, cache_dir=None):
+        self.data_path = data_path or get_data_dir() / 'industry' / 'airport_data.pkl'
+        self.cache_dir = cache_dir
+        self._records = None
+        self._positions = None
+        self._field_maps = {}
+        self._airports = {}
+
+    def __contains__(self, iata_code):
+        return iata_code in self._get_positions()
+
+    def __len__(self):
+        return len(self._get_positions())
+
+    def codes(self):
+        return list(self._get_positions())
+
+    def get_record(self, iata_code):
+        """Return all the reference fields of an airport as a dict (missing text fields are None)."""
+
+        row = self._get_records()[self._get_positions()[iata_code]]
+        return {field: _to_python(row[field]) for field in row.dtype.names}
+
+    def get_airport(self, iata_code):
+        """Return the shared Airport instance for a station."""
+
+        airport = self._airports.get(iata_code)
+        if airport is None:
+            count('airport.built')
+            airport = self._airports[iata_code] = Airport(iata_code, self.get_record(iata_code))
+        return airport
+
+    def get_country(self, iata_code):
+        """Return the ISO country of a station, None if the station is unknown."""
+
+        position = self._get_positions().get(iata_code)
+        if position is None:
+            return None
+        return _to_python(self._get_records()['ISO country'][position])
+
+    def get_country_map(self):
+        """Return a {iata_code: iso_country} dict for every station, handy for pandas .map()."""
+        return self.get_field_map('ISO country')
+
+    def get_timezone_map(self):
+        """Return a {iata_code: tz database name} dict for every station, e.g. {'AUH': 'Asia/Dubai'}."""
+        return self.get_field_map('Timezone')
+
+    def get_field_map(self, field):
+        """Return a {iata_code: value} dict of one reference field for every station. Built once per field."""
+
+        field_map = self._field_maps.get(field)
+        if field_map is None:
+            values = map(_to_python, self._get_records()[field])
+            field_map = self._field_maps[field] = dict(zip(self._get_positions(), values))
+        return field_map
+
+    def as_dict(self):
+        """Return the reference data in the original {iata_code: {field: value}} layout."""
+
+        return {iata_code: self.get_record(iata_code) for iata_code in self._get_positions()}
+
+    def _get_records(self):
+        self._get_positions()
+        return self._records
+
+    def _get_positions(self):
+        if self._positions is None:
+            with span('airport.load'):
+                self._records = self._load_records()
+            self._positions = {code.decode('utf-8'): position for position, code in enumerate(self._records['IATA code'].tolist())}
+        return self._positions
+
+    def _load_records(self):
+        cache_dir = self.cache_dir or get_cache_dir('airports')
+        mtime = os.stat(self.data_path).st_mtime_ns
+        index_path = cache_dir / f'airport_index_{mtime}.npy' if cache_dir else None
+
+        if index_path and index_path.exists():
+            return np.load(index_path, mmap_mode='r')
+
+        records = self._build_records()
+
+        if index_path:
+            try:
+                # Write then rename, so a concurrent reader never maps a half written index
+                temporary_path = index_path.with_suffix(f'.{os.getpid()}.tmp')
+                with open(temporary_path, 'wb') as index_file:
+                    np.save(index_file, records)
+                os.replace(temporary_path, index_path)
+                for stale_index in cache_dir.glob('airport_index_*.npy'):
+                    if stale_index != index_path:
+                        stale_index.unlink(missing_ok=True)
+            except OSError:
+                pass
+
+        return records
+
+    def _build_records(self):
+        with open(self.data_path, 'rb') as pickle_file:
+            airport_data = pickle.load(pickle_file)
+
+        codes = list(airport_data)
+        fields = list(next(iter(airport_data.values())))
+
+        columns = {'IATA code': [code.encode('utf-8') for code in codes]}
+        for field in fields:
+            values = [airport_data[code][field] for code in codes]
+            if any(isinstance(value, str) for value in values):
+                # Missing text is stored as NaN in the pickle, kept as an empty field here
+                columns[field] = [value.encode('utf-8') if isinstance(value, str) else b'' for value in values]
+            else:
+                columns[field] = np.asarray(values, dtype=np.float64)
+
+        dtype = [
+            (field, f'S{max(1, max(map(len, values)))}' if isinstance(values, list) else np.float64)
+            for field, values in columns.items()
+        ]
+        records = np.empty(len(codes), dtype=dtype)
+        for field, values in columns.items():
+            records[field] = values
+
+        return records
+
+
+def _to_python(value):
+    # Text fields are stored as utf-8 bytes, with b'' standing for missing
+    if isinstance(value, bytes):
+        return value.decode('utf-8') or None
+    return value.item()
+
+
+airport_registry = AirportRegistry()
+
+
+def __getattr__(name):
+    # Backwards compatible `from models.airport import airport_data`, loaded only when asked for
+    if name == 'airport_data':
+        return airport_registry.as_dict()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
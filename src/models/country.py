@@ -1,4 +1,34 @@
-# TODO: what shall this do?
-# I intended this to be a class used to manage properties of countries. 
-# For instance contain a property that defines what doc format we must use to submit to a specific country 
-# Or what the email address is for a specific country's Civil Aviation Authority
+class Country:
+    '''
+    How the landing permits of a country are requested: the authority they go to and the submission rules.
+
+    Get them from country_registry.get_country(), which holds one shared instance per country.
+
+    Attributes:
+        code (str): ISO country code.
+        name (str): Country name, None if the rules do not give it.
+        authority (str): Civil aviation authority the requests are sent to, None if unknown.
+        email (str): Where the requests are sent, None if unknown.
+        format (str): Document format of the requests, 'docx'.
+        grouping (str): How the flights of the country are split into documents: 'country' (one request),
+            'airport' (one per airport of the country served) or 'season' (one per IATA season).
+        template (str): Path of the .docx format of the requests (relative to the template directory),
+            None for the default one.
+    '''
+
+    __slots__ = ('code', 'name', 'authority', 'email', 'format', 'grouping', 'template')
+
+    def __init__(self, code, rules):
+        self.code = code
+        self.name = rules.get('name')
+        self.authority = rules.get('authority')
+        self.email = rules.get('email')
+        self.format = rules['format']
+        self.grouping = rules['grouping']
+        self.template = rules.get('template')
+
+    def to_dict(self):
+        return {attribute: getattr(self, attribute) for attribute in Country.__slots__}
+
+    def __repr__(self):
+        return f'{self.code}: {self.authority or "unknown authority"} ({self.format}, one per {self.grouping})'
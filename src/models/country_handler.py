@@ -1 +1,84 @@
-# TODO: what shall this do?
\ No newline at end of file
+import os
+import json
+
+from models.country import Country
+from utils.file_helper import get_data_dir
+
+FORMATS = ('docx',)
+GROUPINGS = ('country', 'airport', 'season')
+
+
+class CountryHandler:
+    '''
+    Registry of the submission rules of every country, keyed by ISO country code.
+
+    The rules are read from the bundled data/industry/country_rules.json on the first lookup and kept for the
+    life of the process. Local rules can be layered on top with a JSON file of the same shape, named by the
+    LANDINGPERMIT_COUNTRY_RULES environment variable: its countries override the bundled ones field by field.
+    Countries without rules get the default ones (one docx request per country).
+
+    The bundled file is a starting point: it only names the authority of some countries, all of them on the
+    default grouping and format, without emails or templates. Per airport or per season requests, contact
+    addresses and formats come from the local rules file of the operator.
+    '''
+
+    def __init__(self, data_path=None, override_path=None):
+        self.data_path = data_path or get_data_dir() / 'industry' / 'country_rules.json'
+        self.override_path = override_path
+        self._default = None
+        self._rules = None
+        self._countries = {}
+
+    def __contains__(self, code):
+        return code in self._get_rules()
+
+    def codes(self):
+        """Return the codes of the countries with their own rules."""
+        return sorted(self._get_rules())
+
+    def get_country(self, code):
+        """Return the shared Country of a code, with the default rules if the country has none of its own."""
+
+        country = self._countries.get(code)
+        if country is None:
+            rules = self._get_rules()
+            country = self._countries[code] = Country(code, {**self._default, **rules.get(code, {})})
+        return country
+
+    def reload(self):
+        """Drops the loaded rules, the next lookup reads the files again."""
+        self._default = None
+        self._rules = None
+        self._countries.clear()
+
+    def _get_rules(self):
+        if self._rules is None:
+            with open(self.data_path) as rules_file:
+                data = json.load(rules_file)
+            default = data.get('default', {})
+            rules = data.get('countries', {})
+
+            override_path = self.override_path or os.environ.get('LANDINGPERMIT_COUNTRY_RULES')
+            if override_path:
+                with open(override_path) as override_file:
+                    override = json.load(override_file)
+                default = {**default, **override.get('default', {})}
+                for code, country_rules in override.get('countries', {}).items():
+                    rules[code] = {**rules.get(code, {}), **country_rules}
+
+            default = {'format': 'docx', 'grouping': 'country', **default}
+            for code, country_rules in [('default', default)] + list(rules.items()):
+                _check(code, {**default, **country_rules})
+            self._default = default
+            self._rules = rules
+        return self._rules
+
+
+def _check(code, rules):
+    if rules['format'] not in FORMATS:
+        raise ValueError(f"Unknown format {rules['format']!r} for {code}, expected one of {FORMATS}")
+    if rules['grouping'] not in GROUPINGS:
+        raise ValueError(f"Unknown grouping {rules['grouping']!r} for {code}, expected one of {GROUPINGS}")
+
+
+country_registry = CountryHandler()
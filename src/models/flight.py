@@ -1,5 +1,21 @@
-# TODO: What shall this be about?
 # A flight series is a series of flights that have the same exact characteristics 
 # (same origin, destination, flight number, departure time, arrival time, season etc.)
-# But fundamentally it is made up by individual flights, this class is supposed to represent individual flights 
-# It will be useful in the part where we compare the base ssim with the alt ssim and output only the flights that changed
\ No newline at end of file
+# But fundamentally it is made up by individual flights, this class represents one of them: a series on a given date.
+# Flights in bulk are expanded by FlightHandler as columns (one row per flight), this class is the per flight view.
+
+
+class Flight:
+
+    __slots__ = ('flight_series', 'date')
+
+    def __init__(self, flight_series, date):
+        self.flight_series = flight_series
+        self.date = date
+
+    def __repr__(self):
+        return f"{self.flight_series.flight_number} {self.flight_series.departure_station.iata_code}-{self.flight_series.arrival_station.iata_code} on {self.date}"
+
+    def to_dict(self):
+        flight_data = self.flight_series.to_dict()
+        flight_data['Date'] = self.date
+        return flight_data
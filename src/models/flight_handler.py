@@ -1 +1,117 @@
-# TODO: what shall this do?
\ No newline at end of file
+import numpy as np
+import pandas as pd
+
+from models.flight import Flight
+from utils.date_helper import parse_ssim_dates, days_of_operation_mask, weekday
+
+
+class FlightHandler:
+    '''
+    Expands flight series into individual dated flights, using numpy date arithmetic only.
+
+    For every series and every weekday it operates on, the first flight is the first date on or after Eff
+    falling on that weekday, and the next ones follow every 7 days until Dis. That gives flight counts in
+    closed form (count-only mode, nothing is materialized) and the full expansion with np.repeat, without
+    walking the calendar day by day.
+    '''
+
+    def __init__(self, flight_series_collection, end_date=None):
+        """
+        Args:
+            flight_series_collection (list of FlightSeries): The series to expand, e.g. handler.flight_series_collection.
+            end_date (date, optional): Used as discontinue date for open ended series (Dis 00XXX00), 
+                typically the SSIM file end date. Without it those series count no flights.
+        """
+        self.flight_series_collection = flight_series_collection
+
+        self.effective_dates = parse_ssim_dates([fs.effective_date for fs in flight_series_collection])
+        self.discontinued_dates = parse_ssim_dates([fs.discontinued_date for fs in flight_series_collection])
+        if end_date is not None:
+            self.discontinued_dates[np.isnat(self.discontinued_dates)] = np.datetime64(pd.Timestamp(end_date).date(), 'D')
+        self.days_mask = days_of_operation_mask([fs.days_of_operation for fs in flight_series_collection])
+
+    def _first_flights(self):
+        # Series without a valid period get an empty one (Dis before Eff), so no flights
+        valid = ~(np.isnat(self.effective_dates) | np.isnat(self.discontinued_dates))
+        effective = np.where(valid, self.effective_dates, np.datetime64(0, 'D'))
+        discontinued = np.where(valid, self.discontinued_dates, np.datetime64(-1, 'D'))
+        return first_flights(effective, discontinued, self.days_mask)
+
+    def count_flights_per_series(self):
+        """Return the number of flights of each series (same order as the collection), without expanding them."""
+        return self._first_flights()[1].sum(axis=1)
+
+    def count_flights(self):
+        """Return the total number of flights of all the series."""
+        return int(self.count_flights_per_series().sum())
+
+    def count_flights_by_country(self):
+        """Return {country: number of flights} for every country flown to or from (domestic flights count once)."""
+
+        counts = self.count_flights_per_series()
+        departure_countries = pd.Series([fs.departure_station.iso_country for fs in self.flight_series_collection], dtype=object)
+        arrival_countries = pd.Series([fs.arrival_station.iso_country for fs in self.flight_series_collection], dtype=object)
+        international = (departure_countries != arrival_countries).to_numpy()
+
+        by_country = pd.concat([
+            pd.Series(counts).groupby(departure_countries).sum(),
+            pd.Series(counts[international]).groupby(arrival_countries[international].to_numpy()).sum()
+        ]).groupby(level=0).sum()
+
+        return {country: int(count) for country, count in by_country.items()}
+
+    def expand(self):
+        """
+        Return every flight as one row of a dataframe, sorted by series then date.
+
+        Columns: 'Series index' (position in the collection), 'Flight number', 'Dept Stn', 'Arvl Stn' 
+        and 'Date' (datetime64). Only as many rows as there are flights are ever allocated.
+        """
+
+        series_index, dates = expand_flights(*self._first_flights())
+
+        def series_column(values):
+            return np.asarray(values, dtype=object)[series_index]
+
+        return pd.DataFrame({
+            'Series index': series_index,
+            'Flight number': series_column([fs.flight_number for fs in self.flight_series_collection]),
+            'Dept Stn': series_column([fs.departure_station.iata_code for fs in self.flight_series_collection]),
+            'Arvl Stn': series_column([fs.arrival_station.iata_code for fs in self.flight_series_collection]),
+            'Date': dates,
+        })
+
+    def get_flights(self, series_index):
+        """Return the flights of one series as Flight objects."""
+
+        first, counts = self._first_flights()
+        dates = np.sort(np.concatenate([
+            first[series_index, day] + 7 * np.arange(counts[series_index, day]) for day in range(7)
+        ]))
+        flight_series = self.flight_series_collection[series_index]
+        return [Flight(flight_series, date) for date in dates.tolist()]
+
+
+def first_flights(start, end, days_mask):
+    """
+    For (n,) datetime64[D] period bounds and an (n, 7) days of operation mask, return two (n, 7) arrays: the
+    first date on or after start for each weekday, and how many flights fall on that weekday until end (included).
+    """
+    first = start[:, None] + (np.arange(7)[None, :] - weekday(start)[:, None]) % 7
+    counts = ((end[:, None] - first).astype(np.int64) // 7 + 1).clip(min=0)
+    counts[~days_mask] = 0
+    return first, counts
+
+
+def expand_flights(first_dates, counts):
+    """Every flight of first_flights() output: the row it belongs to and its date, sorted by row then date."""
+
+    # One entry per (row, weekday) repeated count times, then stepped by a week
+    flat_counts = counts.ravel()
+    slot = np.repeat(np.arange(flat_counts.size), flat_counts)
+    starts = np.repeat(np.cumsum(flat_counts) - flat_counts, flat_counts)
+    dates = first_dates.ravel()[slot] + 7 * (np.arange(len(slot)) - starts)
+    rows = slot // 7
+
+    order = np.lexsort((dates, rows))
+    return rows[order], dates[order]
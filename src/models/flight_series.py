@@ -1,24 +1,47 @@
-from models.airport import airport_data
-from models.airport import Airport
+import sys
+from models.airport import airport_registry
+
+
+def _intern(value):
+    # SSIM fields repeat a lot (stations, equipment, dates...), so every series shares the same string objects
+    return sys.intern(value) if isinstance(value, str) else value
+
 
 class FlightSeries: 
 
+    # No per instance __dict__, a large SSIM holds tens of thousands of these
+    __slots__ = (
+        'airline_designator', 'flight_number', 'service_type', 'effective_date', 'discontinued_date',
+        'days_of_operation', 'departure_station', 'departure_time', 'arrival_station', 'arrival_time',
+        'equipment', 'aircraft_configuration',
+    )
+
     def __init__(self, flight_series_data):
         
-        self.airline_designator = flight_series_data['Airline designator']
-        self.flight_number = flight_series_data['Flight number']
-        self.service_type = flight_series_data['Service Type']
-        self.effective_date = flight_series_data['Eff']
-        self.discontinued_date = flight_series_data['Dis']
-        self.days_of_operation = flight_series_data['Day(s) of operation']
-        self.departure_station = Airport(flight_series_data['Dept Stn'])
-        self.departure_time = flight_series_data['Dept time (pax)']
-        self.arrival_station = Airport(flight_series_data['Arvl Stn'])
-        self.arrival_time = flight_series_data['Arvl time (pax)']
-        self.equipment = flight_series_data['Equipment']
-        self.aircraft_configuration = flight_series_data['Aircraft configuration']
+        self.airline_designator = _intern(flight_series_data['Airline designator'])
+        self.flight_number = _intern(flight_series_data['Flight number'])
+        self.service_type = _intern(flight_series_data['Service Type'])
+        self.effective_date = _intern(flight_series_data['Eff'])
+        self.discontinued_date = _intern(flight_series_data['Dis'])
+        self.days_of_operation = _intern(flight_series_data['Day(s) of operation'])
+        # Airports are shared instances from the registry, not per series copies
+        self.departure_station = airport_registry.get_airport(flight_series_data['Dept Stn'])
+        self.departure_time = _intern(flight_series_data['Dept time (pax)'])
+        self.arrival_station = airport_registry.get_airport(flight_series_data['Arvl Stn'])
+        self.arrival_time = _intern(flight_series_data['Arvl time (pax)'])
+        self.equipment = _intern(flight_series_data['Equipment'])
+        self.aircraft_configuration = _intern(flight_series_data['Aircraft configuration'])
         #Add number of Flights
 
+    def with_dates(self, effective_date, discontinued_date):
+        """Return a copy of this series over another period (Eff/Dis as DDMMMYY strings), e.g. one season of it."""
+        flight_series = FlightSeries.__new__(FlightSeries)
+        for attribute in FlightSeries.__slots__:
+            setattr(flight_series, attribute, getattr(self, attribute))
+        flight_series.effective_date = _intern(effective_date)
+        flight_series.discontinued_date = _intern(discontinued_date)
+        return flight_series
+
     def __repr__(self):
         return f"{self.airline_designator} {self.flight_number}: {self.departure_station}-{self.arrival_station} ({self.effective_date}-{self.discontinued_date})"
     
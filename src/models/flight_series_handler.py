@@ -1,75 +1,269 @@
+import numpy as np
+
 from models.flight_series import FlightSeries
-from models.airport import Airport
-from models.airport import airport_data
+from models.flight_series_index import FlightSeriesIndex
+from models.flight_handler import FlightHandler
+from models.overlap_detector import OverlapDetector
+from models.iata_season import season_calendar
+from utils.date_helper import parse_ssim_dates, format_ssim_dates
+from utils.instrumentation import instrumented, count
 
 class FlightSeriesHandler:
     def __init__(self):
         self.flight_series_collection = []
+        # Built while series are ingested, so country and airport lookups never rescan the collection
+        self._country_index = {}
+        self._station_index = {}
+        # Series split per IATA season, and their (season, country) index. Built on first use
+        self._season_index = None
+        self._season_country_index = None
+        # Query indexes (see FlightSeriesIndex), built field by field on first use
+        self._query_index = None
 
 
+    @instrumented('series.build')
     def create_flight_series_from_df(self, df):
-        for _, row in df.iterrows():
-            flight_series_data = row.to_dict()
-            flight_series = FlightSeries(flight_series_data)
-            self.flight_series_collection.append(flight_series)
+        # Walk the columns as plain lists in one pass, rather than building a pandas Series per row
+        columns = list(df.columns)
+        for values in zip(*(df[column].tolist() for column in columns)):
+            self._add(FlightSeries(dict(zip(columns, values))))
+        count('series.created', len(df))
         return self.flight_series_collection
 
 
-    def get_unique_countries(self):
-        """Return a set of all unique countries from the flight series."""
+    def _add(self, flight_series):
+        self.flight_series_collection.append(flight_series)
 
-        # Using a helper function to determine the country of an airport.
-        def get_country(airport_code):
-            # Extracting country code from the airport_data dictionary.
-            return airport_data[airport_code]['ISO country']  # Adjust this if the value in the dictionary is an object
-            
-        countries = set()
+        departure_station = flight_series.departure_station
+        arrival_station = flight_series.arrival_station
 
-        for series in self.flight_series_collection:
-            departure_country = get_country(series.departure_station.iata_code)
-            arrival_country = get_country(series.arrival_station.iata_code)
+        self._station_index.setdefault(departure_station.iata_code, []).append(flight_series)
+        if arrival_station.iata_code != departure_station.iata_code:
+            self._station_index.setdefault(arrival_station.iata_code, []).append(flight_series)
 
-            # Add to the set. If the country is already in the set, it won't create a duplicate.
-            countries.add(departure_country)
-            countries.add(arrival_country)
+        for country in _countries_of(flight_series):
+            self._country_index.setdefault(country, []).append(flight_series)
 
-        # Filter out any None values which might come from airports not present in airport_data
-        countries.discard(None)
-        
-        return countries
+        self._season_index = None
+        self._season_country_index = None
+        self._query_index = None
+
+
+    def get_unique_countries(self):
+        """Return a set of all unique countries from the flight series."""
+        return set(self._country_index)
+
+    def get_unique_airports(self, country_code=None):
+        """Return a set of the IATA codes of all airports served, optionally only those of a country."""
+        if country_code is None:
+            return set(self._station_index)
+        return {
+            iata_code for iata_code, flight_series in self._station_index.items()
+            if _station_of(flight_series[0], iata_code).iso_country == country_code
+        }
 
 
     def add_flight_series(self, flight_series_data):
-        flight_series = FlightSeries(flight_series_data)
-        self.flight_series_collection.append(flight_series)
+        self._add(FlightSeries(flight_series_data))
 
+    @instrumented('series.search')
     def search_by_attribute(self, attribute, value):
-        # Return flight series with a specific attribute value
-        return [fs for fs in self.flight_series_collection if getattr(fs, attribute) == value]
+        # Return flight series with a specific attribute value (or any of a list of values)
+        return self.query(**{attribute: value})
+
+    @instrumented('series.query')
+    def query(self, **criteria):
+        """
+        Return the flight series matching all the criteria, e.g.
+        query(equipment='359', arrival_country='JP', operating_between=(date(2025, 7, 1), date(2025, 7, 31))).
 
-    def count_flights(self):
+        See FlightSeriesIndex for the criteria. The indexes are kept between queries, until series are added.
+        """
+        if self._query_index is None:
+            self._query_index = FlightSeriesIndex(self.flight_series_collection)
+        return self._query_index.query(**criteria)
+
+    @instrumented('series.count_flights')
+    def count_flights(self, distinct=False, end_date=None):
+        """
+        Return the number of individual flights operated by all the series.
+
+        With distinct=True, a flight listed by several overlapping series of the same flight and leg counts once.
+        Open ended series (Dis 00XXX00) run until end_date, typically the SSIM file end date. Without it they
+        count no flights.
+        """
         # Check for overlapping flight series
-        pass
+        if distinct:
+            return OverlapDetector(self.flight_series_collection, end_date).count_distinct_flights()
+        return FlightHandler(self.flight_series_collection, end_date).count_flights()
+
+    def find_overlaps(self, with_dates=True):
+        """Return the pairs of series operating the same flight and leg on the same dates (see OverlapDetector.find_overlaps)."""
+        return OverlapDetector(self.flight_series_collection).find_overlaps(with_dates)
+
+    def merge_adjacent_series(self):
+        """Return the series with compatible overlapping or consecutive series merged (see OverlapDetector.merge_adjacent)."""
+        return OverlapDetector(self.flight_series_collection).merge_adjacent()
+
+    def count_flights_by_country(self, end_date=None):
+        """Return {country: number of flights}, counted without expanding the series. See count_flights for end_date."""
+        return FlightHandler(self.flight_series_collection, end_date).count_flights_by_country()
 
-    def calculate_duration(self, flight_series):
-        # Calculate and return the duration of a specific flight series in days
-        pass
+    def calculate_duration(self, flight_series, end_date=None):
+        """
+        Return the duration of a specific flight series in days, Eff and Dis included.
+
+        An open ended series (Dis 00XXX00) runs until end_date, and has no duration (None) without it.
+        """
+        effective_date, discontinued_date = parse_ssim_dates([flight_series.effective_date, flight_series.discontinued_date])
+        if np.isnat(discontinued_date) and end_date is not None:
+            discontinued_date = np.datetime64(end_date.strftime('%Y-%m-%d'))
+        if np.isnat(effective_date) or np.isnat(discontinued_date):
+            return None
+        return int((discontinued_date - effective_date).astype(int)) + 1
 
     def filter_by_country(self, country_code):
         """Filter flight series by either departure or arrival country."""
+        count('series.country_filters')
+        return list(self._country_index.get(country_code, []))
+
+    def filter_by_airport(self, iata_code):
+        """Filter flight series by either departure or arrival station."""
+        count('series.airport_filters')
+        return list(self._station_index.get(iata_code, []))
+
+    @instrumented('series.filter_by_date_range')
+    def filter_by_date_range(self, start_date, end_date, country_code=None):
+        """
+        Return the series operating between two dates (date or datetime, both included), optionally only
+        those of a country.
+
+        Series are clipped to the range, and those left without any flight are dropped. The loaded series
+        are only filtered, never rebuilt, so a new range is cheap to apply.
+        """
+
+        collection = self.flight_series_collection if country_code is None else self._country_index.get(country_code, [])
+        if not collection:
+            return []
+
+        range_start = np.datetime64(start_date.strftime('%Y-%m-%d'))
+        range_end = np.datetime64(end_date.strftime('%Y-%m-%d'))
+        effective = parse_ssim_dates([fs.effective_date for fs in collection])
+        discontinued = parse_ssim_dates([fs.discontinued_date for fs in collection])
+        # Open ended series run on until the end of the range
+        open_ended = np.isnat(discontinued)
+        discontinued = np.where(open_ended, range_end, discontinued)
+
+        piece_start = np.maximum(effective, range_start)
+        piece_end = np.minimum(discontinued, range_end)
+        overlaps = ~np.isnat(effective) & (piece_start <= piece_end)
+        split = overlaps & (open_ended | (piece_start != effective) | (piece_end != discontinued))
+        piece_start_text = iter(format_ssim_dates(piece_start[split]))
+        piece_end_text = iter(format_ssim_dates(piece_end[split]))
+
+        pieces = []
+        for flight_series, keep, is_split in zip(collection, overlaps.tolist(), split.tolist()):
+            if is_split:
+                pieces.append(flight_series.with_dates(next(piece_start_text), next(piece_end_text)))
+            elif keep:
+                pieces.append(flight_series)
+
+        has_flights = FlightHandler(pieces).count_flights_per_series() > 0
+        return [piece for piece, keep in zip(pieces, has_flights.tolist()) if keep]
+
+    def partition_by_season(self):
+        """
+        Return {season name: [FlightSeries]}, every series being assigned to the IATA seasons it overlaps.
+
+        A series crossing a season boundary is split into one copy per season, with Eff/Dis clipped to 
+        the season. Pieces without any flight (e.g. a Friday only series clipped to a Saturday to 
+        Thursday stretch) are dropped. The result is cached until series are added.
+        """
+
+        if self._season_index is None:
+            self._build_season_index()
+        return self._season_index
+
+    def get_seasons(self):
+        """Return the names of the seasons with at least one flight, in chronological order."""
+        return list(self.partition_by_season())
+
+    def filter_by_season(self, season):
+        """Return the series (clipped to the season) operating in an IATA season, e.g. 'S25'."""
+        return list(self.partition_by_season().get(season, []))
+
+    def filter_by_season_and_country(self, season, country_code):
+        """Return the series (clipped to the season) of a season, departing from or arriving in a country."""
+        self.partition_by_season()
+        return list(self._season_country_index.get((season, country_code), []))
+
+    @instrumented('series.season_index')
+    def _build_season_index(self):
+        collection = self.flight_series_collection
+        effective = parse_ssim_dates([fs.effective_date for fs in collection])
+        discontinued = parse_ssim_dates([fs.discontinued_date for fs in collection])
+
+        starts = season_calendar.start_array
+        first_season = np.searchsorted(starts, effective, side='right') - 1
+        # Open ended series stay in the season they start in, and run until its end
+        open_ended = np.isnat(discontinued) & ~np.isnat(effective)
+        season_end = starts[first_season.clip(0, len(season_calendar.names) - 1) + 1] - 1
+        discontinued = np.where(open_ended, season_end, discontinued)
+        last_season = np.searchsorted(starts, discontinued, side='right') - 1
+        piece_counts = np.where(np.isnat(effective), 0, last_season - first_season + 1).clip(min=0)
+
+        # One piece per (series, season overlapped), clipped to the season
+        series_index = np.repeat(np.arange(len(collection)), piece_counts)
+        season_position = first_season[series_index] + (np.arange(len(series_index)) - np.repeat(np.cumsum(piece_counts) - piece_counts, piece_counts))
+        season_position = season_position.clip(0, len(season_calendar.names) - 1)
+        piece_start = np.maximum(effective[series_index], starts[season_position])
+        piece_end = np.minimum(discontinued[series_index], starts[season_position + 1] - 1)
+
+        # Open ended pieces always get a real Dis, else they would count no flights
+        split = (piece_start != effective[series_index]) | (piece_end != discontinued[series_index]) | open_ended[series_index]
+        piece_start_text = format_ssim_dates(piece_start[split])
+        piece_end_text = format_ssim_dates(piece_end[split])
+
+        pieces = []
+        split_position = 0
+        for index, is_split in zip(series_index.tolist(), split.tolist()):
+            if is_split:
+                pieces.append(collection[index].with_dates(piece_start_text[split_position], piece_end_text[split_position]))
+                split_position += 1
+            else:
+                pieces.append(collection[index])
+
+        has_flights = FlightHandler(pieces).count_flights_per_series() > 0
+
+        self._season_index = {}
+        self._season_country_index = {}
+        for piece, position, keep in zip(pieces, season_position.tolist(), has_flights.tolist()):
+            if not keep:
+                continue
+            season = season_calendar.names[position]
+            self._season_index.setdefault(season, []).append(piece)
+            for country in _countries_of(piece):
+                self._season_country_index.setdefault((season, country), []).append(piece)
+
+        # Chronological season order
+        self._season_index = dict(sorted(self._season_index.items(), key=lambda item: season_calendar.names.index(item[0])))
+
+
+def _countries_of(flight_series):
+    """Countries a series touches: departure and arrival country, once for a domestic series.
 
-        # Using a helper function to determine the country of an airport.
-        def get_country(airport):
-            # Extracting country code from the airport_data dictionary.
-            iata_code = airport.iata_code
-            return airport_data.get(iata_code)['ISO country']
-                
-        filtered_series = [
-            series 
-            for series in self.flight_series_collection 
-            if get_country(series.departure_station) == country_code or get_country(series.arrival_station) == country_code
-        ]
+    Airports missing from the reference data have no country and are left out.
+    """
+    departure_country = flight_series.departure_station.iso_country
+    arrival_country = flight_series.arrival_station.iso_country
 
-        return filtered_series
+    countries = [] if departure_country is None else [departure_country]
+    if arrival_country is not None and arrival_country != departure_country:
+        countries.append(arrival_country)
+    return countries
 
 
+def _station_of(flight_series, iata_code):
+    """The Airport of a series with this IATA code, its departure or arrival station."""
+    departure_station = flight_series.departure_station
+    return departure_station if departure_station.iata_code == iata_code else flight_series.arrival_station
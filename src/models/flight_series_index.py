@@ -0,0 +1,170 @@
+import numpy as np
+import pandas as pd
+
+from models.flight_series import FlightSeries
+from utils.date_helper import parse_ssim_dates
+from utils.instrumentation import span, count
+
+# Fields with a hash index, and how to read the key of a series. Any FlightSeries attribute can be matched,
+# stations by IATA code; 'country' and 'station' match either end of the series
+_STATION_FIELDS = ('departure_station', 'arrival_station')
+_DERIVED_FIELDS = {
+    'departure_country': lambda fs: [fs.departure_station.iso_country],
+    'arrival_country': lambda fs: [fs.arrival_station.iso_country],
+    'country': lambda fs: [fs.departure_station.iso_country, fs.arrival_station.iso_country],
+    'station': lambda fs: [fs.departure_station.iata_code, fs.arrival_station.iata_code],
+}
+
+# Range criteria, backed by sorted arrays
+_TIME_RANGES = {'departure_time_between': 'departure_time', 'arrival_time_between': 'arrival_time'}
+_DATE_RANGE = 'operating_between'
+
+_MAX_DATE = np.datetime64('9999-12-31', 'D')
+
+
+class FlightSeriesIndex:
+    '''
+    Multi-criteria queries over a collection of flight series, all criteria combined with AND.
+
+        index.query(equipment='359', country='JP')
+        index.query(departure_station='AUH', operating_between=(date(2025, 7, 1), date(2025, 7, 31)))
+        index.query(service_type=['J', 'C'], departure_time_between=('0600', '1159'))
+
+    A value is matched for equality, a list, tuple or set of values means any of them. Eff/Dis overlap and
+    time of day ranges (both bounds included, a range such as ('2200', '0200') wraps past midnight) are read
+    from sorted arrays with a binary search. Indexes are built on first use of a field and kept for the
+    following queries; the criteria of a query are intersected starting from the most selective one.
+    '''
+
+    def __init__(self, flight_series_collection):
+        self.flight_series_collection = flight_series_collection
+        self._hash_indexes = {}
+        self._date_index = None
+        self._time_indexes = {}
+
+    def query(self, **criteria):
+        """Return the series matching all the criteria, in collection order."""
+
+        candidates = []
+        for name, value in criteria.items():
+            if name == _DATE_RANGE:
+                candidates.append(self._overlapping(*value))
+            elif name in _TIME_RANGES:
+                candidates.append(self._in_time_range(_TIME_RANGES[name], *value))
+            else:
+                candidates.append(self._matching(name, value))
+
+        if not candidates:
+            return list(self.flight_series_collection)
+
+        candidates.sort(key=len)
+        positions = candidates[0]
+        for other in candidates[1:]:
+            if not len(positions):
+                break
+            positions = np.intersect1d(positions, other, assume_unique=True)
+
+        collection = self.flight_series_collection
+        return [collection[position] for position in np.sort(positions).tolist()]
+
+    def _matching(self, field, value):
+        index = self._hash_indexes.get(field)
+        if index is None:
+            index = self._hash_indexes[field] = self._build_hash_index(field)
+
+        values = value if isinstance(value, (list, tuple, set, frozenset)) else [value]
+        keys = [getattr(item, 'iata_code', item) if field in _STATION_FIELDS else item for item in values]
+        found = [index[key] for key in set(keys) if key in index]
+        if not found:
+            return np.empty(0, dtype=np.int64)
+        return found[0] if len(found) == 1 else np.unique(np.concatenate(found))
+
+    def _build_hash_index(self, field):
+        if field in _DERIVED_FIELDS:
+            keys_of = _DERIVED_FIELDS[field]
+        elif field in _STATION_FIELDS:
+            keys_of = lambda fs: [getattr(fs, field).iata_code]
+        elif field in FlightSeries.__slots__:
+            keys_of = lambda fs: [getattr(fs, field)]
+        else:
+            raise ValueError(f'Unknown query criterion {field!r}')
+
+        with span('series.index_build'):
+            positions = {}
+            for position, flight_series in enumerate(self.flight_series_collection):
+                last = None
+                for key in keys_of(flight_series):
+                    # Both ends of a domestic series have the same country, keep it once
+                    if key is not None and key != last:
+                        positions.setdefault(key, []).append(position)
+                    last = key
+            count('series.index_builds')
+            return {key: np.array(found, dtype=np.int64) for key, found in positions.items()}
+
+    def _overlapping(self, start_date, end_date):
+        # Series whose Eff..Dis period shares at least one day with start..end. Scans only the side of the
+        # sorted arrays that starts (or ends) within reach, open ended series run on indefinitely
+        if self._date_index is None:
+            with span('series.index_build'):
+                effective = parse_ssim_dates([fs.effective_date for fs in self.flight_series_collection])
+                discontinued = parse_ssim_dates([fs.discontinued_date for fs in self.flight_series_collection])
+                discontinued = np.where(np.isnat(discontinued), _MAX_DATE, discontinued)
+                # Series without a valid Eff never match
+                known = np.flatnonzero(~np.isnat(effective))
+                by_effective = known[np.argsort(effective[known], kind='stable')]
+                by_discontinued = known[np.argsort(discontinued[known], kind='stable')]
+                self._date_index = (effective, discontinued, by_effective, effective[by_effective],
+                                    by_discontinued, discontinued[by_discontinued])
+                count('series.index_builds')
+
+        effective, discontinued, by_effective, sorted_effective, by_discontinued, sorted_discontinued = self._date_index
+        range_start, range_end = _to_day(start_date), _to_day(end_date)
+
+        started = np.searchsorted(sorted_effective, range_end, side='right')
+        not_ended = len(sorted_discontinued) - np.searchsorted(sorted_discontinued, range_start, side='left')
+        if started <= not_ended:
+            candidates = by_effective[:started]
+            return candidates[discontinued[candidates] >= range_start]
+        candidates = by_discontinued[len(sorted_discontinued) - not_ended:]
+        return candidates[effective[candidates] <= range_end]
+
+    def _in_time_range(self, field, start_time, end_time):
+        index = self._time_indexes.get(field)
+        if index is None:
+            with span('series.index_build'):
+                minutes = _to_minutes([getattr(fs, field) for fs in self.flight_series_collection])
+                order = np.argsort(minutes, kind='stable')
+                index = self._time_indexes[field] = (order, minutes[order])
+                count('series.index_builds')
+
+        order, sorted_minutes = index
+        start, end = _time_of_day(start_time), _time_of_day(end_time)
+
+        if start <= end:
+            return order[np.searchsorted(sorted_minutes, start, side='left'):np.searchsorted(sorted_minutes, end, side='right')]
+        # Wraps past midnight: from start to the end of the day, and from midnight to end
+        return np.concatenate([
+            order[np.searchsorted(sorted_minutes, start, side='left'):np.searchsorted(sorted_minutes, 24 * 60, side='left')],
+            order[:np.searchsorted(sorted_minutes, end, side='right')],
+        ])
+
+
+def _to_day(value):
+    # date, datetime, Timestamp or ISO string to datetime64[D]
+    return np.datetime64(pd.Timestamp(value).date(), 'D')
+
+
+def _time_of_day(time):
+    # One HHMM bound of a query to minutes since midnight
+    if not (isinstance(time, str) and len(time) == 4 and time.isdigit()):
+        raise ValueError(f'Expected an HHMM time, got {time!r}')
+    return int(time[:2]) * 60 + int(time[2:])
+
+
+def _to_minutes(times):
+    # HHMM strings to minutes since midnight, NaN (sorted last) when missing or malformed
+    text = pd.Series(times, dtype=object).astype('string')
+    valid = ((text.str.len() == 4) & text.str.isdigit()).fillna(False).to_numpy(dtype=bool)
+    hours = pd.to_numeric(text.str.slice(0, 2), errors='coerce').to_numpy(dtype=float)
+    minutes = pd.to_numeric(text.str.slice(2, 4), errors='coerce').to_numpy(dtype=float)
+    return np.where(valid, hours * 60 + minutes, np.nan)
@@ -1,24 +1,158 @@
+import bisect
+import datetime
+import numpy as np
 import pendulum
 
+# The season names only carry two digits of the year (S25, W25...), read as 20xx
+FIRST_YEAR = 2000
+LAST_YEAR = 2099
+
+
+def _last_sunday(year, month):
+    """Return the last Sunday of March or October (both have 31 days) of a year."""
+    last_day = datetime.date(year, month, 31)
+    return last_day - datetime.timedelta(days=(last_day.weekday() - 6) % 7)
+
+
+def _day(date):
+    return datetime.date(date.year, date.month, date.day)
+
+
+def _season_key(date):
+    """Return (year, 0 for summer or 1 for winter) of the season a date falls in, for any year."""
+    day = _day(date)
+    if day < _last_sunday(day.year, 3):
+        return day.year - 1, 1
+    if day < _last_sunday(day.year, 10):
+        return day.year, 0
+    return day.year, 1
+
+
+def _season_name(year, winter):
+    return f"{'W' if winter else 'S'}{year % 100:02d}"
+
+
+def _season_bounds(year, winter):
+    """Return the (start, end) dates of the summer or winter season starting in a year, for any year."""
+    if winter:
+        return _last_sunday(year, 10), _last_sunday(year + 1, 3) - datetime.timedelta(days=1)
+    return _last_sunday(year, 3), _last_sunday(year, 10) - datetime.timedelta(days=1)
+
+
+class SeasonCalendar:
+    '''
+    Precomputed IATA season boundaries.
+
+    Summer starts on the last Sunday of March and winter on the last Sunday of October. The start dates of 
+    every season from S00 to W99 are computed once into a sorted table, and a date's season is found by 
+    binary search in it: bisect for single dates, np.searchsorted for whole datetime64 arrays.
+    '''
+
+    def __init__(self, first_year=FIRST_YEAR, last_year=LAST_YEAR):
+        self.names = []
+        starts = []
+        for year in range(first_year, last_year + 1):
+            for prefix, month in (('S', 3), ('W', 10)):
+                self.names.append(f'{prefix}{str(year)[2:]}')
+                starts.append(_last_sunday(year, month))
+        # End of the last season in the table
+        starts.append(_last_sunday(last_year + 1, 3))
+
+        self.start_dates = starts
+        self.start_ordinals = [start.toordinal() for start in starts]
+        self.start_array = np.array(starts, dtype='datetime64[D]')
+        self._positions = {name: position for position, name in enumerate(self.names)}
+
+    def season_of(self, date):
+        """Return the name of the season (e.g. 'S25') a date or datetime falls in."""
+
+        position = bisect.bisect_right(self.start_ordinals, datetime.date(date.year, date.month, date.day).toordinal()) - 1
+        if 0 <= position < len(self.names):
+            return self.names[position]
+
+        # Outside the table, work it out directly
+        return _season_name(*_season_key(date))
+
+    def season_labels(self, dates):
+        """Vectorized season_of: takes a datetime64 array, returns an array of season names."""
+
+        dates = np.asarray(dates, dtype='datetime64[D]')
+        positions = np.searchsorted(self.start_array, dates, side='right') - 1
+        names = np.array(self.names + [None], dtype=object)
+
+        labels = names[np.clip(positions, 0, len(self.names))]
+        outside = (positions < 0) | (positions >= len(self.names))
+        for index in np.flatnonzero(outside & ~np.isnat(dates)):
+            labels[index] = self.season_of(dates[index].astype(datetime.date))
+        labels[np.isnat(dates)] = None
+
+        return labels
+
+    def season_dates(self, name):
+        """Return the (start, end) dates of a season, end being the day before the next season starts."""
+
+        position = self._positions[name]
+        return self.start_dates[position], self.start_dates[position + 1] - datetime.timedelta(days=1)
+
+    def seasons_between(self, start_date, end_date):
+        """Return the names of every season from the one of start_date to the one of end_date, in order."""
+
+        if self.start_dates[0] <= _day(start_date) and _day(end_date) < self.start_dates[-1]:
+            first = self._positions[self.season_of(start_date)]
+            last = self._positions[self.season_of(end_date)]
+            return self.names[first:last + 1]
+
+        # Some date outside the table, step through the seasons one by one
+        return [name for name, _ in self.dated_seasons_between(start_date, end_date)]
+
+    def dated_seasons_between(self, start_date, end_date):
+        """
+        Return (name, year the season starts in) of every season from the one of start_date to the one of
+        end_date, in order. Unlike the names alone, the years tell W99 of 1999 from W99 of 2099.
+        """
+
+        seasons = []
+        key, last_key = _season_key(start_date), _season_key(end_date)
+        while key <= last_key:
+            seasons.append((_season_name(*key), key[0]))
+            key = (key[0], 1) if key[1] == 0 else (key[0] + 1, 0)
+        return seasons
+
+
+season_calendar = SeasonCalendar()
+
+
 class IATA_Season: 
+    '''
+    An IATA season and its dates. The name only carries two digits of the year: without `year` (the year the
+    season starts in) it is read as 20xx, e.g. IATA_Season('W99') is the winter 2099/2100, and
+    IATA_Season('W99', 1999) the winter 1999/2000.
+    '''
 
-    def __init__(self, iata_season):
-        self.name = iata_season
-        self.start_date, self.end_date = self._calculate_dates(iata_season)
+    # Seasons are immutable, so there is only ever one instance per name and year
+    _instances = {}
 
-    def _calculate_dates(self, iata_season):
-        year = 2000 + int(iata_season[1:3])  # Convert to four-digit year
+    def __new__(cls, iata_season, year=None):
+        if year is None:
+            year = FIRST_YEAR + int(iata_season[1:])
+        instance = cls._instances.get((iata_season, year))
+        if instance is None:
+            instance = super().__new__(cls)
+            instance.name = iata_season
+            instance.year = year
+            instance.start_date, instance.end_date = instance._calculate_dates(iata_season, year)
+            cls._instances[(iata_season, year)] = instance
+        return instance
 
-        if iata_season[0] == "S":
-            start_date = pendulum.datetime(year, 3, 31, 0, 0, 0).last_of('month', day_of_week=pendulum.SUNDAY)
-            winter_start = pendulum.datetime(year, 10, 31, 0, 0, 0).last_of('month', day_of_week=pendulum.SUNDAY)
-            end_date = winter_start.subtract(days=1)
+    def _calculate_dates(self, iata_season, year):
+        if FIRST_YEAR <= year <= LAST_YEAR:
+            start_date, end_date = season_calendar.season_dates(iata_season)
         else:
-            start_date = pendulum.datetime(year, 10, 31, 0, 0, 0).last_of('month', day_of_week=pendulum.SUNDAY)
-            next_year_summer_start = pendulum.datetime(year+1, 3, 31, 0, 0, 0).last_of('month', day_of_week=pendulum.SUNDAY)
-            end_date = next_year_summer_start.subtract(days=1)
+            # Outside the table, from the last Sundays of March and October of the actual year
+            start_date, end_date = _season_bounds(year, iata_season.startswith('W'))
 
-        return start_date, end_date
+        return (pendulum.datetime(start_date.year, start_date.month, start_date.day),
+                pendulum.datetime(end_date.year, end_date.month, end_date.day))
 
     def __repr__(self):
         return f"{self.name}: {self.start_date} to {self.end_date}"
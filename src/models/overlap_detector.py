@@ -0,0 +1,182 @@
+import numpy as np
+import pandas as pd
+
+from models.flight_handler import first_flights, expand_flights
+from utils.date_helper import parse_ssim_dates, format_ssim_dates, days_of_operation_mask
+from utils.instrumentation import instrumented, count
+
+# What makes two series the same flight on the same leg
+LEG_KEY = ('airline_designator', 'flight_number', 'departure_station', 'arrival_station')
+# What else must be equal for two series of a leg to be merged into one
+COMPATIBLE_KEY = LEG_KEY + ('service_type', 'days_of_operation', 'departure_time', 'arrival_time', 'equipment', 'aircraft_configuration')
+
+# 'Day(s) of operation' text of each of the 128 weekday bitmasks, Monday being bit 0
+_DAYS_TEXT = np.array([''.join(str(day + 1) if bits >> day & 1 else ' ' for day in range(7)) for bits in range(128)], dtype=object)
+
+
+class OverlapDetector:
+    '''
+    Finds flight series operating the same flight on the same leg on the same dates, which would list those
+    flights twice in a permit, and merges series that continue one another.
+
+    Series are grouped by LEG_KEY and sorted by Eff, in one sort over the whole collection. Each series is
+    then only compared with the series of its group starting before it ends (a binary search in the sorted
+    Eff), so the work is O(n log n) plus the number of overlapping periods, never every pair. Overlapping
+    periods are intersected with the days of operation of both series to get the exact common dates.
+    '''
+
+    def __init__(self, flight_series_collection, end_date=None):
+        """
+        Args:
+            flight_series_collection (list of FlightSeries): The series to check.
+            end_date (date, optional): Used as discontinue date for open ended series (Dis 00XXX00),
+                as in FlightHandler. Without it those series never overlap nor merge.
+        """
+        self.flight_series_collection = flight_series_collection
+
+        self.effective_dates = parse_ssim_dates([fs.effective_date for fs in flight_series_collection])
+        self.discontinued_dates = parse_ssim_dates([fs.discontinued_date for fs in flight_series_collection])
+        if end_date is not None:
+            self.discontinued_dates[np.isnat(self.discontinued_dates)] = np.datetime64(pd.Timestamp(end_date).date(), 'D')
+        self.days_mask = days_of_operation_mask([fs.days_of_operation for fs in flight_series_collection])
+        self.valid = ~(np.isnat(self.effective_dates) | np.isnat(self.discontinued_dates))
+
+    @instrumented('overlaps.find')
+    def find_overlaps(self, with_dates=True):
+        """
+        Return one row per pair of series of the same leg sharing at least one flight date.
+
+        Columns: 'Series index' and 'Other series index' (positions in the collection, the first one
+        starting first), 'Airline designator', 'Flight number', 'Dept Stn', 'Arvl Stn', 'First date' and
+        'Last date' of the common flights, 'Day(s) of operation' they share, 'Flights' (how many) and,
+        unless with_dates is False, 'Dates' (the exact common dates, a datetime64 array).
+        """
+
+        first, second = self._candidate_pairs()
+
+        start = np.maximum(self.effective_dates[first], self.effective_dates[second])
+        end = np.minimum(self.discontinued_dates[first], self.discontinued_dates[second])
+        common_days = self.days_mask[first] & self.days_mask[second]
+        first_dates, counts = first_flights(start, end, common_days)
+
+        overlapping = counts.sum(axis=1) > 0
+        first, second = first[overlapping], second[overlapping]
+        first_dates, counts, common_days = first_dates[overlapping], counts[overlapping], common_days[overlapping]
+        count('overlaps.found', len(first))
+
+        # Common flights are stepped from the first one of each weekday: the earliest and latest of them
+        # bound the overlap, without expanding anything
+        flown = counts > 0
+        last_dates = first_dates + 7 * (counts - 1)
+
+        def series_column(values):
+            return np.asarray(values, dtype=object)[first]
+
+        collection = self.flight_series_collection
+        overlaps = pd.DataFrame({
+            'Series index': first,
+            'Other series index': second,
+            'Airline designator': series_column([fs.airline_designator for fs in collection]),
+            'Flight number': series_column([fs.flight_number for fs in collection]),
+            'Dept Stn': series_column([fs.departure_station.iata_code for fs in collection]),
+            'Arvl Stn': series_column([fs.arrival_station.iata_code for fs in collection]),
+            'First date': np.where(flown, first_dates, np.datetime64('9999-12-31', 'D')).min(axis=1),
+            'Last date': np.where(flown, last_dates, np.datetime64('0001-01-01', 'D')).max(axis=1),
+            'Day(s) of operation': _DAYS_TEXT[common_days @ (1 << np.arange(7))],
+            'Flights': counts.sum(axis=1),
+        })
+        if with_dates:
+            rows, dates = expand_flights(first_dates, counts)
+            overlaps['Dates'] = np.split(dates, np.cumsum(np.bincount(rows, minlength=len(first)))[:-1]) if len(first) else []
+        return overlaps
+
+    def count_distinct_flights(self):
+        """Return the number of flights of all the series, a flight operated by several overlapping series counted once."""
+
+        first, second = self._candidate_pairs()
+        involved = np.zeros(len(self.flight_series_collection), dtype=bool)
+        involved[first] = involved[second] = True
+
+        counts = first_flights(np.where(self.valid, self.effective_dates, np.datetime64(0, 'D')),
+                                np.where(self.valid, self.discontinued_dates, np.datetime64(-1, 'D')), self.days_mask)[1].sum(axis=1)
+        total = int(counts[~involved].sum())
+        if not involved.any():
+            return total
+
+        # Series that may overlap: expand their flights, then count each (leg, date) once
+        indexes = np.flatnonzero(involved)
+        rows, dates = expand_flights(*first_flights(self.effective_dates[indexes], self.discontinued_dates[indexes], self.days_mask[indexes]))
+        legs = self._group_ids(LEG_KEY)[indexes][rows]
+        return total + len(pd.DataFrame({'leg': legs, 'date': dates}).drop_duplicates())
+
+    @instrumented('overlaps.merge')
+    def merge_adjacent(self):
+        """
+        Return the collection with compatible series (same COMPATIBLE_KEY) that overlap or follow one another
+        merged into one series over the whole period.
+
+        Two series follow one another when no day of their schedule falls between the end of the first and
+        the start of the second, so a merge never adds nor removes a flight (overlapping ones are kept once).
+        A merged series takes the place of its first member in the collection, unmerged series are returned
+        as they are.
+        """
+
+        collection = self.flight_series_collection
+        if not collection:
+            return []
+
+        groups = np.where(self.valid, self._group_ids(COMPATIBLE_KEY), -1)
+        order = np.lexsort((np.arange(len(collection)), self.effective_dates, groups))
+        groups, effective, discontinued = groups[order], self.effective_dates[order], self.discontinued_dates[order]
+
+        # Latest Dis of the previous series of the same group, then a new run wherever a scheduled day is missed
+        previous_end = pd.Series(discontinued).groupby(groups).cummax().groupby(groups).shift().to_numpy(dtype='datetime64[D]')
+        same_group = ~np.isnat(previous_end)
+        gap_start = np.where(same_group, previous_end + 1, effective)
+        gap_end = effective - 1
+        missed = first_flights(gap_start, gap_end, self.days_mask[order])[1].sum(axis=1) > 0
+        new_run = ~same_group | missed | (groups < 0)
+        runs = np.cumsum(new_run) - 1
+
+        run_start = pd.Series(effective).groupby(runs).min().to_numpy(dtype='datetime64[D]')
+        run_end = pd.Series(discontinued).groupby(runs).max().to_numpy(dtype='datetime64[D]')
+        run_sizes = np.bincount(runs)
+        run_first = np.minimum.reduceat(order, np.flatnonzero(new_run))
+
+        merged = run_sizes > 1
+        start_text = iter(format_ssim_dates(run_start[merged]))
+        end_text = iter(format_ssim_dates(run_end[merged]))
+        count('overlaps.merged', int(run_sizes[merged].sum() - merged.sum()))
+
+        runs = [
+            (index, collection[index].with_dates(next(start_text), next(end_text)) if is_merged else collection[index])
+            for index, is_merged in zip(run_first.tolist(), merged.tolist())
+        ]
+        return [flight_series for _, flight_series in sorted(runs, key=lambda run: run[0])]
+
+    def _candidate_pairs(self):
+        # The sweep: after sorting by (leg, Eff), the series a series can overlap are the ones after it in its
+        # leg whose Eff is not after its Dis, a contiguous slice found by binary search
+        valid = np.flatnonzero(self.valid)
+        groups = self._group_ids(LEG_KEY)[valid]
+        effective = self.effective_dates[valid].astype(np.int64)
+        discontinued = self.discontinued_dates[valid].astype(np.int64)
+
+        order = np.lexsort((effective, groups))
+        # Days fit in 32 bits, so (leg, day) packs into one sortable integer
+        keys = (groups[order] << 32) + (effective[order] - np.iinfo(np.int32).min)
+        limits = (groups[order] << 32) + (discontinued[order] - np.iinfo(np.int32).min)
+        last = np.searchsorted(keys, limits, side='right')
+
+        positions = np.arange(len(order))
+        pair_counts = np.maximum(last - positions - 1, 0)
+        first = np.repeat(positions, pair_counts)
+        second = first + 1 + (np.arange(len(first)) - np.repeat(np.cumsum(pair_counts) - pair_counts, pair_counts))
+        return valid[order[first]], valid[order[second]]
+
+    def _group_ids(self, key):
+        rows = [
+            tuple(getattr(fs, field).iata_code if field.endswith('_station') else getattr(fs, field) for field in key)
+            for fs in self.flight_series_collection
+        ]
+        return pd.factorize(pd.Series(rows, dtype=object))[0].astype(np.int64)
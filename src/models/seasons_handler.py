@@ -1,5 +1,5 @@
-import pendulum
-from models.iata_season import IATA_Season
+from models.iata_season import IATA_Season, season_calendar
+from utils.instrumentation import instrumented
 
 
 class DateSeasonHandler:
@@ -16,39 +16,18 @@ class DateSeasonHandler:
     # I also thought a good byproduct of this work would be to open-source certain functions like this for other aviation people to use
     
     def determine_season(self, date):
-        summer_start = pendulum.datetime(date.year, 3, 31, 0, 0, 0).last_of('month', day_of_week=pendulum.SUNDAY)
-        winter_start = pendulum.datetime(date.year, 10, 31, 0, 0, 0).last_of('month', day_of_week=pendulum.SUNDAY)
-        
-        if summer_start <= date < winter_start:
-            return 'S' + str(date.year)[2:]
-        else:
-            if date < summer_start:
-                return 'W' + str(date.year - 1)[2:]
-            else:
-                return 'W' + str(date.year)[2:]
-            
+        # Table lookup, the season boundaries are precomputed in the season calendar
+        return season_calendar.season_of(date)
+
+    @instrumented('seasons.determine')
+    def determine_seasons(self, dates):
+        """Vectorized determine_season, for a numpy datetime64 array."""
+        return season_calendar.season_labels(dates)
     
+    @instrumented('seasons.iata')
     def get_iata_seasons(self):
-        seasons = []
-        
-        # Identify the season of the start and end dates
-        print (self.start_date)
-        start_season = self.determine_season(self.start_date)
-        end_season = self.determine_season(self.end_date)
-
-        # Now fill in the seasons in between
-        current_season = start_season
-        while current_season != end_season:
-            seasons.append(current_season)
-
-            # Move to the next season
-            if 'S' in current_season:
-                current_season = 'W' + current_season[1:]
-            else:
-                year = int(current_season[1:]) + 1
-                current_season = 'S' + str(year).zfill(2)
-        
-        # Add the end season and return
-        seasons.append(end_season)
+        # Identify the season of the start and end dates, and every season in between, dated from the year
+        # each one actually starts in rather than the 20xx read from its name
+        seasons = season_calendar.dated_seasons_between(self.start_date, self.end_date)
 
-        return [IATA_Season(season) for season in seasons]
\ No newline at end of file
+        return [IATA_Season(season, year) for season, year in seasons]
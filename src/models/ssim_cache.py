@@ -0,0 +1,198 @@
+import os
+import json
+import hashlib
+import numpy as np
+import pendulum
+
+from utils.file_helper import get_cache_dir
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc
+except ImportError:  # pragma: no cover - pyarrow is optional, without it nothing is cached
+    pa = None
+
+# Bump whenever the parsed dataframe or the header attributes change shape or content,
+# so caches written by an older parser are never read back
+PARSER_VERSION = 3
+
+# Default upper bound of the cache directory, least recently used entries are evicted past it
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+_HASH_BLOCK_SIZE = 1024 * 1024
+_ATTRIBUTES_KEY = b'ssim_attributes'
+_VALIDATION_KEY = b'ssim_validation'
+_DATE_ATTRIBUTES = ('start_date', 'end_date', 'exported_date')
+
+
+class SSIMParseCache:
+    '''
+    On-disk cache of parsed SSIM files: the flight leg dataframe, the header attributes and the validation counts.
+
+    Entries are Arrow IPC files named after the SHA-256 of the SSIM content and PARSER_VERSION, so a
+    file that is renamed or copied still hits and an edited file (or a new parser) simply misses.
+    Entries are memory-mapped when read. The directory is kept under `max_bytes` by evicting the least
+    recently used entries (an entry's mtime is refreshed on every hit), and entries of older parser
+    versions are deleted whenever a new entry is stored.
+    Without pyarrow, or without a writable cache directory, every lookup misses and nothing is stored.
+    '''
+
+    def __init__(self, cache_dir=None, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+
+    @property
+    def enabled(self):
+        return pa is not None and self._get_cache_dir() is not None
+
+    def load(self, ssim_file_path, digest=None):
+        """Return (df, attributes, validation) cached for this file, or None on a miss.
+
+        `digest` is the file_hash() of the file when the caller has it already, so the file is not read to hash it again.
+        """
+
+        entry_path = self._entry_path(ssim_file_path, digest)
+        if entry_path is None or not entry_path.exists():
+            return None
+
+        try:
+            with pa.memory_map(str(entry_path), 'r') as source:
+                table = pa.ipc.open_file(source).read_all()
+                attributes = _decode_attributes(table.schema.metadata[_ATTRIBUTES_KEY])
+                validation = json.loads(table.schema.metadata[_VALIDATION_KEY])
+                df = table.replace_schema_metadata().to_pandas()
+            os.utime(entry_path)
+        except (OSError, KeyError, ValueError, pa.ArrowException):
+            # Truncated or foreign file, drop it and parse again
+            entry_path.unlink(missing_ok=True)
+            return None
+
+        # Arrow hands back missing strings as None, the parser uses NaN
+        df = df.where(df.notna(), np.nan)
+
+        return df, attributes, validation
+
+    def store(self, ssim_file_path, df, attributes, validation=None, digest=None):
+        """Cache the parse of this file. Returns the path of the entry, None if nothing was written. See load() for digest."""
+
+        entry_path = self._entry_path(ssim_file_path, digest)
+        if entry_path is None:
+            return None
+
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        table = table.replace_schema_metadata({
+            _ATTRIBUTES_KEY: _encode_attributes(attributes),
+            _VALIDATION_KEY: json.dumps(validation).encode('utf-8'),
+        })
+
+        try:
+            # Write then rename, so a concurrent reader never maps a half written entry
+            temporary_path = entry_path.with_suffix(f'.{os.getpid()}.tmp')
+            with pa.OSFile(str(temporary_path), 'wb') as sink:
+                with pa.ipc.new_file(sink, table.schema) as writer:
+                    writer.write_table(table)
+            os.replace(temporary_path, entry_path)
+        except (OSError, pa.ArrowException):
+            return None
+
+        self.drop_stale_versions()
+        self.evict()
+        return entry_path
+
+    def drop_stale_versions(self):
+        """Delete the entries written by any other PARSER_VERSION, they can never be read back.
+
+        Returns the number of entries deleted.
+        """
+
+        cache_dir = self._get_cache_dir()
+        if cache_dir is None:
+            return 0
+
+        current_suffix = f'_v{PARSER_VERSION}.arrow'
+        stale_entries = [entry_path for entry_path in cache_dir.glob('*_v*.arrow') if not entry_path.name.endswith(current_suffix)]
+        for entry_path in stale_entries:
+            entry_path.unlink(missing_ok=True)
+
+        return len(stale_entries)
+
+    def invalidate(self, ssim_file_path=None):
+        """Delete the entries of one SSIM file (whatever the parser version), or the whole cache if no file is given.
+
+        Returns the number of entries deleted.
+        """
+
+        cache_dir = self._get_cache_dir()
+        if cache_dir is None:
+            return 0
+
+        pattern = f'{file_hash(ssim_file_path)}_v*.arrow' if ssim_file_path else '*.arrow'
+        entries = list(cache_dir.glob(pattern))
+        for entry_path in entries:
+            entry_path.unlink(missing_ok=True)
+
+        return len(entries)
+
+    def evict(self):
+        """Delete the least recently used entries until the cache fits in max_bytes."""
+
+        cache_dir = self._get_cache_dir()
+        if cache_dir is None:
+            return
+
+        entries = []
+        for entry_path in cache_dir.glob('*.arrow'):
+            try:
+                stat = entry_path.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime_ns, stat.st_size, entry_path))
+
+        total_size = sum(size for _, size, _ in entries)
+        for _, size, entry_path in sorted(entries, key=lambda entry: entry[0]):
+            if total_size <= self.max_bytes:
+                break
+            entry_path.unlink(missing_ok=True)
+            total_size -= size
+
+    def _entry_path(self, ssim_file_path, digest=None):
+        if pa is None:
+            return None
+        cache_dir = self._get_cache_dir()
+        if cache_dir is None:
+            return None
+        return cache_dir / f'{digest or file_hash(ssim_file_path)}_v{PARSER_VERSION}.arrow'
+
+    def _get_cache_dir(self):
+        return self.cache_dir or get_cache_dir('ssim')
+
+
+def file_hash(path):
+    """Return the SHA-256 hex digest of a file's content."""
+
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for block in iter(lambda: file.read(_HASH_BLOCK_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _encode_attributes(attributes):
+    # Header dates are whole days in UTC, stored as ISO dates
+    encoded = dict(attributes)
+    for name in _DATE_ATTRIBUTES:
+        if encoded.get(name) is not None:
+            encoded[name] = encoded[name].to_date_string()
+    return json.dumps(encoded).encode('utf-8')
+
+
+def _decode_attributes(raw):
+    attributes = json.loads(raw)
+    for name in _DATE_ATTRIBUTES:
+        if attributes.get(name) is not None:
+            year, month, day = map(int, attributes[name].split('-'))
+            attributes[name] = pendulum.datetime(year, month, day)
+    return attributes
+
+
+ssim_parse_cache = SSIMParseCache()
@@ -3,8 +3,10 @@ import pandas as pd
 from collections import namedtuple
 import sys
 from models.ssim_file_reader import SSIMFileReader
+from models.ssim_cache import ssim_parse_cache, file_hash
 from models.seasons_handler import DateSeasonHandler
 from models.flight_series_handler import FlightSeriesHandler
+from utils.instrumentation import span, count
 
 class SSIM_File: 
     '''This class initiates a SSIM file object. 
@@ -12,18 +14,30 @@ class SSIM_File:
     create attributes for the object (UTC, local, start/end date etc.)
     '''
 
-    def __init__(self, ssim_file_path):
+    def __init__(self, ssim_file_path, use_cache=True):
+        # use_cache=False always reparses the file and leaves the parse cache untouched
         self.reader = SSIMFileReader(ssim_file_path)
-        self.attributes = self.reader.get_attributes()
-        print(self.attributes)
-        attributes = self.reader.get_attributes()
+        with span('ssim.load'):
+            # Hashed once, for the lookup and, on a miss, to store the parse
+            digest = file_hash(ssim_file_path) if use_cache and ssim_parse_cache.enabled else None
+            cached = ssim_parse_cache.load(ssim_file_path, digest) if use_cache else None
+            if cached is not None:
+                count('ssim.cache_hits')
+                self.df, self.attributes, self.validation = cached
+            else:
+                # A single pass over the file: header, legs and the record serial number checks
+                self.attributes, self.df, self.validation = self.reader.read(self._get_col_data())
+                if use_cache:
+                    count('ssim.cache_misses')
+                    ssim_parse_cache.store(ssim_file_path, self.df, self.attributes, self.validation, digest)
+        attributes = self.attributes
         self.timezone_mode = attributes['timezone_mode']
         self.start_date = attributes['start_date']
         self.end_date = attributes['end_date']
         self.exported_date = attributes['exported_date']
-        self.df = self.reader.get_dataframe(ssim_file_path, *self._get_col_data())
         self.season_handler = DateSeasonHandler(self.start_date, self.end_date)
         self.iata_seasons = self.season_handler.get_iata_seasons()
+        # Callers should use this handler (series, country index) instead of building their own from df
         self.flight_series_handler = FlightSeriesHandler()
         self.flight_series_list = self.flight_series_handler.create_flight_series_from_df(self.df)
 
@@ -73,7 +87,9 @@ class SSIM_File:
         'Arvl Stn',
         'Arvl time (pax)',
         'Equipment', 
-        'Aircraft configuration']
+        'Aircraft configuration',
+        'UTC/Local Time variation (dept)',
+        'UTC/Local Time variation']
 
         col_length_data = [(0,1),(1,2),
         (2,5),(5,9),
@@ -101,6 +117,12 @@ class SSIM_File:
 
         return col_length, col_headers, cols_to_keep
     
+    def get_normalized_times(self, target='local'):
+        '''Departure and arrival times of every leg converted to 'local' or 'UTC' time (in any case), see lib.time_normalizer.'''
+        # Imported here, lib.time_normalizer imports the models
+        from lib.time_normalizer import normalize_times
+        return normalize_times(self.df, self.timezone_mode, target)
+
     def export_to_csv(self, filename):
         self.df.to_csv(filename, index=False)
 
@@ -1,62 +1,230 @@
 import pendulum
+from collections import namedtuple
+import numpy as np
 import pandas as pd
 
+from models.ssim_header import RECORD_LENGTH, DEFAULT_CHUNK_SIZE, iter_raw_records, read_carrier_record, parse_carrier_record
+from utils.instrumentation import span, count, instrumented
+
+# Same strings pd.read_fwf treats as missing by default, so both engines agree on NaN
+_NA_VALUES = ['', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan', '1.#IND',
+              '1.#QNAN', '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a', 'nan', 'null']
+
+# Record types with a serial number: header, carrier, flight leg, segment data, trailer
+_RECORD_TYPES = (b'1', b'2', b'3', b'4', b'5')
+
+# Result of SSIMFileReader.read()
+SSIMReadResult = namedtuple('SSIMReadResult', ['attributes', 'df', 'validation'])
+
 class SSIMFileReader:
 
     def __init__(self, ssim_file_path):
         self.ssim_file_path = ssim_file_path
 
+    @instrumented('ssim.header')
     def get_attributes(self):
         '''
         This function takes an SSIM file and returns a dictionary with the main attributes of the file.
         For example, it tells if the file is in local or UTC mode, the start and end date of the file in local and utc, etc
         The idea of this function is that it will be used to create a SSIMFile object 
+
+        Only reads the file up to its first type 2 (carrier) record. Use read() to get the legs as well in the same pass.
         '''
-        
-        with open(self.ssim_file_path, 'r') as file:
-            for line in file:
-                if line.startswith('2'):
-                    self.timezone_mode = 'local' if line[1] == 'L' else 'UTC' if line[1] == 'U' else None
-                    
-                    start_date_str = line[14:21].title()  # Convert to format with first letter capital
-                    self.start_date = pendulum.from_format(start_date_str, "DDMMMYY")
-
-                    end_date_str = line[21:28].title()  # Convert to format with first letter capital
-                    self.end_date = pendulum.from_format(end_date_str, "DDMMMYY")
-
-                    try:
-                        exported_date_str = line[28:35].title()  # Convert to format with first letter capital
-                        self.exported_date = pendulum.from_format(exported_date_str, "DDMMMYY")
-                    except:
-                        self.exported_date = None
-                    
-                    # Once we find and process the line starting with '2', we can break out of the loop
-                    break
-        return {
-        'timezone_mode': self.timezone_mode,
-        'start_date': self.start_date,
-        'end_date': self.end_date,
-        'exported_date': self.exported_date
-        }
-
-    def get_dataframe(self, filename, col_length, col_headers, cols_to_keep):
+
+        return _carrier_attributes(read_carrier_record(self.ssim_file_path))
+
+    def read(self, col_data=None):
+        """Reads the whole file in a single pass: header attributes, flight legs and validation counts.
+
+        Every record is looked at once. The first type 2 record gives the attributes (as get_attributes), 
+        type 3 records become the legs (as get_dataframe) and the record serial numbers are checked along 
+        the way, against each other and against the type 5 trailer.
+
+        Parameters:
+        - col_data (tuple): (col_length, col_headers, cols_to_keep), defaults to SSIM_File's column spec.
+
+        Returns:
+        SSIMReadResult: (attributes, df, validation). `validation` holds the number of records of each type 
+        ('record_counts'), of serial numbers not following the previous record ('serial_errors'), and the 
+        trailer checks: 'trailer_found', 'trailer_check_ok' (the trailer's check reference is the serial of 
+        the record before it) and 'trailer_end_ok' (end code 'E').
+
+        Raises:
+        ValueError: The file has no type 2 record (e.g. an empty or NUL filled file).
+        """
+
+        col_length, col_headers, cols_to_keep = col_data or _default_col_data()
+
+        with span('ssim.read'):
+            # Filler (type 0) records carry no serial number, everything else is kept in file order
+            numbered = []
+            filler_records = 0
+            unknown_records = 0
+            for chunk in self._iter_raw_records(self.ssim_file_path):
+                for record in chunk:
+                    record_type = record[:1]
+                    if record_type in _RECORD_TYPES:
+                        numbered.append(record)
+                    elif record_type == b'0':
+                        filler_records += 1
+                    else:
+                        unknown_records += 1
+
+            matrix = _records_matrix(numbered)
+            record_types = matrix[:, 0]
+            carrier_positions = np.flatnonzero(record_types == ord('2'))
+            if not len(carrier_positions):
+                raise ValueError(f'{self.ssim_file_path} has no type 2 (carrier) record')
+
+            # Serial numbers run from 000001 and wrap from 999999 back to 000001. Non numeric ones count as errors
+            serial_numbers = _to_numbers(matrix[:, 194:200])
+            expected = np.concatenate([[1], serial_numbers[:-1] % 999999 + 1])
+            serial_errors = int(np.count_nonzero((serial_numbers != expected) | (serial_numbers < 0)))
+
+            record_counts = {'0': filler_records}
+            for record_type in '12345':
+                record_counts[record_type] = int(np.count_nonzero(record_types == ord(record_type)))
+
+            validation = {
+                'record_counts': record_counts,
+                'unknown_records': unknown_records,
+                'serial_errors': serial_errors,
+                'trailer_found': False,
+                'trailer_check_ok': None,
+                'trailer_end_ok': None,
+            }
+            trailer_positions = np.flatnonzero(record_types == ord('5'))
+            if len(trailer_positions):
+                trailer = trailer_positions[-1]
+                check_reference = _to_numbers(matrix[trailer:trailer + 1, 187:193])[0]
+                validation['trailer_found'] = True
+                validation['trailer_check_ok'] = bool(trailer > 0 and check_reference >= 0 and check_reference == serial_numbers[trailer - 1])
+                validation['trailer_end_ok'] = bool(matrix[trailer, 193] == ord('E'))
+
+            legs = matrix[record_types == ord('3')]
+            count('ssim.legs', len(legs))
+            return SSIMReadResult(
+                _carrier_attributes(numbered[carrier_positions[0]]),
+                self._parse_matrix(legs, col_length, col_headers, cols_to_keep),
+                validation)
+
+    def get_dataframe(self, filename, col_length, col_headers, cols_to_keep, engine='bytes'):
 
         """Parses a fixed-width file (SSIM) and returns a filtered dataframe based on given specifications.
     
         This function will filter out rows specific to flights (where Record type is 3) and also 
         apply specific transformations to columns 'Arvl time (pax)' and 'Flight number'.
-        It then stores the resultant dataframe as an attribute for the instance.
+        
+        The default 'bytes' engine reads the file as a single buffer, keeps only the type 3 records and 
+        slices only the columns in `cols_to_keep`. The 'fwf' engine is the original pd.read_fwf 
+        implementation, kept as a reference. Both return the same dataframe.
         
         Parameters:
         - filename (str): The path to the SSIM file to be read.
         - col_length (list of tuple): A list specifying the start and end position of each column.
         - col_headers (list of str): A list containing names for each column.
         - cols_to_keep (list of str): Columns that are to be retained in the final dataframe.
+        - engine (str): 'bytes' (default) or 'fwf'.
         
         Returns:
-        None. But it updates the instance's `df` attribute with the processed dataframe. """
+        pd.DataFrame: One row per flight leg (type 3 record), with the columns in `cols_to_keep`. """
+
+        if engine == 'fwf':
+            return self._get_dataframe_fwf(filename, col_length, col_headers, cols_to_keep)
+        if engine != 'bytes':
+            raise ValueError(f"Unknown engine '{engine}', expected 'bytes' or 'fwf'")
+
+        with span('ssim.parse'):
+            records = [
+                record 
+                for chunk in self._iter_raw_records(filename) 
+                for record in chunk 
+                if record[:1] == b'3'
+            ]
+            count('ssim.legs', len(records))
+            return self._parse_records(records, col_length, col_headers, cols_to_keep)
+
+    def iter_records(self, chunk_size=DEFAULT_CHUNK_SIZE, col_data=None):
+        """Streams the flight legs (type 3 records) of the file as a sequence of small dataframes.
+
+        The file is memory-mapped and framed into records one block at a time, so memory use depends on 
+        `chunk_size` and not on the size of the file. Each chunk has the same columns as get_dataframe().
+
+        Parameters:
+        - chunk_size (int): Maximum number of legs per yielded dataframe.
+        - col_data (tuple): (col_length, col_headers, cols_to_keep), defaults to SSIM_File's column spec.
+
+        Yields:
+        pd.DataFrame: Consecutive chunks of flight legs, in file order.
+        """
+
+        col_length, col_headers, cols_to_keep = col_data or _default_col_data()
+
+        legs = []
+        for chunk in self._iter_raw_records(self.ssim_file_path, chunk_size):
+            legs.extend(record for record in chunk if record[:1] == b'3')
+            while len(legs) >= chunk_size:
+                yield self._parse_records(legs[:chunk_size], col_length, col_headers, cols_to_keep)
+                legs = legs[chunk_size:]
+        if legs:
+            yield self._parse_records(legs, col_length, col_headers, cols_to_keep)
 
-        df = pd.read_fwf(filename, colspecs=col_length, header=None, names=col_headers)
+    def iter_country_records(self, country_code, chunk_size=DEFAULT_CHUNK_SIZE):
+        """Streams the legs departing from or arriving in `country_code`, one filtered chunk at a time."""
+
+        countries = _station_countries()
+        for df in self.iter_records(chunk_size):
+            in_country = (df['Dept Stn'].map(countries) == country_code) | (df['Arvl Stn'].map(countries) == country_code)
+            if in_country.any():
+                yield df[in_country].reset_index(drop=True)
+
+    def get_unique_countries(self, chunk_size=DEFAULT_CHUNK_SIZE):
+        """Return a set of all the countries served in the file, without loading the whole file."""
+
+        countries = _station_countries()
+        unique_countries = set()
+        for df in self.iter_records(chunk_size):
+            unique_countries.update(df['Dept Stn'].map(countries).dropna())
+            unique_countries.update(df['Arvl Stn'].map(countries).dropna())
+
+        return unique_countries
+
+    @staticmethod
+    def _iter_raw_records(filename, chunk_size=DEFAULT_CHUNK_SIZE):
+        """Yields lists of at most `chunk_size` raw records (bytes, without line terminators), see ssim_header.iter_raw_records."""
+        return iter_raw_records(filename, chunk_size)
+
+    @staticmethod
+    def _parse_records(records, col_length, col_headers, cols_to_keep):
+        """Builds the flight leg dataframe from a list of raw type 3 records (bytes).
+
+        The records are packed into a single (n, 200) byte matrix so that each column is a plain 
+        slice of it, and all the string clean up (strip, zero padding, concatenation) is vectorized.
+        """
+
+        return SSIMFileReader._parse_matrix(_records_matrix(records), col_length, col_headers, cols_to_keep)
+
+    @staticmethod
+    def _parse_matrix(matrix, col_length, col_headers, cols_to_keep):
+        """_parse_records, for records already packed into an (n, 200) uint8 matrix."""
+
+        positions = dict(zip(col_headers, col_length))
+        columns = {}
+        for column in cols_to_keep:
+            start, end = positions[column]
+            values = pd.Series(_strip_columns(matrix[:, start:end]), dtype=object)
+            columns[column] = values.where(~values.isin(_NA_VALUES))
+
+        df = pd.DataFrame(columns, columns=cols_to_keep)
+        df['Arvl time (pax)'] = df['Arvl time (pax)'].str.lstrip('0').replace('', '0').str.zfill(4)
+        df['Flight number'] = df['Airline designator'] + '  ' + df['Flight number'].str.zfill(4)
+
+        return df
+
+    def _get_dataframe_fwf(self, filename, col_length, col_headers, cols_to_keep):
+        # Read as text, otherwise '+0400' style offsets are inferred as numbers and lose their format
+        variations = {column: str for column in col_headers if column.startswith('UTC/Local Time variation')}
+        df = pd.read_fwf(filename, colspecs=col_length, header=None, names=col_headers, dtype=variations)
         # Filter rows for flights
         df = df[df['Record type'] == 3]
         df = df[cols_to_keep]
@@ -67,5 +235,71 @@ class SSIMFileReader:
 
         return df
 
-    def export_df (self, filename):
-        self.df.to_csv(filename, index=False)
\ No newline at end of file
+    def export_df(self, filename, chunk_size=DEFAULT_CHUNK_SIZE):
+        """Writes the flight legs of the file to a csv, streaming it chunk by chunk."""
+
+        with open(filename, 'w', newline='') as csv_file:
+            header = True
+            for df in self.iter_records(chunk_size):
+                df.to_csv(csv_file, index=False, header=header)
+                header = False
+            if header:
+                csv_file.write(','.join(_default_col_data()[2]) + '\n')
+
+def _strip_columns(block):
+    """Turns a (n, width) byte block into n python strings with leading/trailing blanks removed.
+
+    Same result as calling str.strip(' \\t') on every field, but done on the whole block at once: each row 
+    is shifted left past its leading blanks, and trailing blanks are blanked out with NULs, which numpy 
+    drops when it converts fixed width unicode back to str.
+    """
+
+    width = block.shape[1]
+    not_blank = (block != ord(' ')) & (block != ord('\t'))
+    first = not_blank.argmax(axis=1)
+    last = width - 1 - not_blank[:, ::-1].argmax(axis=1)
+
+    index = np.arange(width) + first[:, None]
+    keep = (index <= last[:, None]) & not_blank.any(axis=1)[:, None]
+
+    # Latin-1 code points are the byte values, so widening to uint32 decodes the block in place
+    chars = np.take_along_axis(block, np.minimum(index, width - 1), axis=1).astype(np.uint32)
+    chars[~keep] = 0
+
+    return chars.view(f'U{width}').ravel().astype(object)
+
+
+def _records_matrix(records):
+    """Packs raw records (bytes) into an (n, 200) uint8 matrix, short records padded with blanks."""
+    buffer = b''.join(record.ljust(RECORD_LENGTH)[:RECORD_LENGTH] for record in records)
+    return np.frombuffer(buffer, dtype=np.uint8).reshape(len(records), RECORD_LENGTH)
+
+
+def _to_numbers(block):
+    """Reads each row of an (n, width) block of ASCII digits as an integer, -1 where a row is not all digits."""
+    digits = block.astype(np.int64) - ord('0')
+    numbers = digits @ (10 ** np.arange(block.shape[1] - 1, -1, -1, dtype=np.int64))
+    return np.where(((digits >= 0) & (digits <= 9)).all(axis=1), numbers, -1)
+
+
+def _carrier_attributes(record):
+    """Header attributes of the file, from its type 2 (carrier) record, the dates as pendulum datetimes (UTC midnight)."""
+
+    attributes = parse_carrier_record(record)
+    for name in ('start_date', 'end_date', 'exported_date'):
+        value = attributes[name]
+        if value is not None:
+            attributes[name] = pendulum.datetime(value.year, value.month, value.day)
+    return attributes
+
+
+def _default_col_data():
+    # Imported here, ssim_file imports this module
+    from models.ssim_file import SSIM_File
+    return SSIM_File._get_col_data()
+
+
+def _station_countries():
+    """Maps every IATA station code to its ISO country."""
+    from models.airport import airport_registry
+    return airport_registry.get_country_map()
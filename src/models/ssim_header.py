@@ -0,0 +1,104 @@
+# Raw SSIM records and the carrier (type 2) header, with the standard library only.
+#
+# Checking what a file is (its time mode and period) should not cost the import of numpy, pandas and pendulum:
+# the CLI's `inspect` only needs this module. SSIMFileReader builds on it for everything else.
+
+import mmap
+from datetime import date
+
+# Every SSIM record is a fixed 200 byte line
+RECORD_LENGTH = 200
+
+# Default number of records handed out per chunk by the streaming API
+DEFAULT_CHUNK_SIZE = 10000
+
+_MONTHS = {month: number for number, month in enumerate(
+    ['JAN', 'FEB', 'MAR', 'APR', 'MAY', 'JUN', 'JUL', 'AUG', 'SEP', 'OCT', 'NOV', 'DEC'], start=1)}
+
+
+def iter_raw_records(filename, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Yields lists of at most `chunk_size` raw records (bytes, without line terminators).
+
+    Records are normally newline separated, but some exports write the 200 byte records back to back
+    or pad the file with NUL bytes. NULs are dropped, and if the first record is not followed by a
+    newline the content is cut into fixed 200 byte records instead of lines.
+    """
+
+    with open(filename, 'rb') as file:
+        # mmap refuses to map empty files
+        if not file.seek(0, 2):
+            return
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            block_size = chunk_size * (RECORD_LENGTH + 2)
+            fixed_width = None
+            pending = b''
+
+            for offset in range(0, len(mapped), block_size):
+                content = pending + mapped[offset:offset + block_size].replace(b'\x00', b'')
+                if not content:
+                    continue
+
+                if fixed_width is None:
+                    if len(content) <= RECORD_LENGTH and offset + block_size < len(mapped):
+                        pending = content
+                        continue
+                    fixed_width = b'\n' not in content[:RECORD_LENGTH + 2]
+
+                if fixed_width:
+                    cut = len(content) - len(content) % RECORD_LENGTH
+                    records = [content[i:i + RECORD_LENGTH] for i in range(0, cut, RECORD_LENGTH)]
+                else:
+                    cut = content.rfind(b'\n') + 1
+                    records = [line.rstrip(b'\r') for line in content[:cut].split(b'\n')]
+                pending = content[cut:]
+
+                records = [record for record in records if record.strip()]
+                for start in range(0, len(records), chunk_size):
+                    yield records[start:start + chunk_size]
+
+            # Last line without a trailing newline, or a short last record
+            if pending.strip():
+                yield [pending.rstrip(b'\r')]
+
+
+def read_carrier_record(filename):
+    """Returns the first type 2 (carrier) record of a file, reading no further. Raises ValueError if there is none."""
+
+    # Small chunks, the carrier record is normally the second one of the file
+    for chunk in iter_raw_records(filename, chunk_size=256):
+        for record in chunk:
+            if record[:1] == b'2':
+                return record
+
+    raise ValueError(f'{filename} has no type 2 (carrier) record')
+
+
+def parse_carrier_record(record):
+    """Header attributes of the file, from its type 2 (carrier) record, with the dates as datetime.date."""
+
+    text = record.decode('latin-1')
+    start_date = parse_header_date(text[14:21])
+    end_date = parse_header_date(text[21:28])
+    if start_date is None or end_date is None:
+        raise ValueError(f'Invalid period in the carrier record: {text[14:28]!r}')
+
+    return {
+        'timezone_mode': 'local' if text[1] == 'L' else 'UTC' if text[1] == 'U' else None,
+        'start_date': start_date,
+        'end_date': end_date,
+        # The creation date is optional
+        'exported_date': parse_header_date(text[28:35]),
+    }
+
+
+def parse_header_date(value):
+    """A DDMMMYY date as a datetime.date, None if it is not a date.
+
+    Two digit years follow the same pivot as pendulum.from_format: 69-99 are 19xx, 00-68 are 20xx.
+    """
+
+    try:
+        day, month, year = int(value[0:2]), _MONTHS[value[2:5].upper()], int(value[5:7])
+        return date(year + (1900 if year >= 69 else 2000), month, day)
+    except (KeyError, ValueError):
+        return None
@@ -0,0 +1,30 @@
+import numpy as np
+import pandas as pd
+
+# SSIM dates are DDMMMYY (e.g. 01JAN25). Open ended periods use 00XXX00, which parses to NaT.
+SSIM_DATE_FORMAT = '%d%b%y'
+
+
+def parse_ssim_dates(values):
+    """Parse an array of SSIM dates into a numpy datetime64[D] array (NaT where a value is not a date)."""
+    return pd.to_datetime(pd.Series(values, dtype=object), format=SSIM_DATE_FORMAT, errors='coerce').to_numpy().astype('datetime64[D]')
+
+
+def format_ssim_dates(dates):
+    """The reverse of parse_ssim_dates: datetime64 values back to DDMMMYY strings."""
+    return pd.Series(pd.to_datetime(dates)).dt.strftime(SSIM_DATE_FORMAT).str.upper().to_numpy()
+
+
+def days_of_operation_mask(values):
+    """
+    Turn 'Day(s) of operation' strings into an (n, 7) boolean array, column 0 being Monday.
+
+    The digits themselves are the days (1 = Monday ... 7 = Sunday), so both '1     7' and '17' work.
+    """
+    days = pd.Series(values, dtype=object).fillna('')
+    return np.column_stack([days.str.contains(str(day), regex=False).to_numpy(dtype=bool) for day in range(1, 8)]).reshape(len(days), 7)
+
+
+def weekday(dates):
+    """Day of the week of datetime64[D] values, 0 = Monday (1 January 1970 was a Thursday)."""
+    return (dates.astype('datetime64[D]').astype(np.int64) + 3) % 7
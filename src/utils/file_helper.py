@@ -1 +1,42 @@
-# TODO: What shall this include?
+import os
+import sys
+import site
+from pathlib import Path
+
+# Repository root (landingpermit_app), resolved from this file so nothing depends on the working directory
+PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
+
+# Where `pip install .` puts the industry data (data_files in setup.py), for a system/venv or a --user install
+INSTALLED_DATA_DIRS = [Path(prefix) / 'share' / 'landingpermit_app' / 'data' for prefix in (sys.prefix, site.USER_BASE) if prefix]
+
+
+def get_data_dir():
+    """Return the directory holding the bundled data (industry reference data, sample SSIMs).
+
+    The first of: the LANDINGPERMIT_DATA_DIR environment variable, the data directory of the source tree
+    (a checkout or an editable install), the data installed with the package.
+    """
+    if 'LANDINGPERMIT_DATA_DIR' in os.environ:
+        return Path(os.environ['LANDINGPERMIT_DATA_DIR'])
+
+    source_data_dir = PROJECT_ROOT / 'data'
+    if source_data_dir.is_dir():
+        return source_data_dir
+    return next((data_dir for data_dir in INSTALLED_DATA_DIRS if data_dir.is_dir()), source_data_dir)
+
+
+def get_cache_dir(*parts):
+    """Return (and create) a directory for derived, rebuildable files such as indexes and parse caches.
+
+    Defaults to ~/.cache/landingpermit_app, can be overridden with LANDINGPERMIT_CACHE_DIR.
+    Returns None if the directory cannot be created, callers should then work without a cache.
+    """
+    base_directory = os.environ.get('LANDINGPERMIT_CACHE_DIR', Path.home() / '.cache' / 'landingpermit_app')
+    cache_directory = Path(base_directory, *parts)
+
+    try:
+        cache_directory.mkdir(parents=True, exist_ok=True)
+    except OSError:
+        return None
+
+    return cache_directory
@@ -0,0 +1,133 @@
+# Stage level timing spans and counters, cheap enough to stay on in production.
+#
+#     with span('ssim.parse'):
+#         ...
+#     count('ssim.legs', len(records))
+#
+# Spans nest: a span opened inside another is recorded under 'parent/child'. For every span path the number of
+# calls, total and max time are kept, nothing per call, so memory does not grow with the run. report() returns
+# everything as a dict and write_report() saves it as JSON.
+#
+# Environment variables:
+#     LANDINGPERMIT_INSTRUMENTATION=0    turns spans and counters into no-ops.
+#     LANDINGPERMIT_PROFILE=<span name>  runs every span with that name (e.g. 'ssim.parse') under cProfile and
+#                                        dumps the stats to LANDINGPERMIT_PROFILE_DIR (default: the working directory).
+#                                        The .prof files open in snakeviz, or flameprof for a flame graph.
+#
+# Spans opened in worker processes (e.g. the permit pool) stay in those processes, only the parent's are reported.
+# The open span is tracked per context (contextvars), not per thread: asyncio tasks sharing the event loop's thread,
+# such as the service's concurrent jobs, each nest their spans under their own parents.
+
+import os
+import json
+import time
+import cProfile
+import threading
+import contextvars
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from functools import wraps
+
+_enabled = os.environ.get('LANDINGPERMIT_INSTRUMENTATION', '1') != '0'
+_profiled_span = os.environ.get('LANDINGPERMIT_PROFILE')
+
+_lock = threading.Lock()
+# Path of the innermost open span of the current thread or asyncio task, None outside any span
+_current_path = contextvars.ContextVar('landingpermit_span_path', default=None)
+_spans = {}
+_counters = {}
+_started = time.time()
+
+
+@contextmanager
+def span(name):
+    """Times the enclosed block under `name`, nested in the span currently open in this thread (or asyncio task) if any."""
+
+    if not _enabled:
+        yield
+        return
+
+    parent = _current_path.get()
+    path = f'{parent}/{name}' if parent else name
+    token = _current_path.set(path)
+
+    profiler = cProfile.Profile() if name == _profiled_span else None
+    start = time.perf_counter()
+    if profiler:
+        profiler.enable()
+    try:
+        yield
+    finally:
+        if profiler:
+            profiler.disable()
+        elapsed = time.perf_counter() - start
+        _current_path.reset(token)
+        with _lock:
+            stats = _spans.get(path)
+            if stats is None:
+                _spans[path] = [1, elapsed, elapsed]
+            else:
+                stats[0] += 1
+                stats[1] += elapsed
+                stats[2] = max(stats[2], elapsed)
+        if profiler:
+            _dump_profile(profiler, name)
+
+
+def instrumented(name):
+    """Decorator form of span()."""
+
+    def decorator(function):
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def count(name, value=1):
+    """Adds `value` to the counter `name`."""
+
+    if _enabled:
+        with _lock:
+            _counters[name] = _counters.get(name, 0) + value
+
+
+def report():
+    """Returns the spans and counters recorded since the start (or the last reset) as a JSON serializable dict."""
+
+    with _lock:
+        return {
+            'started': datetime.fromtimestamp(_started, timezone.utc).isoformat(timespec='seconds'),
+            'wall_seconds': time.time() - _started,
+            'pid': os.getpid(),
+            'spans': {
+                path: {'calls': calls, 'total_seconds': total, 'max_seconds': longest}
+                for path, (calls, total, longest) in sorted(_spans.items())
+            },
+            'counters': dict(sorted(_counters.items())),
+        }
+
+
+def write_report(path):
+    """Saves report() as JSON. Returns the path."""
+
+    with open(path, 'w') as report_file:
+        json.dump(report(), report_file, indent=2)
+    return path
+
+
+def reset():
+    global _started
+    with _lock:
+        _spans.clear()
+        _counters.clear()
+        _started = time.time()
+
+
+def _dump_profile(profiler, name):
+    profile_dir = os.environ.get('LANDINGPERMIT_PROFILE_DIR', os.getcwd())
+    os.makedirs(profile_dir, exist_ok=True)
+    stamp = datetime.now().strftime('%Y%m%d_%H%M%S_%f')
+    profiler.dump_stats(os.path.join(profile_dir, f'{name}_{os.getpid()}_{stamp}.prof'))
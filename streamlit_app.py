@@ -1,69 +1,212 @@
+import os
+import sys
+import hashlib
+import tempfile
 import streamlit as st
-import pandas as pd
-from datetime import datetime, date
+import numpy as np
+from pathlib import Path
 
-# define global variables
-today = datetime.now()
-start_of_year = date(today.year, 1, 1)
-end_of_year = date(today.year, 12, 31)
+# TODO: install as package instead
+sys.path.append(str(Path(__file__).parent.resolve() / 'src'))
 
-# Function to create the layout for Batch Doc generation page
-def batch_doc_generation_page(title):
-    st.title(title)
-    st.subheader("Date Range")
+from models.ssim_file import SSIM_File
+from models.airport import airport_registry
+from lib.comparer import compare_schedules
+from lib.permit_generator import render_document
+from utils.date_helper import parse_ssim_dates
+
+DOCX_MIME = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+
+# The SSIM readers work on paths, so uploads are spooled to a temporary file first
+def save_uploaded_bytes(content):
+    with tempfile.NamedTemporaryFile(delete=False, suffix='.ssim') as temporary_file:
+        temporary_file.write(content)
+    return temporary_file.name
+
+# Every widget interaction reruns this script, so everything derived from an upload is cached under the
+# SHA-256 of its content: the parsed file with st.cache_resource, the diffs and documents with st.cache_data.
+# Arguments starting with an underscore are not hashed by streamlit, the content hash stands in for them
+def content_hash(uploaded_file):
+    return hashlib.sha256(uploaded_file.getvalue()).hexdigest()
 
-    # Single calendar picker for the date range
+@st.cache_resource
+def get_airport_registry():
+    # Loaded once per server process instead of once per rerun
+    len(airport_registry)
+    return airport_registry
+
+@st.cache_resource(max_entries=8)
+def get_ssim_file(file_hash, _content):
+    # Parsed once per file, with its flight series handler: the widgets then only filter its series
+    get_airport_registry()
+    path = save_uploaded_bytes(_content)
+    try:
+        return SSIM_File(path)
+    finally:
+        os.remove(path)
+
+def load_upload(uploaded_file):
+    # The SSIM_File of an upload, or None once the reason it cannot be read is shown
+    try:
+        return get_ssim_file(content_hash(uploaded_file), uploaded_file.getvalue())
+    except (ValueError, KeyError, OSError) as error:
+        st.error(f"{uploaded_file.name} is not a readable SSIM file: {error}")
+        return None
+
+@st.cache_data(max_entries=256)
+def get_permit_document(file_hash, country, start_date, end_date, airline_name, contact_person, _handler):
+    # The .docx bytes of one permit, cached per (file, country, date range, names)
+    flight_series = _handler.filter_by_date_range(start_date, end_date, country)
+    return render_document(country, start_date, end_date, flight_series, airline_name, contact_person)
+
+@st.cache_data(max_entries=8)
+def compare_uploads(base_hash, new_hash, _base_df, _new_df):
+    return compare_schedules(_base_df, _new_df)
+
+def select_date_range(ssim_file, key):
+    # The range defaults to, and is bounded by, the period of the file
+    file_start, file_end = ssim_file.start_date.date(), ssim_file.end_date.date()
+    st.subheader("Date Range")
     date_range = st.date_input(
         "Select SSIM Date Range",
-        [today.date(), (today + pd.DateOffset(days=7)).date()],
-        min_value=start_of_year,
-        max_value=end_of_year,
-        format="DD/MM/YYYY"
+        [file_start, file_end],
+        min_value=file_start,
+        max_value=file_end,
+        format="DD/MM/YYYY",
+        key=key
     )
 
     # date_range will be a list of 0, 1, or 2 date objects
     if len(date_range) == 2:
-        start_date, end_date = date_range
-    elif len(date_range) == 1:
-        start_date = end_date = date_range[0]
-    else:  # This case will occur if no dates are selected
-        start_date = end_date = today.date()  # or any default value you choose
+        return date_range[0], date_range[1]
+    if len(date_range) == 1:
+        return date_range[0], date_range[0]
+    # This case will occur if no dates are selected
+    return file_start, file_end
+
+def countries_of(flight_series):
+    return sorted({
+        country
+        for fs in flight_series
+        for country in (fs.departure_station.iso_country, fs.arrival_station.iso_country)
+        if country is not None
+    })
+
+def operating_in(frame, start_date, end_date, suffix=''):
+    # Rows of a diff frame whose Eff-Dis period overlaps the range, open ended periods running on
+    effective = parse_ssim_dates(frame['Eff' + suffix].tolist())
+    discontinued = parse_ssim_dates(frame['Dis' + suffix].tolist())
+    return ~np.isnat(effective) & (effective <= np.datetime64(end_date)) \
+        & (np.isnat(discontinued) | (discontinued >= np.datetime64(start_date)))
+
+def permit_downloads(file_hash, handler, countries, start_date, end_date, default=None):
+    airline_name = st.text_input("Airline name", key=f"airline_{file_hash}")
+    contact_person = st.text_input("Contact person", key=f"contact_{file_hash}")
+    if not (airline_name and contact_person):
+        st.info("Enter the airline name and the contact person to generate the permits")
+        return
+
+    for country in st.multiselect("Countries", countries, default=default, key=f"countries_{file_hash}"):
+        document = get_permit_document(file_hash, country, start_date, end_date, airline_name, contact_person, handler)
+        st.download_button(
+            f"Download permit for {country}",
+            document,
+            file_name=f"landing_permit_{country}.docx",
+            mime=DOCX_MIME,
+            key=f"download_{file_hash}_{country}"
+        )
+
+# Function to create the layout for Batch Doc generation page
+def batch_doc_generation_page(title):
+    st.title(title)
 
     st.subheader("Upload a SSIM file")
     uploaded_file = st.file_uploader("", type="ssim")
-    if uploaded_file is not None:
-        # You can add code here to handle the uploaded file
-        st.write("File Uploaded Successfully")
+    if uploaded_file is None:
+        return
 
-# Setting up the sidebar
-st.sidebar.title("Navigation")
-app_mode = st.sidebar.radio("Type of Doc Generation", ["Batch Doc Generation", "Comparative Doc Generation"])
+    ssim_file = load_upload(uploaded_file)
+    if ssim_file is None:
+        return
+    file_hash = content_hash(uploaded_file)
+    handler = ssim_file.flight_series_handler
+    st.write(f"File Uploaded Successfully: {len(ssim_file.df)} flight legs")
 
-if app_mode == "Batch Doc Generation":
-    batch_doc_generation_page("Batch Doc Generation")
+    start_date, end_date = select_date_range(ssim_file, f"date_range_{file_hash}")
 
-elif app_mode == "Comparative Doc Generation":
-    st.title("Comparative Doc Generation")
+    # Only the cached series are filtered here, nothing is parsed or rebuilt when the range changes
+    flight_series = handler.filter_by_date_range(start_date, end_date)
+    countries = countries_of(flight_series)
+    st.write(f"{len(flight_series)} flight series to {len(countries)} countries in the selected period")
 
-    # Date Range Picker with a unique key
-    st.subheader("Date Range")
-    date_range = st.date_input(
-        "Select SSIM Date Range",
-        [today.date(), (today + pd.DateOffset(days=7)).date()],
-        min_value=start_of_year,
-        max_value=end_of_year,
-        format="DD/MM/YYYY",
-        key="comparative_date_range"  # unique key for this date input
-    )
+    permit_downloads(file_hash, handler, countries, start_date, end_date)
+
+# Function to create the layout for Comparative Doc generation page
+def comparative_doc_generation_page(title):
+    st.title(title)
 
     # Layout for side by side file uploaders
     col1, col2 = st.columns(2)
 
     with col1:
         st.subheader("Insert base SSIM File")
-        base_ssim_file = st.file_uploader("Drag and drop file here or click to browse", type="txt", key="base_ssim")
+        base_upload = st.file_uploader("Drag and drop file here or click to browse", type=["ssim", "txt"], key="base_ssim")
 
     with col2:
         st.subheader("Insert new SSIM File")
-        new_ssim_file = st.file_uploader("Drag and drop file here or click to browse", type="txt", key="new_ssim")
+        new_upload = st.file_uploader("Drag and drop file here or click to browse", type=["ssim", "txt"], key="new_ssim")
+
+    if base_upload is None or new_upload is None:
+        return
+    base_ssim_file = load_upload(base_upload)
+    new_ssim_file = load_upload(new_upload)
+    if base_ssim_file is None or new_ssim_file is None:
+        return
+
+    new_hash = content_hash(new_upload)
+    # Permits come from the new file, so does the period
+    start_date, end_date = select_date_range(new_ssim_file, f"comparative_date_range_{new_hash}")
+
+    # Only the series changed within the period need a new permit
+    diff = compare_uploads(content_hash(base_upload), new_hash, base_ssim_file.df, new_ssim_file.df)
+    added = diff.added[operating_in(diff.added, start_date, end_date)]
+    removed = diff.removed[operating_in(diff.removed, start_date, end_date)]
+    modified = diff.modified[operating_in(diff.modified, start_date, end_date, ' (base)')
+                             | operating_in(diff.modified, start_date, end_date, ' (alt)')]
 
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Added series", len(added))
+    col2.metric("Removed series", len(removed))
+    col3.metric("Modified series", len(modified))
+
+    country_map = get_airport_registry().get_country_map()
+    affected_countries = {
+        country_map[station]
+        for frame in (added, removed, modified)
+        for station in frame['Dept Stn'].tolist() + frame['Arvl Stn'].tolist()
+        if country_map.get(station) is not None
+    }
+    st.write("Affected countries: " + (", ".join(sorted(affected_countries)) or "none"))
+
+    for label, frame in [("Added", added), ("Removed", removed), ("Modified", modified)]:
+        if len(frame):
+            st.subheader(f"{label} series")
+            st.dataframe(frame)
+
+    # Countries no longer served at all in the new file get no document
+    handler = new_ssim_file.flight_series_handler
+    countries = [country for country in countries_of(handler.filter_by_date_range(start_date, end_date))
+                 if country in affected_countries]
+    if countries:
+        st.subheader("Permits for affected countries")
+        permit_downloads(new_hash, handler, countries, start_date, end_date, default=countries)
+
+# Setting up the sidebar
+st.sidebar.title("Navigation")
+app_mode = st.sidebar.radio("Type of Doc Generation", ["Batch Doc Generation", "Comparative Doc Generation"])
+
+if app_mode == "Batch Doc Generation":
+    batch_doc_generation_page("Batch Doc Generation")
+
+elif app_mode == "Comparative Doc Generation":
+    comparative_doc_generation_page("Comparative Doc Generation")
@@ -0,0 +1,90 @@
+# The packages live under src/ and the repository is not installed to run the tests
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'src'))
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path, monkeypatch):
+    """Indexes, parse caches and uploads go to the test's directory, never to the developer's ~/.cache."""
+    monkeypatch.setenv('LANDINGPERMIT_CACHE_DIR', str(tmp_path))
+    return tmp_path
+
+
+@pytest.fixture
+def series_data():
+    """Builds the dict of one flight series, as read from an SSIM file: EY 878 AUH-NRT unless `fields` (by SSIM column name) override it."""
+
+    def build(effective_date, discontinued_date, days='1234567', fields=None):
+        data = {
+            'Airline designator': 'EY', 'Flight number': '878', 'Service Type': 'J',
+            'Eff': effective_date, 'Dis': discontinued_date, 'Day(s) of operation': days,
+            'Dept Stn': 'AUH', 'Dept time (pax)': '0220', 'Arvl Stn': 'NRT', 'Arvl time (pax)': '1715',
+            'Equipment': '789', 'Aircraft configuration': 'C28Y271',
+        }
+        data.update(fields or {})
+        return data
+    return build
+
+
+def _field(record, start, value):
+    record[start:start + len(value)] = value.encode('latin-1')
+
+
+@pytest.fixture
+def write_ssim(tmp_path):
+    """Writes a synthetic SSIM file: header, carrier record, one type 3 record per leg and the trailer.
+
+    Each leg is a dict of SSIM column name overrides on top of EY 878 AUH-NRT (see series_data). Record
+    serial numbers run from 000001 unless `serials` gives them, the trailer's check reference is the serial
+    of the record before it unless `check_reference` is given, and `trailer=False` leaves the trailer out.
+    `separator` goes after every record, b'' writes them back to back.
+    """
+
+    def write(legs, timezone_mode='U', period=('01JAN25', '31DEC25'), serials=None, check_reference=None,
+              trailer=True, separator=b'\n', name='schedule.ssim'):
+        records = []
+
+        header = bytearray(b' ' * 200)
+        _field(header, 0, '1AIRLINE STANDARD SCHEDULE DATA SET')
+        records.append(header)
+
+        carrier = bytearray(b' ' * 200)
+        _field(carrier, 0, f'2{timezone_mode}EY ')
+        _field(carrier, 14, period[0] + period[1] + '01DEC24' + 'Created by a test           PCreated by a test')
+        records.append(carrier)
+
+        for leg in legs:
+            fields = {
+                'Eff': '01JUN25', 'Dis': '30JUN25', 'Day(s) of operation': '1234567',
+                'Dept Stn': 'AUH', 'Dept time (pax)': '0220', 'UTC/Local Time variation (dept)': '+0400',
+                'Arvl Stn': 'NRT', 'Arvl time (pax)': '1715', 'UTC/Local Time variation': '+0900',
+                'Flight number': ' 878', 'Equipment': '789', 'Aircraft configuration': 'C28Y271',
+            }
+            fields.update(leg)
+            record = bytearray(b' ' * 200)
+            _field(record, 0, '3 EY ' + fields['Flight number'] + '0101J')
+            _field(record, 14, fields['Eff'] + fields['Dis'] + fields['Day(s) of operation'].ljust(7))
+            _field(record, 36, fields['Dept Stn'] + fields['Dept time (pax)'] * 2 + fields['UTC/Local Time variation (dept)'].ljust(5))
+            _field(record, 54, fields['Arvl Stn'] + fields['Arvl time (pax)'] * 2 + fields['UTC/Local Time variation'].ljust(5))
+            _field(record, 72, fields['Equipment'])
+            _field(record, 172, fields['Aircraft configuration'])
+            records.append(record)
+
+        if trailer:
+            records.append(bytearray(b' ' * 200))
+            _field(records[-1], 0, '5 EY')
+
+        numbers = serials or range(1, len(records) + 1)
+        for record, number in zip(records, numbers):
+            _field(record, 194, f'{number:06d}')
+        if trailer:
+            _field(records[-1], 187, f'{numbers[len(records) - 2] if check_reference is None else check_reference:06d}E')
+
+        path = tmp_path / name
+        path.write_bytes(b''.join(bytes(record) + separator for record in records))
+        return path
+    return write
@@ -0,0 +1,37 @@
+import pandas as pd
+
+from lib.comparer import compare_schedules, KEY_COLUMNS, VALUE_COLUMNS
+
+
+def _schedule(*legs):
+    return pd.DataFrame(list(legs), columns=KEY_COLUMNS + VALUE_COLUMNS)
+
+
+def _leg(flight_number, dis='30JUN25', arrival='NRT'):
+    return ['EY', flight_number, 'AUH', arrival, '0220', '1715', '789', 'J', '01JUN25', dis, '1234567', 'C28Y271']
+
+
+def test_added_removed_and_modified_series():
+    base = _schedule(_leg('878'), _leg('880'), _leg('882', arrival='CDG'))
+    alt = _schedule(_leg('878'), _leg('880', dis='31JUL25'), _leg('884', arrival='ICN'))
+
+    diff = compare_schedules(base, alt)
+
+    assert diff.added['Flight number'].tolist() == ['884']
+    assert diff.removed['Flight number'].tolist() == ['882']
+    assert diff.modified[['Flight number', 'Dis (base)', 'Dis (alt)']].values.tolist() == [['880', '30JUN25', '31JUL25']]
+    assert diff.affected_countries == {'AE', 'JP', 'FR', 'KR'}
+
+
+def test_empty_schedules():
+    diff = compare_schedules(_schedule(), _schedule())
+    assert (len(diff.added), len(diff.removed), len(diff.modified)) == (0, 0, 0)
+    assert diff.affected_countries == set()
+
+    diff = compare_schedules(_schedule(), _schedule(_leg('878')))
+    assert diff.added['Flight number'].tolist() == ['878']
+    assert len(diff.removed) == len(diff.modified) == 0
+
+    diff = compare_schedules(_schedule(_leg('878')), _schedule())
+    assert diff.removed['Flight number'].tolist() == ['878']
+    assert len(diff.added) == len(diff.modified) == 0
@@ -0,0 +1,24 @@
+from datetime import date
+
+from models.flight_series_handler import FlightSeriesHandler
+
+
+def test_open_ended_series_count_until_the_end_date(series_data):
+    handler = FlightSeriesHandler()
+    handler.add_flight_series(series_data('01JUN25', '30JUN25'))
+    handler.add_flight_series(series_data('01JUL25', '00XXX00'))
+
+    assert handler.count_flights() == 30
+    assert handler.count_flights(end_date=date(2025, 7, 10)) == 40
+    assert handler.count_flights(distinct=True, end_date=date(2025, 7, 10)) == 40
+    assert handler.count_flights_by_country(date(2025, 7, 10)) == {'AE': 40, 'JP': 40}
+
+
+def test_duration_of_an_open_ended_series(series_data):
+    handler = FlightSeriesHandler()
+    handler.add_flight_series(series_data('01JUL25', '00XXX00'))
+    open_ended = handler.flight_series_collection[0]
+
+    assert handler.calculate_duration(open_ended) is None
+    assert handler.calculate_duration(open_ended, date(2025, 7, 10)) == 10
+    assert handler.calculate_duration(open_ended.with_dates('01JUL25', '31JUL25')) == 31
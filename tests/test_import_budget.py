@@ -0,0 +1,23 @@
+# Enforces benchmarks/import_budget.py: `landingpermit inspect` reads a header without the heavy dependencies,
+# within its startup budget
+import importlib.util
+from pathlib import Path
+
+BENCHMARK_PATH = Path(__file__).resolve().parent.parent / 'benchmarks' / 'import_budget.py'
+
+spec = importlib.util.spec_from_file_location('import_budget', BENCHMARK_PATH)
+import_budget = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(import_budget)
+
+SSIM_PATH = import_budget.ROOT / 'data' / 'ssim' / 'EY_SSIM.ssim'
+
+
+def test_inspect_imports_no_heavy_module():
+    _, _, modules = import_budget.run_inspect(SSIM_PATH)
+    assert not modules & set(import_budget.HEAVY_MODULES)
+
+
+def test_inspect_starts_within_budget():
+    # Best of a few runs, as the benchmark, so a busy machine does not fail it on one slow start
+    elapsed = min(import_budget.run_inspect(SSIM_PATH)[0] for _ in range(3))
+    assert elapsed * 1000 <= import_budget.DEFAULT_BUDGET_MS
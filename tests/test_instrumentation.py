@@ -0,0 +1,22 @@
+import asyncio
+
+from utils import instrumentation
+from utils.instrumentation import span
+
+
+def test_concurrent_tasks_keep_their_own_span_paths():
+    instrumentation.reset()
+
+    async def job():
+        with span('service.job'):
+            await asyncio.sleep(0.01)
+            with span('permit.render'):
+                await asyncio.sleep(0.01)
+
+    async def run():
+        await asyncio.gather(*(job() for _ in range(5)))
+
+    asyncio.run(run())
+    spans = instrumentation.report()['spans']
+    assert set(spans) == {'service.job', 'service.job/permit.render'}
+    assert spans['service.job']['calls'] == 5
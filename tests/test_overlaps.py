@@ -0,0 +1,69 @@
+import numpy as np
+
+from models.flight_handler import FlightHandler
+from models.flight_series_handler import FlightSeriesHandler
+
+
+def _handler(*series):
+    handler = FlightSeriesHandler()
+    for data in series:
+        handler.add_flight_series(data)
+    return handler
+
+
+def test_overlapping_series_of_a_leg(series_data):
+    handler = _handler(
+        series_data('01JUN25', '30JUN25', days='1234567'),
+        # Mondays and Wednesdays of 16 June - 15 July: shares 16, 18, 23, 25, 30 June
+        series_data('16JUN25', '15JUL25', days='1 3    '),
+        # Another flight number, never an overlap
+        series_data('01JUN25', '30JUN25', fields={'Flight number': '879'}),
+    )
+
+    overlaps = handler.find_overlaps()
+    assert len(overlaps) == 1
+    overlap = overlaps.iloc[0]
+    assert (overlap['Series index'], overlap['Other series index']) == (0, 1)
+    assert overlap['Day(s) of operation'] == '1 3    '
+    assert overlap['Flights'] == 5
+    assert (overlap['First date'], overlap['Last date']) == (np.datetime64('2025-06-16'), np.datetime64('2025-06-30'))
+    assert overlap['Dates'].tolist() == np.array(['2025-06-16', '2025-06-18', '2025-06-23', '2025-06-25', '2025-06-30'],
+                                                  dtype='datetime64[D]').tolist()
+    assert 'Dates' not in handler.find_overlaps(with_dates=False)
+
+    assert handler.count_flights() == 30 + 9 + 30
+    assert handler.count_flights(distinct=True) == 30 + 9 + 30 - 5
+
+
+def test_overlapping_periods_without_a_common_day(series_data):
+    handler = _handler(series_data('01JUN25', '30JUN25', days='1      '), series_data('01JUN25', '30JUN25', days=' 2     '))
+
+    assert handler.find_overlaps().empty
+
+
+def test_consecutive_and_overlapping_series_are_merged(series_data):
+    handler = _handler(
+        series_data('01JUN25', '15JUN25'),
+        series_data('16JUN25', '30JUN25'),
+        series_data('25JUN25', '10JUL25'),
+        # Same flight on another aircraft, kept apart
+        series_data('01JUL25', '31JUL25', fields={'Equipment': '359'}),
+    )
+
+    merged = handler.merge_adjacent_series()
+    assert [(fs.effective_date, fs.discontinued_date, fs.equipment) for fs in merged] == [
+        ('01JUN25', '10JUL25', '789'),
+        ('01JUL25', '31JUL25', '359'),
+    ]
+
+
+def test_series_are_merged_across_days_they_do_not_operate(series_data):
+    # Sundays only: 02JUN25 - 14JUN25 has no Sunday after the 8th, so the next series follows on
+    handler = _handler(series_data('02JUN25', '14JUN25', days='      7'), series_data('15JUN25', '29JUN25', days='      7'),
+                       # A Sunday (6 July) missed, a new run
+                       series_data('07JUL25', '31JUL25', days='      7'))
+
+    merged = handler.merge_adjacent_series()
+    assert [(fs.effective_date, fs.discontinued_date) for fs in merged] == [('02JUN25', '29JUN25'), ('07JUL25', '31JUL25')]
+    # Merging never adds nor removes a flight
+    assert FlightHandler(merged).count_flights() == handler.count_flights()
@@ -0,0 +1,103 @@
+import io
+import json
+import zipfile
+from datetime import date
+from types import SimpleNamespace
+
+import pendulum
+import pytest
+
+from lib.permit_generator import generate_documents, permit_inputs
+from lib.permit_writer import DirectoryWriter, ZipWriter
+from models.country_handler import country_registry, CountryHandler
+from models.flight_series_handler import FlightSeriesHandler
+
+# What permit_inputs() reads of an SSIM_File, whose header dates are pendulum datetimes
+SSIM_FILE = SimpleNamespace(start_date=pendulum.datetime(2025, 6, 1), end_date=pendulum.datetime(2025, 11, 30))
+
+
+@pytest.fixture
+def rules(tmp_path, monkeypatch):
+    """Layers country rules on the bundled ones for one test."""
+
+    def apply(countries):
+        path = tmp_path / 'country_rules.json'
+        path.write_text(json.dumps({'countries': countries}))
+        monkeypatch.setenv('LANDINGPERMIT_COUNTRY_RULES', str(path))
+        country_registry.reload()
+
+    yield apply
+    monkeypatch.delenv('LANDINGPERMIT_COUNTRY_RULES', raising=False)
+    country_registry.reload()
+
+
+@pytest.fixture
+def handler(series_data):
+    # AUH-NRT across S25 and W25, AUH-KIX in S25 only, AUH-CDG in S25 only
+    handler = FlightSeriesHandler()
+    handler.add_flight_series(series_data('01JUN25', '30NOV25'))
+    handler.add_flight_series(series_data('01JUN25', '30JUN25', fields={'Flight number': '806', 'Arvl Stn': 'KIX'}))
+    handler.add_flight_series(series_data('01JUN25', '30JUN25', fields={'Flight number': '31', 'Arvl Stn': 'CDG'}))
+    return handler
+
+
+def test_default_grouping_is_one_permit_per_country(handler):
+    inputs = permit_inputs(['JP', 'FR'], SSIM_FILE, handler)
+    assert list(inputs) == ['FR', 'JP']
+    assert len(inputs['JP'][5]) == 2
+
+
+def test_airport_and_season_grouping(handler, rules):
+    rules({'JP': {'grouping': 'airport'}, 'FR': {'grouping': 'season'}})
+
+    inputs = permit_inputs(['JP', 'FR'], SSIM_FILE, handler)
+
+    assert list(inputs) == [('FR', 'S25'), ('JP', 'KIX'), ('JP', 'NRT')]
+    assert [row['Arvl Stn'] for row in inputs[('JP', 'KIX')][5]] == ['KIX']
+    country, season, airport, start_date, end_date, rows = inputs[('FR', 'S25')]
+    assert (season, airport, start_date.date(), end_date.date()) == ('S25', None, date(2025, 6, 1), date(2025, 10, 25))
+
+
+def test_explicit_seasons_split_airport_grouped_countries_further(handler, rules):
+    rules({'JP': {'grouping': 'airport'}})
+
+    inputs = permit_inputs(['JP'], SSIM_FILE, handler, seasons=['S25', 'W25'])
+
+    assert list(inputs) == [('JP', 'S25', 'KIX'), ('JP', 'S25', 'NRT'), ('JP', 'W25', 'NRT')]
+
+
+def test_unknown_grouping_is_refused(tmp_path):
+    path = tmp_path / 'country_rules.json'
+    path.write_text(json.dumps({'countries': {'JP': {'grouping': 'weekly'}}}))
+    with pytest.raises(ValueError, match='grouping'):
+        CountryHandler(override_path=path).get_country('JP')
+
+
+def test_zip_writer_bundles_permits_and_manifest(handler, rules, tmp_path):
+    rules({'JP': {'grouping': 'airport', 'email': 'permits@example.com'}})
+    archive = tmp_path / 'permits.zip'
+
+    with ZipWriter(archive) as writer:
+        results = generate_documents(['JP', 'FR'], SSIM_FILE, 'FlySample', 'Luca Siragusa', handler, max_workers=1, writer=writer)
+
+    assert all(result.error is None for result in results.values())
+    assert results[('JP', 'KIX')].airport == 'KIX'
+    with zipfile.ZipFile(archive) as bundle:
+        assert bundle.namelist() == ['FR/landing_permit_FR.docx', 'JP/landing_permit_JP_KIX.docx',
+                                     'JP/landing_permit_JP_NRT.docx', 'manifest.json']
+        manifest = json.loads(bundle.read('manifest.json'))['permits']
+        document = bundle.read('JP/landing_permit_JP_KIX.docx')
+
+    entry = manifest[1]
+    assert (entry['country'], entry['airport'], entry['email'], entry['size']) == ('JP', 'KIX', 'permits@example.com', len(document))
+    assert manifest[0]['authority'] == "Direction générale de l'Aviation civile (DGAC)"
+    assert 'word/document.xml' in zipfile.ZipFile(io.BytesIO(document)).namelist()
+
+
+def test_directory_writer_keeps_the_permits_output_layout(handler, tmp_path):
+    with DirectoryWriter(tmp_path, manifest=True) as writer:
+        results = generate_documents(['JP'], SSIM_FILE, 'FlySample', 'Luca Siragusa', handler, max_workers=1, writer=writer)
+
+    assert results['JP'].path == str(tmp_path / 'permits_output' / 'JP' / 'landing_permit_JP.docx')
+    manifest = json.loads((tmp_path / 'permits_output' / 'manifest.json').read_text())['permits']
+    assert [entry['file'] for entry in manifest] == ['JP/landing_permit_JP.docx']
@@ -0,0 +1,53 @@
+from datetime import date
+
+from models.flight_series_handler import FlightSeriesHandler
+from models.iata_season import IATA_Season, season_calendar
+from models.seasons_handler import DateSeasonHandler
+
+
+def test_open_ended_series_stays_in_its_start_season(series_data):
+    handler = FlightSeriesHandler()
+    handler.add_flight_series(series_data('01JUN25', '00XXX00'))
+
+    assert handler.get_seasons() == ['S25']
+    pieces = handler.filter_by_season_and_country('S25', 'JP')
+    assert len(pieces) == 1
+    # Clipped to the end of S25 (W25 starts on Sunday 26 October 2025)
+    assert (pieces[0].effective_date, pieces[0].discontinued_date) == ('01JUN25', '25OCT25')
+
+
+def test_series_crossing_seasons_is_split(series_data):
+    handler = FlightSeriesHandler()
+    handler.add_flight_series(series_data('01OCT25', '10NOV25'))
+
+    assert handler.get_seasons() == ['S25', 'W25']
+    assert handler.filter_by_season('S25')[0].discontinued_date == '25OCT25'
+    assert handler.filter_by_season('W25')[0].effective_date == '26OCT25'
+
+
+def test_seasons_between_dates_outside_the_season_table():
+    assert season_calendar.seasons_between(date(2025, 1, 1), date(2025, 12, 31)) == ['W24', 'S25', 'W25']
+    assert season_calendar.seasons_between(date(1999, 1, 1), date(2000, 4, 1)) == ['W98', 'S99', 'W99', 'S00']
+    assert season_calendar.seasons_between(date(2099, 11, 1), date(2100, 11, 1)) == ['W99', 'S00', 'W00']
+    assert season_calendar.season_of(date(2100, 3, 27)) == 'W99'
+    assert season_calendar.season_of(date(2100, 3, 28)) == 'S00'
+
+
+def test_seasons_outside_the_season_table_are_dated_from_their_year():
+    seasons = DateSeasonHandler(date(1999, 1, 1), date(2000, 4, 1)).get_iata_seasons()
+    assert [(season.name, season.start_date.date(), season.end_date.date()) for season in seasons] == [
+        ('W98', date(1998, 10, 25), date(1999, 3, 27)),
+        ('S99', date(1999, 3, 28), date(1999, 10, 30)),
+        ('W99', date(1999, 10, 31), date(2000, 3, 25)),
+        ('S00', date(2000, 3, 26), date(2000, 10, 28)),
+    ]
+
+    seasons = DateSeasonHandler(date(2099, 11, 1), date(2100, 11, 1)).get_iata_seasons()
+    assert [(season.name, season.start_date.date(), season.end_date.date()) for season in seasons] == [
+        ('W99', date(2099, 10, 25), date(2100, 3, 27)),
+        ('S00', date(2100, 3, 28), date(2100, 10, 30)),
+        ('W00', date(2100, 10, 31), date(2101, 3, 26)),
+    ]
+    # Without a year the name is read as 20xx
+    assert IATA_Season('W99') is seasons[0]
+    assert IATA_Season('S00').start_date.date() == date(2000, 3, 26)
@@ -0,0 +1,62 @@
+from datetime import date
+
+import pytest
+
+from models.flight_series_handler import FlightSeriesHandler
+
+
+@pytest.fixture
+def handler(series_data):
+    handler = FlightSeriesHandler()
+    handler.add_flight_series(series_data('01JUN25', '30JUN25'))
+    handler.add_flight_series(series_data('01JUL25', '00XXX00', fields={'Equipment': '359'}))
+    handler.add_flight_series(series_data('01JUN25', '31AUG25', fields={
+        'Flight number': '879', 'Dept Stn': 'NRT', 'Arvl Stn': 'AUH', 'Dept time (pax)': '2230', 'Arvl time (pax)': '0445'}))
+    handler.add_flight_series(series_data('01MAY25', '31MAY25', fields={
+        'Flight number': '11', 'Arvl Stn': 'LHR', 'Service Type': 'C', 'Dept time (pax)': '0940'}))
+    return handler
+
+
+def _flight_numbers(flight_series):
+    return [fs.flight_number for fs in flight_series]
+
+
+def test_equality_and_any_of(handler):
+    assert _flight_numbers(handler.query(equipment='359')) == ['878']
+    assert _flight_numbers(handler.query(service_type=['C', 'X'])) == ['11']
+    assert _flight_numbers(handler.query(departure_station='NRT')) == ['879']
+    assert _flight_numbers(handler.query(equipment='320')) == []
+    assert len(handler.query()) == 4
+
+
+def test_countries_and_stations_match_either_end(handler):
+    assert _flight_numbers(handler.query(country='JP')) == ['878', '878', '879']
+    assert _flight_numbers(handler.query(arrival_country='JP')) == ['878', '878']
+    assert _flight_numbers(handler.query(station='LHR')) == ['11']
+
+
+def test_operating_between(handler):
+    assert _flight_numbers(handler.query(operating_between=(date(2025, 7, 15), date(2025, 7, 20)))) == ['878', '879']
+    # Open ended series run on indefinitely
+    assert _flight_numbers(handler.query(operating_between=(date(2030, 1, 1), date(2030, 1, 1)))) == ['878']
+    # Both bounds included
+    assert _flight_numbers(handler.query(operating_between=(date(2025, 4, 1), date(2025, 5, 1)))) == ['11']
+
+
+def test_time_of_day_ranges_wrap_past_midnight(handler):
+    assert _flight_numbers(handler.query(departure_time_between=('2200', '0300'))) == ['878', '878', '879']
+    assert _flight_numbers(handler.query(departure_time_between=('0600', '1159'))) == ['11']
+    assert _flight_numbers(handler.query(arrival_time_between=('0445', '0445'))) == ['879']
+
+
+def test_criteria_are_combined_and_indexes_follow_new_series(handler, series_data):
+    assert _flight_numbers(handler.query(country='JP', operating_between=(date(2025, 6, 15), date(2025, 6, 15)),
+                                         departure_time_between=('0000', '0300'))) == ['878']
+
+    handler.add_flight_series(series_data('01JUN25', '30JUN25', fields={'Flight number': '880', 'Equipment': '359'}))
+    assert _flight_numbers(handler.query(equipment='359')) == ['878', '880']
+
+
+def test_unknown_criterion(handler):
+    with pytest.raises(ValueError):
+        handler.query(tail_number='A6-BLA')
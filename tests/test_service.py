@@ -0,0 +1,130 @@
+import io
+import json
+import asyncio
+import zipfile
+from pathlib import Path
+
+import pytest
+
+from lib.service import PermitService, _handle_connection
+
+SSIM_PATH = Path(__file__).resolve().parent.parent / 'data' / 'ssim' / 'EY_SSIM.ssim'
+
+
+async def _request(port, method, path, body=b''):
+    # One request over loopback, returns (status, headers, body)
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    writer.write(f'{method} {path} HTTP/1.1\r\nHost: localhost\r\nContent-Length: {len(body)}\r\n\r\n'.encode() + body)
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+
+    head, _, content = response.partition(b'\r\n\r\n')
+    status_line, *header_lines = head.decode('latin-1').split('\r\n')
+    headers = {name.lower(): value.strip() for name, _, value in (line.partition(':') for line in header_lines)}
+    return int(status_line.split()[1]), headers, content
+
+
+def _run(scenario, **service_options):
+    async def main():
+        service = PermitService(**service_options)
+        await service.start()
+
+        async def handle(reader, writer):
+            await _handle_connection(service, reader, writer)
+
+        server = await asyncio.start_server(handle, '127.0.0.1', 0)
+        try:
+            async with server:
+                return await scenario(service, server.sockets[0].getsockname()[1])
+        finally:
+            await service.close()
+
+    return asyncio.run(main())
+
+
+def test_upload_submit_stream_and_download(cache_dir):
+    async def scenario(service, port):
+        status, _, body = await _request(port, 'POST', '/ssim', SSIM_PATH.read_bytes())
+        assert status == 200
+        upload = json.loads(body)
+        assert 'JP' in upload['countries']
+        # Parsed, then removed from disk
+        assert not list((cache_dir / 'uploads').iterdir())
+
+        job_request = {'ssim_id': upload['ssim_id'], 'airline_name': 'FlySample', 'contact_person': 'Luca Siragusa',
+                       'countries': ['JP', 'AE']}
+        status, _, body = await _request(port, 'POST', '/jobs', json.dumps(job_request).encode())
+        assert status == 202
+        job = json.loads(body)
+        assert sorted(job['permits']) == ['AE', 'JP']
+
+        status, _, body = await _request(port, 'GET', f"/jobs/{job['job_id']}/events")
+        events = [json.loads(line) for line in body.splitlines()]
+        assert events[-1] == {'job_id': job['job_id'], 'state': 'done', 'done': 2, 'failed': 0}
+        urls = {event['permit']: event['url'] for event in events if event.get('state') == 'done' and 'permit' in event}
+
+        status, headers, document = await _request(port, 'GET', urls['JP'])
+        assert status == 200
+        assert int(headers['content-length']) == len(document)
+        assert 'word/document.xml' in zipfile.ZipFile(io.BytesIO(document)).namelist()
+
+        status, _, _ = await _request(port, 'GET', f"/jobs/{job['job_id']}/permits/FR")
+        assert status == 404
+
+    _run(scenario, max_workers=2)
+
+
+def test_rejected_upload_leaves_nothing_behind(cache_dir):
+    async def scenario(service, port):
+        status, _, _ = await _request(port, 'POST', '/ssim', b'\x00' * 400)
+        assert status == 422
+        assert not list((cache_dir / 'uploads').iterdir())
+
+    _run(scenario, max_workers=1)
+
+
+def test_full_queue_is_refused_with_retry_after():
+    async def scenario(service, port):
+        status, _, body = await _request(port, 'POST', '/ssim', SSIM_PATH.read_bytes())
+        job_request = json.dumps({'ssim_id': json.loads(body)['ssim_id'], 'airline_name': 'FlySample',
+                                  'contact_person': 'Luca Siragusa', 'countries': ['JP']}).encode()
+
+        # With every render slot held, the runner takes the first job and waits, the second one fills the queue
+        async with service._slots:
+            status, _, body = await _request(port, 'POST', '/jobs', job_request)
+            assert status == 202
+            running = service.get_job(json.loads(body)['job_id'])
+            while running.state != 'running':
+                await asyncio.sleep(0.01)
+
+            status, _, _ = await _request(port, 'POST', '/jobs', job_request)
+            assert status == 202
+            status, headers, _ = await _request(port, 'POST', '/jobs', job_request)
+            assert status == 503
+            assert headers['retry-after'] == '5'
+
+    _run(scenario, max_workers=1, queue_size=1)
+
+
+def test_job_error_ends_the_job_and_the_runner_goes_on(monkeypatch):
+    async def scenario(service, port):
+        status, _, body = await _request(port, 'POST', '/ssim', SSIM_PATH.read_bytes())
+        ssim_id = json.loads(body)['ssim_id']
+
+        async def broken_render(job, name):
+            raise RuntimeError('render slot lost')
+
+        with monkeypatch.context() as patch:
+            patch.setattr(service, '_render', broken_render)
+            failed = await service.submit(ssim_id, 'FlySample', 'Luca Siragusa', ['JP'])
+            events = [event async for event in failed.stream()]
+        assert events[-1]['state'] == 'done'
+        assert events[-1]['error'] == 'RuntimeError: render slot lost'
+        assert failed.status()['permits']['JP']['state'] == 'failed'
+
+        job = await service.submit(ssim_id, 'FlySample', 'Luca Siragusa', ['JP'])
+        events = [event async for event in job.stream()]
+        assert events[-1]['done'] == 1
+
+    _run(scenario, max_workers=1)
@@ -0,0 +1,91 @@
+import os
+import hashlib
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+from models import ssim_cache
+from models.ssim_cache import SSIMParseCache, file_hash
+from models.ssim_file import SSIM_File
+
+SSIM_PATH = Path(__file__).resolve().parent.parent / 'data' / 'ssim' / 'EY_SSIM.ssim'
+
+pytest.importorskip('pyarrow')
+
+
+@pytest.fixture
+def parsed():
+    ssim_file = SSIM_File(SSIM_PATH, use_cache=False)
+    return ssim_file.df, ssim_file.attributes, ssim_file.validation
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache_dir = tmp_path / 'ssim'
+    cache_dir.mkdir()
+    return SSIMParseCache(cache_dir)
+
+
+def _copy(tmp_path, name, content):
+    path = tmp_path / name
+    path.write_bytes(content)
+    return path
+
+
+def test_round_trip(tmp_path, parsed, cache):
+    df, attributes, validation = parsed
+
+    assert cache.load(SSIM_PATH) is None
+    assert cache.store(SSIM_PATH, df, attributes, validation) is not None
+
+    cached_df, cached_attributes, cached_validation = cache.load(SSIM_PATH)
+    pd.testing.assert_frame_equal(cached_df, df)
+    assert cached_attributes == attributes
+    assert cached_validation == validation
+
+    # Keyed by content, a renamed copy hits too
+    assert cache.load(_copy(tmp_path, 'renamed.ssim', SSIM_PATH.read_bytes())) is not None
+
+
+def test_edited_file_misses(tmp_path, parsed, cache):
+    path = _copy(tmp_path, 'schedule.ssim', SSIM_PATH.read_bytes())
+    cache.store(path, *parsed)
+
+    path.write_bytes(SSIM_PATH.read_bytes() + b' ')
+    assert cache.load(path) is None
+
+
+def test_new_parser_version_misses_and_drops_older_entries(tmp_path, parsed, cache, monkeypatch):
+    old_entry = cache.store(SSIM_PATH, *parsed)
+
+    monkeypatch.setattr(ssim_cache, 'PARSER_VERSION', ssim_cache.PARSER_VERSION + 1)
+    assert cache.load(SSIM_PATH) is None
+    assert old_entry.exists()
+
+    new_entry = cache.store(SSIM_PATH, *parsed)
+    assert not old_entry.exists()
+    assert [entry.name for entry in (tmp_path / 'ssim').glob('*.arrow')] == [new_entry.name]
+
+
+def test_least_recently_used_entries_are_evicted_past_max_bytes(tmp_path, parsed, cache):
+    paths = [_copy(tmp_path, f'{name}.ssim', SSIM_PATH.read_bytes() + name.encode()) for name in ('a', 'b', 'c')]
+
+    entries = []
+    for age, path in enumerate(paths[:2]):
+        entries.append(cache.store(path, *parsed))
+        os.utime(entries[-1], ns=(age * 10**9, age * 10**9))
+    entry_size = entries[0].stat().st_size
+
+    # A hit makes the oldest entry the most recently used one
+    assert cache.load(paths[0]) is not None
+
+    cache.max_bytes = 2 * entry_size
+    entries.append(cache.store(paths[2], *parsed))
+    assert [entry.exists() for entry in entries] == [True, False, True]
+    assert cache.load(paths[1]) is None
+
+
+def test_file_hash_is_the_sha256_of_the_content(tmp_path):
+    path = _copy(tmp_path, 'schedule.ssim', b'3 EY')
+    assert file_hash(path) == hashlib.sha256(b'3 EY').hexdigest()
@@ -0,0 +1,89 @@
+import pandas as pd
+import pytest
+
+from models.ssim_file import SSIM_File
+from models.ssim_file_reader import SSIMFileReader
+
+
+def _validation(path):
+    return SSIMFileReader(path).read().validation
+
+
+def test_valid_file(write_ssim):
+    result = SSIMFileReader(write_ssim([{}, {'Eff': '01JUL25', 'Dis': '31JUL25'}])).read()
+
+    assert result.attributes['timezone_mode'] == 'UTC'
+    assert result.df['Eff'].tolist() == ['01JUN25', '01JUL25']
+    assert result.validation == {
+        'record_counts': {'0': 0, '1': 1, '2': 1, '3': 2, '4': 0, '5': 1},
+        'unknown_records': 0,
+        'serial_errors': 0,
+        'trailer_found': True,
+        'trailer_check_ok': True,
+        'trailer_end_ok': True,
+    }
+
+
+def test_serial_number_gap(write_ssim):
+    # 000004 is missing: the record after the gap is out of sequence, the trailer still points at the leg before it
+    validation = _validation(write_ssim([{}, {}], serials=[1, 2, 3, 5, 6]))
+
+    assert validation['serial_errors'] == 1
+    assert validation['trailer_check_ok'] is True
+
+
+def test_wrong_trailer_check_reference(write_ssim):
+    validation = _validation(write_ssim([{}], check_reference=2))
+
+    assert validation['serial_errors'] == 0
+    assert validation['trailer_found'] is True
+    assert validation['trailer_check_ok'] is False
+    assert validation['trailer_end_ok'] is True
+
+
+def test_missing_trailer(write_ssim):
+    validation = _validation(write_ssim([{}], trailer=False))
+
+    assert validation['record_counts']['5'] == 0
+    assert validation['serial_errors'] == 0
+    assert (validation['trailer_found'], validation['trailer_check_ok'], validation['trailer_end_ok']) == (False, None, None)
+
+
+def _legs():
+    return [
+        {},
+        {'Eff': '01JUL25', 'Dis': '00XXX00', 'Day(s) of operation': '1 3 5  ', 'Arvl time (pax)': '0005'},
+        {'Flight number': '  11', 'Arvl Stn': 'LHR', 'UTC/Local Time variation': '+0100', 'Aircraft configuration': ''},
+    ]
+
+
+def test_bytes_engine_matches_fwf(write_ssim):
+    path = write_ssim(_legs())
+    reader = SSIMFileReader(path)
+    col_data = SSIM_File._get_col_data()
+
+    # read_fwf infers column types over every record: like in exported files, the text of the carrier record
+    # keeps the time columns as strings
+    bytes_df = reader.get_dataframe(path, *col_data)
+    pd.testing.assert_frame_equal(bytes_df, reader.get_dataframe(path, *col_data, engine='fwf'))
+    assert bytes_df['Flight number'].tolist() == ['EY  0878', 'EY  0878', 'EY  0011']
+    assert bytes_df['Arvl time (pax)'].tolist() == ['1715', '0005', '1715']
+    assert bytes_df['Aircraft configuration'].isna().tolist() == [False, False, True]
+
+
+@pytest.mark.parametrize('separator', [b'\n', b'\r\n', b'', b'\n' + b'\x00' * 50], ids=['lf', 'crlf', 'no newlines', 'nul padded'])
+def test_iter_records_framing(write_ssim, separator):
+    expected = SSIMFileReader(write_ssim(_legs(), name='reference.ssim')).read().df
+    path = write_ssim(_legs(), separator=separator)
+
+    chunks = list(SSIMFileReader(path).iter_records(chunk_size=2))
+    assert [len(chunk) for chunk in chunks] == [2, 1]
+    pd.testing.assert_frame_equal(pd.concat(chunks, ignore_index=True), expected)
+
+
+def test_iter_records_of_a_file_without_a_final_newline(write_ssim):
+    path = write_ssim(_legs(), trailer=False, separator=b'\r\n')
+    path.write_bytes(path.read_bytes().rstrip(b'\r\n') + b'\x00' * 300)
+
+    df = pd.concat(SSIMFileReader(path).iter_records(), ignore_index=True)
+    assert df['Flight number'].tolist() == ['EY  0878', 'EY  0878', 'EY  0011']
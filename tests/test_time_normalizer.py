@@ -0,0 +1,62 @@
+import pytest
+
+from lib.time_normalizer import normalize_times
+from models.ssim_file_reader import SSIMFileReader
+
+
+def _legs_df(write_ssim, legs, timezone_mode='U'):
+    return SSIMFileReader(write_ssim(legs, timezone_mode=timezone_mode)).read().df
+
+
+def test_variations_of_the_file(write_ssim):
+    # 0220 UTC in Abu Dhabi (+0400), 1715 UTC in Tokyo (+0900) is 0215 local the next day
+    df = _legs_df(write_ssim, [{}])
+    local = normalize_times(df, 'UTC', 'local')
+
+    assert local.loc[0, 'Dept time (local)'] == '0620'
+    assert local.loc[0, 'Arvl time (local)'] == '0215'
+    assert (local.loc[0, 'Dept day shift (local)'], local.loc[0, 'Arvl day shift (local)']) == (0, 1)
+    assert (local.loc[0, 'Dept UTC offset'], local.loc[0, 'Arvl UTC offset']) == (240, 540)
+
+    # Same mode, times unchanged
+    utc = normalize_times(df, 'UTC', 'UTC')
+    assert (utc.loc[0, 'Dept time (UTC)'], utc.loc[0, 'Arvl time (UTC)']) == ('0220', '1715')
+
+
+def test_blank_variations_fall_back_to_the_tz_database(write_ssim):
+    # Saturdays from 22 March: the first flight, on the 22nd, is before the UK moves to summer time (30 March)
+    df = _legs_df(write_ssim, [{
+        'Eff': '22MAR25', 'Dis': '31MAY25', 'Day(s) of operation': '     6 ', 'Dept time (pax)': '1400',
+        'Arvl Stn': 'LHR', 'Arvl time (pax)': '1900', 'UTC/Local Time variation (dept)': '', 'UTC/Local Time variation': '',
+    }], timezone_mode='L')
+    utc = normalize_times(df, 'local', 'UTC')
+
+    assert (utc.loc[0, 'Dept UTC offset'], utc.loc[0, 'Arvl UTC offset']) == (240, 0)
+    assert (utc.loc[0, 'Dept time (UTC)'], utc.loc[0, 'Arvl time (UTC)']) == ('1000', '1900')
+
+
+def test_next_day_arrival_is_looked_up_on_its_own_date(write_ssim):
+    # Leaves Abu Dhabi on Saturday 29 March 2025 at 2230 local (1830 UTC), lands in London on the 30th at
+    # 0235 local, after the change to summer time: +0100 on the arrival date, not +0000 as on the departure date
+    df = _legs_df(write_ssim, [{
+        'Eff': '29MAR25', 'Dis': '29MAR25', 'Day(s) of operation': '     6 ', 'Dept time (pax)': '2230',
+        'Arvl Stn': 'LHR', 'Arvl time (pax)': '0235', 'UTC/Local Time variation (dept)': '', 'UTC/Local Time variation': '',
+    }], timezone_mode='L')
+    utc = normalize_times(df, 'local', 'UTC')
+
+    assert utc.loc[0, 'Dept time (UTC)'] == '1830'
+    assert utc.loc[0, 'Arvl UTC offset'] == 60
+    assert utc.loc[0, 'Arvl time (UTC)'] == '0135'
+
+
+def test_modes_in_any_case(write_ssim):
+    df = _legs_df(write_ssim, [{}])
+    local = normalize_times(df, 'utc', 'Local')
+
+    assert local.loc[0, 'Dept time (local)'] == '0620'
+
+
+def test_unknown_mode(write_ssim):
+    df = _legs_df(write_ssim, [{}])
+    with pytest.raises(ValueError):
+        normalize_times(df, 'UTC', 'zulu')